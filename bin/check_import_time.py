@@ -0,0 +1,120 @@
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# Start-up budget check: every entry point below is run under
+# `python -X importtime`, must stay under its budget and must not import any
+# of the heavy modules (which should only load on the code paths using them).
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('numpy', 'PIL', 'plumbum')
+
+# (name, python arguments, budget in milliseconds)
+ENTRY_POINTS = [
+    ('import quillustrate.engines', ['-c', 'import quillustrate.engines'], 40),
+    ('import quillustrate.engines.quill', ['-c', 'import quillustrate.engines.quill'], 40),
+    ('quill_converter.py --help', [os.path.join('bin', 'quill_converter.py'), '--help'], 60),
+    ('process_quill_with_blender.py --help', [os.path.join('bin', 'process_quill_with_blender.py'), '--help'], 60),
+    ('file_diff.py --help', [os.path.join('bin', 'file_diff.py'), '--help'], 60),
+    ('quill_tiler.py --help', [os.path.join('bin', 'quill_tiler.py'), '--help'], 60),
+    ('quill_lod.py --help', [os.path.join('bin', 'quill_lod.py'), '--help'], 60),
+    ('quill_query_server.py --help', [os.path.join('bin', 'quill_query_server.py'), '--help'], 60),
+    ('quill_validate.py --help', [os.path.join('bin', 'quill_validate.py'), '--help'], 60),
+]
+
+# Budgets hold on a machine that imports json within this budget, --calibrate
+# scales every budget by how much slower that import runs on this machine
+REFERENCE_ENTRY_POINT = ('import json', ['-c', 'import json'], 5)
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def read_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check import time budgets of the quillustrate entry points')
+    parser.add_argument(
+        '--scale',
+        help='Multiplier applied to every budget (for slow machines)',
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        '--calibrate',
+        help='Also scale every budget by how much slower than expected json imports on this machine',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--repeat',
+        help='Runs per entry point, the fastest one counts (a busy machine only ever adds time)',
+        type=int,
+        default=3,
+    )
+    return parser.parse_args(argv)
+
+
+def measure(python_args, repeat=1):
+    """Top level imports of the fastest of repeat runs: {module: cumulative microseconds}
+
+    The total of the top level imports is under the None key.
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    # Budgets assume cached bytecode, as an installed package would have
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    command = [sys.executable, '-X', 'importtime'] + python_args
+    # Once to write bytecode caches, then to measure
+    subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True)
+    fastest = {}
+    for _ in range(repeat):
+        completed = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+        imports = {}
+        for line in completed.stderr.splitlines():
+            match = IMPORT_TIME_PATTERN.match(line)
+            if match:
+                module = match.group(4)
+                imports[module] = int(match.group(2))
+                if not match.group(3):
+                    imports.setdefault(None, 0)
+                    imports[None] += int(match.group(2))
+        if not fastest or imports.get(None, 0) < fastest.get(None, 0):
+            fastest = imports
+    return fastest
+
+
+def check(python_args, budget, scale=1.0, repeat=1):
+    """(ok, total milliseconds, heavy top level packages imported) of one entry point"""
+    imports = measure(python_args, repeat=repeat)
+    total = imports.get(None, 0) / 1000.0
+    heavy = sorted(set(module.split('.')[0] for module in imports if module and module.split('.')[0] in HEAVY_MODULES))
+    ok = bool(imports) and total <= budget * scale and not heavy
+    return ok, total, heavy
+
+
+def get_calibrated_scale(repeat=1):
+    """How much slower than its budget the reference import runs here (at least 1)"""
+    _, python_args, budget = REFERENCE_ENTRY_POINT
+    total = measure(python_args, repeat=repeat).get(None, 0) / 1000.0
+    return max(1.0, total / budget)
+
+
+def main(argv=None):
+    args = read_args(argv)
+    scale = args.scale
+    if args.calibrate:
+        scale *= get_calibrated_scale(repeat=args.repeat)
+    failed = False
+    for name, python_args, budget in ENTRY_POINTS:
+        ok, total, heavy = check(python_args, budget, scale=scale, repeat=args.repeat)
+        failed = failed or not ok
+        print('{} {:<40} {:>7.1f} ms (budget {:.0f} ms){}'.format(
+            'ok  ' if ok else 'FAIL',
+            name,
+            total,
+            budget * scale,
+            ', imports {}'.format(', '.join(heavy)) if heavy else '',
+        ))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
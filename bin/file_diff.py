@@ -1,29 +1,71 @@
-import difflib
-from plumbum import cli
-
-class FileDiff(cli.Application):
-    file_a = cli.SwitchAttr(
-        ['-a'],
-        default=None,
-        argtype=str,
-        help='File A',
-    )
+import os
+import sys
+import argparse
+
+QUILL_PROJECT_FILES = ('Quill.json', 'Quill.qbin')
 
-    file_b = cli.SwitchAttr(
-        ['-b'],
-        default=None,
-        argtype=str,
-        help='File B',
+
+def read_args(argv=None):
+    parser = argparse.ArgumentParser(description='Diff two files, or two Quill projects')
+    parser.add_argument(
+        '-a',
+        dest='file_a',
+        help='File A (or Quill project A)',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '-b',
+        dest='file_b',
+        help='File B (or Quill project B)',
+        type=str,
+        required=True,
     )
+    parser.add_argument(
+        '--tolerance',
+        help='Largest vertex/bounding box difference still considered equal (Quill projects)',
+        type=float,
+        default=1e-6,
+    )
+    return parser.parse_args(argv)
+
+
+def get_quill_project_dir(path):
+    if os.path.isdir(path):
+        return path
+    if os.path.basename(path) in QUILL_PROJECT_FILES:
+        return os.path.dirname(path) or '.'
+    return None
+
+
+def quill_diff(proj_dir_a, proj_dir_b, tolerance):
+    from quillustrate.diff import QuillProjectDiff
+
+    results = QuillProjectDiff.from_dirs(proj_dir_a, proj_dir_b, tolerance=tolerance).run()
+    for line in QuillProjectDiff.format_results(results):
+        print(line)
+    return 1 if QuillProjectDiff.has_differences(results) else 0
+
+
+def main(argv=None):
+    import difflib
+    args = read_args(argv)
+
+    proj_dir_a = get_quill_project_dir(args.file_a)
+    proj_dir_b = get_quill_project_dir(args.file_b)
+    if proj_dir_a and proj_dir_b:
+        return quill_diff(proj_dir_a, proj_dir_b, args.tolerance)
 
-    def main(self):
-        with open(self.file_a) as fa:
-            fa_text = fa.read()
-        with open(self.file_b) as fb:
-            fb_text = fb.read()
-        # Find and print the diff:
-        for line in difflib.unified_diff(fa_text, fb_text):
-            print(line)
+    with open(args.file_a) as fa:
+        fa_lines = fa.readlines()
+    with open(args.file_b) as fb:
+        fb_lines = fb.readlines()
+    # Find and print the diff:
+    different = False
+    for line in difflib.unified_diff(fa_lines, fb_lines, fromfile=args.file_a, tofile=args.file_b):
+        different = True
+        sys.stdout.write(line)
+    return 1 if different else 0
 
 if __name__ == '__main__':
-    FileDiff.run()
+    sys.exit(main())
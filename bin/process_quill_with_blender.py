@@ -1,46 +1,78 @@
-from plumbum import cli
+import argparse
 
 
-class ProcessQuillWithBlender(cli.Application):
-    alembic_input = cli.SwitchAttr(
-        ['--alembic-input'],
-        default=None,
-        argtype=str,
-        excludes=['quill-input'],
-        help='Alembic input (.abc), exported from Quill',
-    )
+def read_args(argv=None):
+    from quillustrate.profiling import add_profile_arguments
+    from quillustrate.validation import add_validation_arguments
 
-    quill_input = cli.SwitchAttr(
-        ['--quill-input'],
+    parser = argparse.ArgumentParser(description='Process a Quill export with Blender')
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument(
+        '--alembic-input',
+        help='Alembic input (.abc), exported from Quill, several are grouped into one scene',
+        type=str,
+        nargs='+',
         default=None,
-        argtype=str,
-        excludes=['alembic-input'],
+    )
+    input_group.add_argument(
+        '--quill-input',
         help='Quill input (project directory)',
+        type=str,
+        default=None,
     )
-
-    output = cli.SwitchAttr(
-        ['--output'],
-        argtype=str,
-        mandatory=True,
+    parser.add_argument(
+        '--output',
         help='Path to (desired) output dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--shards',
+        help='Number of concurrent QuillExporter runs, each exporting a share of the layers (Quill input)',
+        type=int,
+        default=1,
     )
+    add_validation_arguments(parser)
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
 
-    def main(self):
-        import os
-        from quillustrate.engines import BlenderEngine, QuillExporterEngine
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.profiling import profile_run
 
-        if not os.path.exists(self.output):
-            os.makedirs(self.output)
+    with profile_run(args.profile, trace_memory=args.profile_memory):
+        process(args)
 
-        blender_engine = BlenderEngine()
 
-        if self.quill_input:
-            quill_exporter_engine = QuillExporterEngine()
-        else:
-            blender_engine.process_quill_alembic(
-                alembic_path=self.alembic_input,
-                output=self.output,
-            )
+def process(args):
+    import os
+    from quillustrate.engines import BlenderEngine, QuillExporterEngine
+
+    if args.quill_input and not args.skip_validation:
+        from quillustrate.validation import check_project_or_exit
+
+        check_project_or_exit(args.quill_input)
+
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    blender_engine = BlenderEngine()
+
+    if args.quill_input:
+        quill_exporter_engine = QuillExporterEngine()
+        alembic_paths = quill_exporter_engine.run_sharded(
+            input_proj_dir=args.quill_input,
+            output_dir=os.path.join(args.output, 'QuillExport'),
+            num_shards=args.shards,
+        )
+    else:
+        alembic_paths = args.alembic_input
+
+    blender_engine.process_quill_alembic(
+        alembic_path=alembic_paths,
+        output=args.output,
+    )
 
 if __name__ == '__main__':
-    ProcessQuillWithBlender.run()
+    main()
@@ -0,0 +1,77 @@
+import sys
+import argparse
+
+
+def read_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Round trips random scenes through the Quill codecs, reporting failures and MB/s',
+    )
+    parser.add_argument(
+        '--iterations',
+        help='Number of random scenes',
+        type=int,
+        default=20,
+    )
+    parser.add_argument(
+        '--seed',
+        help='Seed of the first scene (scenes use seed, seed + 1, ...)',
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        '--codecs',
+        help='Comma separated codecs to check (object, arrays, ascii)',
+        type=str,
+        default='object,arrays,ascii',
+    )
+    parser.add_argument(
+        '--max-strokes',
+        help='Most strokes per drawing',
+        type=int,
+        default=32,
+    )
+    parser.add_argument(
+        '--max-vertices',
+        help='Most vertices per stroke',
+        type=int,
+        default=64,
+    )
+    parser.add_argument(
+        '--max-gap',
+        help='Most unused bytes before each value (scenes with gaps are compared value by value)',
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        '--empty-probability',
+        help='Probability of a drawing without strokes, or a stroke without vertices',
+        type=float,
+        default=0.0,
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.roundtrip import QuillRoundTripHarness, get_codec
+
+    try:
+        codecs = [get_codec(name.strip()) for name in args.codecs.split(',')]
+    except ValueError as error:
+        sys.exit(str(error))
+    harness = QuillRoundTripHarness(
+        codecs=codecs,
+        generator_options={
+            'max_strokes': args.max_strokes,
+            'max_vertices': args.max_vertices,
+            'max_gap': args.max_gap,
+            'empty_probability': args.empty_probability,
+        },
+    )
+    results = harness.run(range(args.seed, args.seed + args.iterations))
+    for line in QuillRoundTripHarness.format_results(results):
+        print(line)
+    return 1 if results["failures"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,108 @@
-from plumbum import cli
-from quillustrate.engines.quill import QuillConverterEngine
-
-class QuillAsciiConverter(cli.Application):
-    input = cli.SwitchAttr(
-        ['--input'],
-        argtype=str,
-        mandatory=True,
+import argparse
+
+# Only argparse at module level, the converter (and numpy) load once the
+# arguments are known to need them
+
+
+def read_args(argv=None):
+    from quillustrate.profiling import add_profile_arguments
+    from quillustrate.validation import add_validation_arguments
+
+    parser = argparse.ArgumentParser(description='Convert Quill projects between formats')
+    parser.add_argument(
+        '--input',
         help='Path to (desired) input dir',
+        type=str,
+        required=True,
     )
-
-    output = cli.SwitchAttr(
-        ['--output'],
-        argtype=str,
-        mandatory=True,
+    parser.add_argument(
+        '--output',
         help='Path to (desired) output dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--format',
+        help='Output format, Quill.qa (ascii), memory-mappable arrays (columnar) '
+             'or Quill.qbin from an input Quill.qa (binary)',
+        choices=['ascii', 'columnar', 'binary'],
+        default='ascii',
     )
+    parser.add_argument(
+        '--pictures',
+        help='Also write picture layers as PNGs (to <output>/Pictures)',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--color-space',
+        help='Color space of written pictures',
+        choices=['Gamma', 'Linear'],
+        default='Gamma',
+    )
+    parser.add_argument(
+        '--premultiply',
+        help='Premultiply alpha of written pictures',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--picture-mips',
+        help='Number of downscaled mips to write per picture',
+        type=int,
+        default=0,
+    )
+    add_validation_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.pictures and args.format == 'binary':
+        parser.error('--pictures reads the pictures of a Quill.qbin project, '
+                     'it cannot be used with --format binary')
+    return args
+
 
-    def main(self):
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.profiling import profile_run
+
+    with profile_run(args.profile, trace_memory=args.profile_memory):
+        convert(args)
+
+
+def convert(args):
+    if args.format != 'binary' and not args.skip_validation:
+        from quillustrate.validation import check_project_or_exit
+
+        check_project_or_exit(args.input)
+
+    from quillustrate.engines.quill import QuillConverterEngine
+
+    if args.pictures:
+        from quillustrate.pictures import QuillPictureProcessor
+
+        QuillConverterEngine.write_pictures(
+            input_proj_dir=args.input,
+            output_proj_dir=args.output,
+            picture_processor=QuillPictureProcessor(
+                color_space=args.color_space,
+                premultiply=args.premultiply,
+                num_mips=args.picture_mips,
+            ),
+        )
+
+    if args.format == 'binary':
+        QuillConverterEngine.ascii_to_bin(
+            input_proj_dir=args.input,
+            output_proj_dir=args.output,
+        )
+    elif args.format == 'columnar':
+        QuillConverterEngine.bin_to_columnar(
+            input_proj_dir=args.input,
+            output_proj_dir=args.output,
+        )
+    else:
         QuillConverterEngine.bin_to_ascii(
-            input_proj_dir=self.input,
-            output_proj_dir=self.output,
+            input_proj_dir=args.input,
+            output_proj_dir=args.output,
         )
 
 if __name__ == '__main__':
-    QuillAsciiConverter.run()
+    main()
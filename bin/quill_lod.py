@@ -0,0 +1,113 @@
+import argparse
+
+
+def read_args(argv=None):
+    from quillustrate.profiling import add_profile_arguments
+    from quillustrate.validation import add_validation_arguments
+
+    parser = argparse.ArgumentParser(
+        description='Write levels of detail of a Quill project, each a Quill project, with a lods.json manifest',
+    )
+    parser.add_argument(
+        '--input',
+        help='Path to the input Quill project dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output',
+        help='Path to (desired) output dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--distances',
+        help='Viewing distance (meters) of each level, 0 keeps every stroke and vertex',
+        type=float,
+        nargs='+',
+        default=[0.0, 5.0, 20.0],
+    )
+    parser.add_argument(
+        '--min-pixels',
+        help='Cull strokes smaller than this many pixels at the level distance',
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        '--simplify-pixels',
+        help='Merge vertices closer than this many pixels along a stroke at the level distance',
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        '--fov',
+        help='Vertical field of view (degrees) the pixel sizes are computed for',
+        type=float,
+        default=90.0,
+    )
+    parser.add_argument(
+        '--screen-height',
+        help='Screen height (pixels) the pixel sizes are computed for',
+        type=int,
+        default=1080,
+    )
+    parser.add_argument(
+        '--alembic',
+        help='Also export every level to <output>/lod_<N>.abc with QuillExporter (concurrently)',
+        action='store_true',
+    )
+    add_validation_arguments(parser)
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.profiling import profile_run
+
+    with profile_run(args.profile, trace_memory=args.profile_memory):
+        generate(args)
+
+
+def generate(args):
+    if not args.skip_validation:
+        from quillustrate.validation import check_project_or_exit
+
+        check_project_or_exit(args.input)
+
+    import os
+    from quillustrate.engines.quill import QuillProject
+    from quillustrate.lod import QuillLodGenerator
+
+    generator = QuillLodGenerator(
+        QuillProject(args.input),
+        distances=args.distances,
+        min_pixels=args.min_pixels,
+        simplify_pixels=args.simplify_pixels,
+        field_of_view=args.fov,
+        screen_height=args.screen_height,
+    )
+    manifest = generator.run(args.output)
+    for level in manifest["Levels"]:
+        print("{} ({:g} m): {} strokes, {} vertices, {} bytes".format(
+            level["Path"],
+            level["Distance"],
+            level["NumStrokes"],
+            level["NumVertices"],
+            level["Bytes"],
+        ))
+
+    if args.alembic:
+        from quillustrate.engines import QuillExporterEngine
+
+        quill_exporter_engine = QuillExporterEngine()
+        quill_exporter_engine.run_concurrently([
+            quill_exporter_engine.get_settings(
+                os.path.join(args.output, level["Path"]),
+                os.path.join(args.output, level["Path"] + ".abc"),
+            )
+            for level in manifest["Levels"]
+        ])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+
+
+def read_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Serve queries about Quill projects (layers, stats, strokes, vertices) on localhost, '
+                    'keeping recently used projects loaded',
+    )
+    parser.add_argument(
+        '--host',
+        help='Address to listen on',
+        type=str,
+        default='127.0.0.1',
+    )
+    parser.add_argument(
+        '--port',
+        help='Port to listen on',
+        type=int,
+        default=8765,
+    )
+    parser.add_argument(
+        '--max-cache-mb',
+        help='Memory for loaded projects and decoded drawings, least recently used projects are dropped first',
+        type=float,
+        default=1024.0,
+    )
+    parser.add_argument(
+        '--watch-interval',
+        help='Seconds between checks dropping projects whose files changed (0 to only check on queries)',
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        '--verbose',
+        help='Log every request',
+        action='store_true',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.query import QuillQueryServer
+
+    server = QuillQueryServer(
+        host=args.host,
+        port=args.port,
+        max_cache_bytes=int(args.max_cache_mb * 1024 * 1024),
+        watch_interval=args.watch_interval,
+        verbose=args.verbose,
+    )
+    print("Serving Quill queries on http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
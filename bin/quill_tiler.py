@@ -0,0 +1,84 @@
+import argparse
+
+
+def read_args(argv=None):
+    from quillustrate.profiling import add_profile_arguments
+    from quillustrate.validation import add_validation_arguments
+
+    parser = argparse.ArgumentParser(
+        description='Split a Quill project into spatial tiles, each a Quill project, with a tiles.json manifest',
+    )
+    parser.add_argument(
+        '--input',
+        help='Path to the input Quill project dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--output',
+        help='Path to (desired) output dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--mode',
+        help='Equal grid cells, or an octree split until tiles are small enough',
+        choices=['grid', 'octree'],
+        default='grid',
+    )
+    parser.add_argument(
+        '--divisions',
+        help='Grid cells along x, y and z (grid)',
+        type=int,
+        nargs=3,
+        default=[2, 2, 2],
+    )
+    parser.add_argument(
+        '--max-tile-mb',
+        help='Split octree cells holding more than this many MB of strokes (octree)',
+        type=float,
+        default=64.0,
+    )
+    parser.add_argument(
+        '--max-depth',
+        help='Deepest octree level (octree)',
+        type=int,
+        default=6,
+    )
+    add_validation_arguments(parser)
+    add_profile_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = read_args(argv)
+    from quillustrate.profiling import profile_run
+
+    with profile_run(args.profile, trace_memory=args.profile_memory):
+        tile(args)
+
+
+def tile(args):
+    if not args.skip_validation:
+        from quillustrate.validation import check_project_or_exit
+
+        check_project_or_exit(args.input)
+
+    from quillustrate.engines.quill import QuillProject
+    from quillustrate.tiling import QuillSceneTiler
+
+    tiler = QuillSceneTiler(
+        QuillProject(args.input),
+        mode=args.mode,
+        divisions=args.divisions,
+        max_tile_bytes=int(args.max_tile_mb * 1024 * 1024),
+        max_depth=args.max_depth,
+    )
+    manifest = tiler.run(args.output)
+    for tile_data in manifest["Tiles"]:
+        print("{}: {} strokes, {} bytes".format(tile_data["Path"], tile_data["NumStrokes"], tile_data["Bytes"]))
+    if manifest["Shared"]:
+        print("{}: pictures, {} bytes".format(manifest["Shared"]["Path"], manifest["Shared"]["Bytes"]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import sys
+import argparse
+
+
+def read_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Check Quill.qbin against Quill.json from the headers alone, and print per layer statistics',
+    )
+    parser.add_argument(
+        '--input',
+        help='Path to the Quill project dir',
+        type=str,
+        required=True,
+    )
+    parser.add_argument(
+        '--json',
+        help='Print the full report as JSON',
+        action='store_true',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import json
+    args = read_args(argv)
+    from quillustrate.validation import QuillValidator, validate_project
+
+    report = validate_project(args.input)
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        for line in QuillValidator.format_report(report):
+            print(line)
+    return 0 if report["Valid"] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
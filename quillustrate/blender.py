@@ -28,8 +28,9 @@ def read_args():
     input_group = parser.add_mutually_exclusive_group(required=True)
     input_group.add_argument(
         '--alembic',
-        help='Path to the .abc file to import',
+        help='Path to the .abc file(s) to import, several (e.g. export shards) are grouped into one scene',
         type=str,
+        nargs='+',
     )
     input_group.add_argument(
         '--quill',
@@ -57,8 +58,11 @@ def set_view_settings():
 def import_alembic(abc_filepath):
     import os
     abc_filepath = os.path.abspath(abc_filepath)
+    existing_objs = set(bpy.data.objects)
     bpy.ops.wm.alembic_import(filepath=abc_filepath, as_background_job=False)
-    return bpy.data.objects["Root"]
+    # The imported "Root" is renamed (Root.001, ...) when an earlier import already has one
+    root_objs = [obj for obj in bpy.data.objects if obj not in existing_objs and obj.parent is None]
+    return root_objs
 
 
 def export_blend(blend_filepath):
@@ -114,9 +118,10 @@ def set_background_color_from_obj(background_color_name, gamma_correct=True):
 
 
 def process_quill_alembic(args):
-    root_obj = import_alembic(args.alembic)
     flat_mat = create_flat_material()
-    apply_material_to_quill_layers(root_obj, flat_mat)
+    for abc_filepath in args.alembic:
+        for root_obj in import_alembic(abc_filepath):
+            apply_material_to_quill_layers(root_obj, flat_mat)
     if args.background_name:
         set_background_color_from_obj(args.background_name)
 
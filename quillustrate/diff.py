@@ -0,0 +1,251 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProject, QuillType
+
+
+def gather_ranges(starts, lengths):
+    """Indices of every element in the concatenation of [start, start + length) ranges"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.repeat(np.asarray(starts, dtype=np.int64) - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+class QuillDrawingDiff(object):
+    """Stroke level comparison of two decoded drawings
+
+    Strokes are matched by global_stroke_id when those are unique in both
+    drawings, otherwise by position. Matched strokes are compared header by
+    header and, where their vertex counts agree, vertex by vertex, all
+    strokes at once. Matched strokes whose vertex counts differ are modified
+    and reported as incomparable, max_deviation (None when no vertices were
+    compared) only covers the others.
+    """
+    FLOAT_FIELDS = ("position", "normal", "tangent", "color", "opacity", "width")
+
+    def __init__(self, drawing_a, drawing_b, tolerance=1e-6):
+        self.drawing_a = drawing_a
+        self.drawing_b = drawing_b
+        self.tolerance = tolerance
+
+    def match_strokes(self):
+        ids_a = self.drawing_a.strokes["global_stroke_id"]
+        ids_b = self.drawing_b.strokes["global_stroke_id"]
+        if len(np.unique(ids_a)) == len(ids_a) and len(np.unique(ids_b)) == len(ids_b):
+            _, index_a, index_b = np.intersect1d(ids_a, ids_b, assume_unique=True, return_indices=True)
+            removed = np.setdiff1d(np.arange(len(ids_a)), index_a)
+            added = np.setdiff1d(np.arange(len(ids_b)), index_b)
+        else:
+            num_common = min(len(ids_a), len(ids_b))
+            index_a = index_b = np.arange(num_common)
+            removed = np.arange(num_common, len(ids_a))
+            added = np.arange(num_common, len(ids_b))
+        return index_a, index_b, added, removed
+
+    def run(self):
+        index_a, index_b, added, removed = self.match_strokes()
+        strokes_a = self.drawing_a.strokes[index_a]
+        strokes_b = self.drawing_b.strokes[index_b]
+
+        modified = np.zeros(len(index_a), dtype=bool)
+        for field in strokes_a.dtype.names:
+            if field == "stroke_bounding_box":
+                difference = np.abs(strokes_a[field] - strokes_b[field]).max(axis=-1, initial=0.0)
+                modified |= difference > self.tolerance
+            else:
+                modified |= strokes_a[field] != strokes_b[field]
+
+        # Vertices can only be compared pairwise where the counts agree (otherwise already modified)
+        max_deviation = None
+        comparable = strokes_a["num_vertices"] == strokes_b["num_vertices"]
+        if comparable.any():
+            num_vertices = strokes_a["num_vertices"][comparable]
+            vertices_a = self.drawing_a.vertices[gather_ranges(
+                self.drawing_a.get_vertex_offsets()[index_a[comparable]], num_vertices)]
+            vertices_b = self.drawing_b.vertices[gather_ranges(
+                self.drawing_b.get_vertex_offsets()[index_b[comparable]], num_vertices)]
+            deviation = np.zeros(len(vertices_a), dtype=np.float32)
+            for field in self.FLOAT_FIELDS:
+                field_deviation = np.abs(vertices_a[field] - vertices_b[field])
+                if field_deviation.ndim > 1:
+                    field_deviation = field_deviation.max(axis=-1)
+                np.maximum(deviation, field_deviation, out=deviation)
+            # NaN positions in either (unlikely but possible) count as modified
+            deviation[np.isnan(deviation)] = np.inf
+            if len(deviation):
+                max_deviation = float(deviation.max())
+                nonempty = num_vertices > 0
+                stroke_deviation = np.zeros(len(num_vertices), dtype=np.float32)
+                starts = np.concatenate([[0], np.cumsum(num_vertices)[:-1]])
+                stroke_deviation[nonempty] = np.maximum.reduceat(deviation, starts[nonempty])
+                modified[np.flatnonzero(comparable)[stroke_deviation > self.tolerance]] = True
+
+        return {
+            "added": self.drawing_b.strokes["global_stroke_id"][added].tolist(),
+            "removed": self.drawing_a.strokes["global_stroke_id"][removed].tolist(),
+            "modified": strokes_b["global_stroke_id"][modified].tolist(),
+            "incomparable": strokes_b["global_stroke_id"][~comparable].tolist(),
+            "max_deviation": max_deviation,
+        }
+
+
+class QuillProjectDiff(object):
+    """Layer by layer comparison of two Quill projects
+
+    The layer trees (Quill.json) are compared first: added and removed
+    layers, and layers whose attributes (transform, visibility, children
+    order, ...) differ. Every drawing and picture is then hashed over its
+    Quill.qbin byte range, only those whose hashes differ are decoded and
+    compared stroke by stroke. Drawings are keyed by their index in the
+    layer's Drawings, wherever they are stored in Quill.qbin.
+    """
+    # Where layer values are stored, their contents are compared separately
+    STORAGE_KEYS = ("Children", "Drawings", "DataFileOffset")
+
+    def __init__(self, project_a, project_b, tolerance=1e-6):
+        self.project_a = project_a
+        self.project_b = project_b
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_dirs(cls, proj_dir_a, proj_dir_b, tolerance=1e-6):
+        return cls(QuillProject(proj_dir_a), QuillProject(proj_dir_b), tolerance=tolerance)
+
+    @classmethod
+    def get_layer_attributes(cls, layer_data):
+        """Attribute name -> value of a layer, with its Implementation attributes as "Implementation.<name>" """
+        attributes = {key: value for key, value in layer_data.items() if key != "Implementation"}
+        for key, value in layer_data.get("Implementation", {}).items():
+            if key not in cls.STORAGE_KEYS:
+                attributes["Implementation." + key] = value
+        if layer_data["Type"] == "Group":
+            attributes["Implementation.Children"] = [
+                child_layer["Name"] for child_layer in layer_data["Implementation"]["Children"]
+            ]
+        return attributes
+
+    @classmethod
+    def get_layers(cls, project):
+        """layer path -> layer attributes"""
+        return OrderedDict(
+            (layer_path, cls.get_layer_attributes(layer_data))
+            for layer_path, layer_data, _ in project.scene_data_obj.iter_layers()
+        )
+
+    @classmethod
+    def get_values(cls, project):
+        """(layer path, index within the layer's Drawings) -> (value range, binary chunk, digest), in layer order"""
+        layer_order = {
+            layer_path: position for position, (layer_path, _, _) in enumerate(project.scene_data_obj.iter_layers())
+        }
+        values = OrderedDict()
+        value_ranges = sorted(
+            project.get_quill_file_value_ranges(),
+            key=lambda item: (layer_order[item["path"]], item["index"]),
+        )
+        for value_range in value_ranges:
+            binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            digest = hashlib.blake2b(binary_chunk_obj.get_data(), digest_size=16).digest()
+            values[(value_range["path"], value_range["index"])] = (value_range, binary_chunk_obj, digest)
+        return values
+
+    @classmethod
+    def iter_keys(cls, items_a, items_b):
+        return list(items_a) + [key for key in items_b if key not in items_a]
+
+    def diff_layers(self):
+        layers_a = self.get_layers(self.project_a)
+        layers_b = self.get_layers(self.project_b)
+        results = []
+        for layer_path in self.iter_keys(layers_a, layers_b):
+            result = {"path": layer_path, "index": None}
+            if layer_path not in layers_b:
+                result["status"] = "removed"
+            elif layer_path not in layers_a:
+                result["status"] = "added"
+            else:
+                attributes_a = layers_a[layer_path]
+                attributes_b = layers_b[layer_path]
+                result["attributes"] = [
+                    key for key in self.iter_keys(attributes_a, attributes_b)
+                    if attributes_a.get(key) != attributes_b.get(key)
+                ]
+                result["status"] = "modified" if result["attributes"] else "identical"
+            results.append(result)
+        return results
+
+    def diff_values(self):
+        values_a = self.get_values(self.project_a)
+        values_b = self.get_values(self.project_b)
+        results = []
+        for key in self.iter_keys(values_a, values_b):
+            result = {"path": key[0], "index": key[1]}
+            if key not in values_b:
+                result["status"] = "removed"
+            elif key not in values_a:
+                result["status"] = "added"
+            else:
+                range_a, chunk_a, digest_a = values_a[key]
+                range_b, chunk_b, digest_b = values_b[key]
+                if digest_a == digest_b:
+                    result["status"] = "identical"
+                elif range_a["type"] != range_b["type"] or range_a["type"] != QuillType.DRAWING:
+                    result["status"] = "modified"
+                else:
+                    result.update(QuillDrawingDiff(
+                        QuillDrawingArrays.decode(chunk_a),
+                        QuillDrawingArrays.decode(chunk_b),
+                        tolerance=self.tolerance,
+                    ).run())
+                    changed = result["added"] or result["removed"] or result["modified"]
+                    # Differences within tolerance only
+                    result["status"] = "modified" if changed else "equivalent"
+            results.append(result)
+        return results
+
+    def run(self):
+        """Layer results (index None) followed by value results"""
+        return self.diff_layers() + self.diff_values()
+
+    @classmethod
+    def format_results(cls, results):
+        lines = []
+        num_identical = {"layers": 0, "values": 0}
+        num_results = {"layers": 0, "values": 0}
+        for result in results:
+            kind = "layers" if result["index"] is None else "values"
+            num_results[kind] += 1
+            if result["index"] is None:
+                name = result["path"]
+            else:
+                name = "{}[{}]".format(result["path"], result["index"])
+            if result["status"] == "identical":
+                num_identical[kind] += 1
+            elif result["status"] == "added":
+                lines.append("+ {}".format(name))
+            elif result["status"] == "removed":
+                lines.append("- {}".format(name))
+            elif "attributes" in result:
+                lines.append("~ {}: {}".format(name, ", ".join(result["attributes"])))
+            elif "max_deviation" not in result:
+                lines.append("~ {}".format(name))
+            else:
+                max_deviation = result["max_deviation"]
+                line = "{} {}: {} modified, {} added, {} removed strokes (max vertex deviation {})".format(
+                    "~" if result["status"] == "modified" else "=",
+                    name,
+                    len(result["modified"]),
+                    len(result["added"]),
+                    len(result["removed"]),
+                    "n/a" if max_deviation is None else "{:.3g}".format(max_deviation),
+                )
+                if result["incomparable"]:
+                    line += ", {} strokes with a different vertex count not compared".format(len(result["incomparable"]))
+                lines.append(line)
+        for kind in ("layers", "values"):
+            lines.append("{} of {} {} identical".format(num_identical[kind], num_results[kind], kind))
+        return lines
+
+    @classmethod
+    def has_differences(cls, results):
+        return any(result["status"] not in ("identical", "equivalent") for result in results)
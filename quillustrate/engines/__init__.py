@@ -0,0 +1,5 @@
+# Engine modules only import their heavy dependencies (numpy, PIL, plumbum)
+# where they are used, so importing the package stays cheap
+from quillustrate.engines.engine import Engine
+from quillustrate.engines.blender import BlenderEngine
+from quillustrate.engines.quill import QuillConverterEngine, QuillExporterEngine
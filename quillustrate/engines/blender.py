@@ -1,19 +1,22 @@
 import os
-from quillustrate.engines import Engine
+from quillustrate.engines.engine import Engine
 
 class BlenderEngine(Engine):
     command_string = "blender.exe"
 
     def process_quill_alembic(self, alembic_path, output):
+        # A list of paths (e.g. QuillExporterEngine.run_sharded shards) is imported as one scene
+        if isinstance(alembic_path, str):
+            alembic_path = [alembic_path]
         self.run({
             'alembic': alembic_path,
-            'output': output,
-        })
+        }, output)
 
 
     def run(self, options, output):
+        # The script Blender runs, quillustrate/blender.py (not this module)
         python_entry = os.path.join(
-            os.path.dirname(__file__),
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
             'blender.py',
         )
 
@@ -26,6 +29,9 @@ class BlenderEngine(Engine):
 
         for key, value in options.items():
             args.append('--{}'.format(key))
-            args.append(value)
+            if isinstance(value, (list, tuple)):
+                args.extend(value)
+            else:
+                args.append(value)
 
         self.run_cmd(args)
@@ -1,7 +1,16 @@
+from quillustrate.profiling import profile_subprocess
+
+
 class Engine(object):
     def run_cmd(self, args):
-        from plumbum import local, FG
+        from plumbum import local, FG, ProcessExecutionError
 
         cmd = local[self.command_string]
         cmd_with_args = cmd.bound_command(args)
-        cmd_with_args & FG
+        with profile_subprocess(self.command_string, args) as record:
+            try:
+                cmd_with_args & FG
+            except ProcessExecutionError as error:
+                record["returncode"] = error.retcode
+                raise
+            record["returncode"] = 0
@@ -1,38 +1,60 @@
 import os
+import re
 import json
-import codecs
+import base64
 import struct
+import operator
+import itertools
 from enum import Enum
-import ctypes
-from typing import List
-from functools import reduce
 from quillustrate.engines.engine import Engine
+from quillustrate.profiling import profiled, section as profiling_section
 from collections import OrderedDict
-from PIL import Image
-import numpy as np
+
+# numpy and PIL are imported where used, so that importing this module (and
+# short CLI invocations) stay cheap
 
 # Thanks to Joan Charmant for the initial Quill File format info
 # http://joancharmant.com/blog/turning-real-scenes-into-vr-paintings/
 
+# Layer paths ("Root/Group/Paint") always join layer names with "/", whatever
+# the platform, so paths built by different modules compare equal
+LAYER_PATH_SEPARATOR = "/"
+
+
+# Layer names can hold any character, so the separator and every character
+# Windows does not allow in file names (\ : * ? " < > |) become "_" in file names
+LAYER_FILE_NAME_PATTERN = re.compile(r'[/\\:*?"<>|]')
+
+
+def join_layer_path(layer_path, name):
+    return LAYER_PATH_SEPARATOR.join([layer_path, name])
+
+
+def layer_path_to_file_name(layer_path):
+    return LAYER_FILE_NAME_PATTERN.sub("_", layer_path)
+
+
 class QuillType(Enum):
-    CHAR = ("char", 1)
-    INT16 = ("int16", 2)
-    INT32 = ("int32", 4)
-    FLOAT = ("float", 4)
-    BOOL = ("bool", 1)
-    BRUSH_TYPE = ("brush_type", 2)
-    BBOX = ("bbox", 24)
-    VERTEX = ("vertex", 56)
-    VEC3 = ("vec3", 12)
-    RGBA = ("rgba", 4)
-    RGB = ("rgb", 3)
-    DRAWING = ("drawing", None)
-    PICTURE = ("picture", None)
-    STROKE = ("stroke", None)
-
-    def __init__(self, key, size):
+    CHAR = ("char", 1, ("u1",))
+    INT16 = ("int16", 2, ("<i2",))
+    INT32 = ("int32", 4, ("<i4",))
+    FLOAT = ("float", 4, ("<f4",))
+    BOOL = ("bool", 1, ("?",))
+    BRUSH_TYPE = ("brush_type", 2, ("<i2",))
+    BBOX = ("bbox", 24, ("<f4", (6,)))
+    VERTEX = ("vertex", 56, None)
+    VEC3 = ("vec3", 12, ("<f4", (3,)))
+    RGBA = ("rgba", 4, ("u1", (4,)))
+    RGB = ("rgb", 3, ("u1", (3,)))
+    DRAWING = ("drawing", None, None)
+    PICTURE = ("picture", None, None)
+    STROKE = ("stroke", None, None)
+
+    def __init__(self, key, size, dtype):
         self.key = key
         self.size = size
+        # numpy field spec (without the field name), for bulk decoding
+        self.dtype = dtype
 
 
 
@@ -80,6 +102,404 @@ class QuillJsonEncoder(object):
             **scene_data,
         }
 
+class QuillAsciiEncoder(object):
+    """Writes Quill.qa: the Quill.json document plus a "Data" section holding
+    every decoded drawing and picture, keyed by its original DataFileOffset
+
+    Written one stroke at a time, so memory is bounded by the largest drawing
+    rather than by the whole scene.
+    """
+    INDENT = 1
+
+    def __init__(self, scene_data_obj, binary_data_obj):
+        self.scene_data_obj = scene_data_obj
+        self.binary_data_obj = binary_data_obj
+
+    @classmethod
+    def dumps(cls, value, level):
+        return json.dumps(value, indent=cls.INDENT).replace("\n", "\n" + " " * level)
+
+    def run(self, outfile):
+        import numpy as np
+
+        outfile.write("{\n")
+        for key, value in self.scene_data_obj.get_data().items():
+            outfile.write(' {}: {},\n'.format(json.dumps(key), self.dumps(value, 1)))
+
+        headers_dtype = QuillSceneObject.get_header_dtype()
+        headers, = np.frombuffer(self.binary_data_obj.get_data(), dtype=headers_dtype, count=1)
+        headers = {field: headers[field].tolist() for field in headers_dtype.names}
+        outfile.write(' "Data": {{\n  "Headers": {},\n  "Values": ['.format(self.dumps(headers, 2)))
+
+        value_ranges = self.scene_data_obj.get_quill_file_value_ranges(self.binary_data_obj.get_size())
+        for index, value_range in enumerate(value_ranges):
+            outfile.write(",\n   " if index else "\n   ")
+            binary_chunk_obj, _ = self.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            data_file_offset = QuillSceneData.format_data_file_offset(value_range["offset"])
+            if value_range["type"] == QuillType.DRAWING:
+                self.write_drawing(outfile, data_file_offset, QuillDrawingArrays.decode(binary_chunk_obj))
+            elif value_range["type"] == QuillType.PICTURE:
+                self.write_picture(outfile, data_file_offset, binary_chunk_obj)
+        outfile.write("\n  ]\n }\n}\n")
+
+    @classmethod
+    def write_drawing(cls, outfile, data_file_offset, drawing):
+        outfile.write('{{\n    "DataFileOffset": {},\n    "Type": "Drawing",\n    "num_strokes": {},\n    "strokes": ['.format(
+            json.dumps(data_file_offset),
+            len(drawing.strokes),
+        ))
+        stroke_columns = {field: drawing.strokes[field].tolist() for field in drawing.strokes.dtype.names}
+        stroke_columns["brush_type"] = [QuillBrushType(code).json_encode() for code in stroke_columns["brush_type"]]
+        vertex_columns = {field: drawing.vertices[field].tolist() for field in drawing.vertices.dtype.names}
+        vertex_offsets = drawing.get_vertex_offsets().tolist()
+        for stroke_index in range(len(drawing.strokes)):
+            stroke = {field: column[stroke_index] for field, column in stroke_columns.items()}
+            start, end = vertex_offsets[stroke_index], vertex_offsets[stroke_index + 1]
+            # One compact line per vertex, indenting every vertex field is several times slower
+            vertices = ",\n       ".join(
+                json.dumps(dict(zip(vertex_columns, vertex)))
+                for vertex in zip(*(column[start:end] for column in vertex_columns.values()))
+            )
+            outfile.write(",\n     " if stroke_index else "\n     ")
+            stroke_text = cls.dumps(stroke, 5)
+            outfile.write(stroke_text[:stroke_text.rindex("\n")])
+            outfile.write(',\n      "vertices": [\n       {}\n      ]\n     }}'.format(vertices) if vertices
+                else ',\n      "vertices": []\n     }')
+        outfile.write("\n    ]\n   }")
+
+    @classmethod
+    def write_picture(cls, outfile, data_file_offset, binary_chunk_obj):
+        import numpy as np
+
+        headers_dtype = QuillPictureObject.get_header_dtype()
+        headers, = np.frombuffer(binary_chunk_obj.get_data(), dtype=headers_dtype, count=1)
+        picture = {
+            "DataFileOffset": data_file_offset,
+            "Type": "Picture",
+            "headers": {field: headers[field].tolist() for field in headers_dtype.names},
+            "pixels": base64.b64encode(binary_chunk_obj.get_data()[headers_dtype.itemsize:]).decode("ascii"),
+        }
+        outfile.write(cls.dumps(picture, 3))
+
+
+class QuillJsonStreamReader(object):
+    """Minimal pull parser over a JSON text file
+
+    Containers can either be walked key by key / item by item, or decoded
+    whole with read_value, so a caller only ever holds one bounded value
+    (e.g. a single stroke) in memory.
+    """
+    CHUNK_SIZE = 1 << 20
+    WHITESPACE = " \t\n\r"
+    # Longest token that can be cut short by the end of the buffer (-Infinity)
+    LONGEST_TOKEN = 9
+    STRING_PATTERN = re.compile(r'["\\]')
+    DELIMITER_PATTERN = re.compile(r'[\s,\]}]')
+
+    def __init__(self, infile, chunk_size=None):
+        self.infile = infile
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.infile.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def fill_string(self):
+        """Reads until the buffer holds the whole string starting at pos
+
+        Only the newly read chunk is searched for the closing quote, so a
+        string spanning many chunks (picture pixels) is scanned once.
+        """
+        text = self.buffer[self.pos:]
+        chunks = [text]
+        index = 1
+        while True:
+            match = self.STRING_PATTERN.search(text, index)
+            if match is None:
+                # Resumes past an escaped character cut off by the end of the chunk
+                index = max(index - len(text), 0)
+                text = self.infile.read(self.chunk_size)
+                if not text:
+                    self.eof = True
+                    raise ValueError("Unexpected end of JSON stream")
+                chunks.append(text)
+            elif match.group() == "\\":
+                index = match.end() + 1
+            else:
+                break
+        self.buffer = "".join(chunks)
+        self.pos = 0
+
+    def is_truncated(self, error):
+        """Whether a decode error can be the value running past the end of the buffer"""
+        return error.msg.startswith("Unterminated string") or len(self.buffer) - error.pos <= self.LONGEST_TOKEN
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected '{}' but found '{}'".format(char, self.buffer[self.pos]))
+        self.pos += 1
+
+    def read_value(self):
+        char = self.peek()
+        if char not in '[{"':
+            # Numbers are not delimited, so one cut short by the end of the buffer
+            # would still decode: read on until something follows it
+            while self.DELIMITER_PATTERN.search(self.buffer, self.pos) is None and self.fill():
+                pass
+        string_filled = False
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError as error:
+                # Errors that are not at the end of the buffer are raised right away
+                if self.eof or string_filled or not self.is_truncated(error):
+                    raise
+                # A container running past the buffer is read item by item, so
+                # only the item cut by the end of the buffer is decoded again
+                if char == "{":
+                    return {key: self.read_value() for key in self.iter_object()}
+                if char == "[":
+                    return [self.read_value() for _ in self.iter_array()]
+                if char != '"':
+                    raise
+                self.fill_string()
+                string_filled = True
+
+    def iter_object(self):
+        """Yields each key, the caller must consume its value before continuing"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def iter_array(self):
+        """Yields before each item, the caller must consume the item before continuing"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+
+class QuillAsciiDecoder(object):
+    """Streams Quill.qa back into Quill.qbin, returning the matching scene data
+
+    Values are packed in the order they appear, and every DataFileOffset (and
+    drawing BoundingBox) in the scene data is rewritten to match.
+    """
+
+    def __init__(self, infile, chunk_size=None):
+        self.reader = QuillJsonStreamReader(infile, chunk_size=chunk_size)
+
+    def run(self, binary_file):
+        import numpy as np
+
+        scene_data = OrderedDict()
+        headers = {}
+        data_file_offsets = {}
+        bounding_boxes = {}
+        highest_global_stroke_id = 0
+
+        headers_dtype = QuillSceneObject.get_header_dtype()
+        binary_file.write(bytes(headers_dtype.itemsize))
+
+        for key in self.reader.iter_object():
+            if key != "Data":
+                scene_data[key] = self.reader.read_value()
+                continue
+            for data_key in self.reader.iter_object():
+                if data_key == "Headers":
+                    headers = self.reader.read_value()
+                elif data_key == "Values":
+                    for _ in self.reader.iter_array():
+                        offset = binary_file.tell()
+                        data_file_offset, bounding_box, stroke_id = self.read_data_value(binary_file)
+                        data_file_offsets[data_file_offset] = offset
+                        bounding_boxes[data_file_offset] = bounding_box
+                        highest_global_stroke_id = max(highest_global_stroke_id, stroke_id)
+                else:
+                    self.reader.read_value()
+
+        headers = {**headers, "highest_global_stroke_id": max(
+            headers.get("highest_global_stroke_id", 0),
+            highest_global_stroke_id,
+        )}
+        header_record = np.zeros(1, dtype=headers_dtype)
+        for field in headers_dtype.names:
+            header_record[field] = headers.get(field, 0)
+        end = binary_file.tell()
+        binary_file.seek(0)
+        binary_file.write(header_record.tobytes())
+        binary_file.seek(end)
+
+        self.relocate_layer(scene_data["Sequence"]["RootLayer"], data_file_offsets, bounding_boxes)
+        return QuillSceneData(scene_data)
+
+    def read_data_value(self, binary_file):
+        import numpy as np
+
+        data_file_offset = None
+        value_type = None
+        bounding_box = None
+        highest_global_stroke_id = 0
+        strokes_written = False
+        headers = None
+        pixels = None
+        for key in self.reader.iter_object():
+            if key == "strokes":
+                bounding_box, highest_global_stroke_id = self.read_strokes(binary_file)
+                strokes_written = True
+            elif key == "headers":
+                headers = self.reader.read_value()
+            elif key == "pixels":
+                pixels = base64.b64decode(self.reader.read_value())
+            else:
+                value = self.reader.read_value()
+                if key == "DataFileOffset":
+                    data_file_offset = value
+                elif key == "Type":
+                    value_type = value
+
+        if data_file_offset is None:
+            raise ValueError("Quill.qa data value without a DataFileOffset")
+        if value_type == "Picture":
+            if headers is None or pixels is None:
+                raise ValueError("Quill.qa picture {} without headers/pixels".format(data_file_offset))
+            headers_dtype = QuillPictureObject.get_header_dtype()
+            header_record = np.zeros(1, dtype=headers_dtype)
+            for field in headers_dtype.names:
+                header_record[field] = headers[field]
+            binary_file.write(header_record.tobytes())
+            binary_file.write(pixels)
+        elif value_type != "Drawing":
+            raise ValueError("Unknown Quill.qa data value type '{}'".format(value_type))
+        elif not strokes_written:
+            binary_file.write(struct.pack("<i", 0))
+        return data_file_offset, bounding_box, highest_global_stroke_id
+
+    @classmethod
+    def pack_vertices(cls, stroke_vertices):
+        """Decoded vertices (dicts), packed into one preallocated vertex record array
+
+        Every field is filled in a single np.fromiter pass over the vertices
+        (itemgetter and chain iterate in C), no Python code runs per vertex.
+        """
+        import numpy as np
+
+        vertex_dtype = QuillDrawingArrays.get_vertex_dtype()
+        num_vertices = len(stroke_vertices)
+        vertices = np.empty(num_vertices, dtype=vertex_dtype)
+        for field in vertex_dtype.names:
+            field_dtype = vertex_dtype[field]
+            get_field = operator.itemgetter(field)
+            values = map(get_field, stroke_vertices)
+            size = 1
+            if field_dtype.shape:
+                size, = field_dtype.shape
+                # Items are flattened, a short one would shift every following vertex
+                lengths = np.fromiter(map(len, map(get_field, stroke_vertices)), dtype=np.int64, count=num_vertices)
+                if (lengths != size).any():
+                    raise ValueError("Every vertex '{}' needs {} items".format(field, size))
+                values = itertools.chain.from_iterable(values)
+            vertices[field] = np.fromiter(values, dtype=field_dtype.base, count=num_vertices * size).reshape(
+                (num_vertices,) + field_dtype.shape)
+        return vertices
+
+    def read_strokes(self, binary_file):
+        import numpy as np
+
+        stroke_dtype = QuillDrawingArrays.get_stroke_dtype()
+        num_strokes_offset = binary_file.tell()
+        binary_file.write(bytes(QuillDrawingArrays.NUM_STROKES_SIZE))
+
+        num_strokes = 0
+        bounding_box = None
+        highest_global_stroke_id = 0
+        for _ in self.reader.iter_array():
+            stroke = self.reader.read_value()
+            vertices = self.pack_vertices(stroke.pop("vertices"))
+
+            header = np.zeros(1, dtype=stroke_dtype)
+            for field in stroke_dtype.names:
+                if field not in ("brush_type", "num_vertices"):
+                    header[field] = stroke[field]
+            header["brush_type"] = QuillBrushType.from_name(stroke["brush_type"]).code
+            header["num_vertices"] = len(vertices)
+
+            binary_file.write(header.tobytes())
+            binary_file.write(vertices.tobytes())
+
+            stroke_bounding_box = header["stroke_bounding_box"][0]
+            if bounding_box is None:
+                bounding_box = stroke_bounding_box.copy()
+            else:
+                bounding_box[0::2] = np.minimum(bounding_box[0::2], stroke_bounding_box[0::2])
+                bounding_box[1::2] = np.maximum(bounding_box[1::2], stroke_bounding_box[1::2])
+            highest_global_stroke_id = max(highest_global_stroke_id, stroke["global_stroke_id"])
+            num_strokes += 1
+
+        end = binary_file.tell()
+        binary_file.seek(num_strokes_offset)
+        binary_file.write(struct.pack("<i", num_strokes))
+        binary_file.seek(end)
+        return (bounding_box.tolist() if bounding_box is not None else None), highest_global_stroke_id
+
+    @classmethod
+    def relocate_layer(cls, layer_data, data_file_offsets, bounding_boxes):
+        implementation = layer_data.get("Implementation", {})
+        if layer_data["Type"] == "Paint":
+            for drawing in implementation["Drawings"]:
+                data_file_offset = drawing["DataFileOffset"]
+                if data_file_offset not in data_file_offsets:
+                    raise ValueError("No Quill.qa data for DataFileOffset {}".format(data_file_offset))
+                drawing["DataFileOffset"] = QuillSceneData.format_data_file_offset(data_file_offsets[data_file_offset])
+                if bounding_boxes[data_file_offset] is not None:
+                    # Quill.json keeps bounding boxes to 6 decimal places
+                    drawing["BoundingBox"] = [round(value, 6) for value in bounding_boxes[data_file_offset]]
+        elif layer_data["Type"] == "Picture":
+            data_file_offset = implementation["DataFileOffset"]
+            if data_file_offset not in data_file_offsets:
+                raise ValueError("No Quill.qa data for DataFileOffset {}".format(data_file_offset))
+            implementation["DataFileOffset"] = QuillSceneData.format_data_file_offset(data_file_offsets[data_file_offset])
+        elif layer_data["Type"] == "Group":
+            for child_layer in implementation["Children"]:
+                cls.relocate_layer(child_layer, data_file_offsets, bounding_boxes)
+
+
 class QuillObjectJsonEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, QuillObject):
@@ -114,15 +534,18 @@ class QuillBinaryEncoder(object):
         self.quill_scene = quill_scene
 
     def run(self):
-        size = self.quill_scene.quill_file_obj.get_binary_size()
-        print("Estimated Quill object size: {} bytes of data".format(size))
-        binary_data = self.encode(self.quill_scene.quill_file_obj)
-        binary_data_obj = QuillBinaryData(binary_data)
-        print("Encoded: {} bytes".format(len(binary_data)))
+        quill_scene_obj = self.quill_scene.quill_scene_obj
+        # The scene's values (drawings, pictures) are laid out in Quill.qbin offset order
+        binary_parts = self.encode(quill_scene_obj)
+        for quill_object in quill_scene_obj.get_values():
+            binary_parts += self.encode(quill_object)
+        binary_data_obj = QuillBinaryData(b''.join(binary_parts))
         return binary_data_obj, self.quill_scene.scene_data_obj
 
-    def encode(self, quill_object):
-        binary = b''
+    def encode(self, quill_object, binary_parts=None):
+        """Appends the encoded object to binary_parts (joined once, by run)"""
+        if binary_parts is None:
+            binary_parts = []
         for item in quill_object.get_offset_items():
             k = item["field"]
             if not hasattr(quill_object, k):
@@ -133,15 +556,21 @@ class QuillBinaryEncoder(object):
             if isinstance(quill_object_attr, list):
                 child_items = quill_object_attr
                 for child_item in child_items:
-                    binary += self.encode(child_item)
+                    if isinstance(child_item, QuillObject):
+                        self.encode(child_item, binary_parts)
+                    else:
+                        binary_parts.append(self.encode_value(item["type"], child_item))
             elif isinstance(quill_object_attr, QuillObject):
-                binary += self.encode(quill_object_attr)
+                self.encode(quill_object_attr, binary_parts)
+            elif hasattr(quill_object_attr, "tobytes"):
+                # Picture pixels
+                binary_parts.append(quill_object_attr.tobytes())
             elif hasattr(quill_object_attr, "encode"):
-                binary += quill_object_attr.encode()
+                binary_parts.append(quill_object_attr.encode())
             else:
-                binary += self.encode_value(item["type"], quill_object_attr)
+                binary_parts.append(self.encode_value(item["type"], quill_object_attr))
 
-        return binary
+        return binary_parts
 
     @classmethod
     def encode_value(cls, value_type, value):
@@ -172,21 +601,16 @@ class QuillBinaryDecoder(object):
         binary_chunk_obj, offset = self.binary_data_obj.chunk(offset, quill_scene_headers_size)
         quill_scene_headers = QuillSceneObject.decode_headers(binary_chunk_obj)
         quill_scene_obj = QuillSceneObject(**quill_scene_headers)
-        quill_file_value_offsets = self.scene_data_obj.get_quill_file_value_offsets()
 
         # Here we add value offsets, as these are determined by the scene_data,
         # unlike other QuillObjects, which are determined by populated headers
-        indices = [offset_item["offset"] for offset_item in quill_file_value_offsets]
-        indices += [self.binary_data_obj.get_size()]
-        sizes = [j-i for i, j in zip(indices[:-1], indices[1:])]
-        for file_offset, file_size, file_offset_item in zip(indices, sizes, quill_file_value_offsets):
-            binary_chunk_obj, _ = self.binary_data_obj.chunk(file_offset, file_size)
+        quill_file_value_ranges = self.scene_data_obj.get_quill_file_value_ranges(self.binary_data_obj.get_size())
+        for file_offset_item in quill_file_value_ranges:
+            binary_chunk_obj, _ = self.binary_data_obj.chunk(file_offset_item["offset"], file_offset_item["size"])
             quill_object_cls = QuillObject.get_class_by_type(file_offset_item["type"])
-            quill_object = quill_object_cls.decode(binary_chunk_obj)
+            quill_object, _ = quill_object_cls.decode(binary_chunk_obj)
             quill_scene_obj.add_value(quill_object)
 
-        print(quill_scene_obj.get_values()[0].get_values()[1].get_values())
-
         return QuillScene(scene_data_obj=self.scene_data_obj, quill_scene_obj=quill_scene_obj)
 
     @classmethod
@@ -205,10 +629,10 @@ class QuillBinaryDecoder(object):
     @classmethod
     def decode_primitive(cls, value_type, binary_chunk_obj):
         if not cls.is_primitive_type(value_type):
-            raise Error("''{}'' is not a primitive type".format(value_type))
+            raise ValueError("''{}'' is not a primitive type".format(value_type))
         if binary_chunk_obj.get_size() != value_type.size:
-            raise Error("binary_chunk_obj not equal to type size ({} != {})".format(
-                len(binary_chunk_obj),
+            raise ValueError("binary_chunk_obj not equal to type size ({} != {})".format(
+                binary_chunk_obj.get_size(),
                 value_type.size,
             ))
         return cls.DECODER_PRIMITIVE_MAPPINGS[value_type](binary_chunk_obj)
@@ -220,6 +644,15 @@ class QuillObject(object):
     # Value offsets can change
     VALUE_OFFSETS = []
     TYPE = None
+    STRUCT_FORMATS = {
+        QuillType.CHAR: "B",
+        QuillType.INT16: "h",
+        QuillType.INT32: "i",
+        QuillType.FLOAT: "f",
+        QuillType.BOOL: "?",
+        QuillType.BRUSH_TYPE: "h",
+        QuillType.BBOX: "6f",
+    }
 
     def __init__(self, **args):
         header_fields = self.get_header_fields()
@@ -235,18 +668,21 @@ class QuillObject(object):
         binary_size += self.get_values_binary_size()
         return binary_size
 
-    def get_values_binary_size():
+    def get_values_binary_size(self):
         binary_size = 0
-        for value in values:
-            value_type = value.get_type()
-            if QuillBinaryDecoder.is_primitive_type(value_type):
-                binary_size += value.size
-            else:
-                binary_size += value.get_binary_size()
+        for item in self.get_value_offset_items():
+            value = getattr(self, item["field"], None)
+            for child_value in (value if isinstance(value, list) else [value]):
+                if isinstance(child_value, QuillObject):
+                    binary_size += child_value.get_binary_size()
+                elif hasattr(child_value, "nbytes"):
+                    binary_size += child_value.nbytes
+                elif child_value is not None:
+                    binary_size += item["type"].size
         return binary_size
 
     def get_type(self):
-        return TYPE
+        return self.TYPE
 
     @classmethod
     def compute_header_binary_size(cls):
@@ -257,6 +693,25 @@ class QuillObject(object):
             binary_size += item["type"].size
         return binary_size
 
+    @classmethod
+    def get_header_dtype(cls):
+        """Packed numpy dtype with the same layout as the binary headers"""
+        import numpy as np
+
+        return np.dtype([(item["field"],) + item["type"].dtype for item in cls.get_header_offset_items()])
+
+    @classmethod
+    def get_header_struct(cls):
+        """struct.Struct with the same layout as the binary headers (a BBOX unpacks as six floats)"""
+        return struct.Struct("<" + "".join(cls.STRUCT_FORMATS[item["type"]] for item in cls.get_header_offset_items()))
+
+    @classmethod
+    def get_values_dtype(cls):
+        """Packed numpy dtype with the same layout as the (fixed size) binary values"""
+        import numpy as np
+
+        return np.dtype([(item["field"],) + item["type"].dtype for item in cls.VALUE_OFFSETS])
+
     @classmethod
     def decode_headers(cls, binary_data_obj):
         """Because headers are deterministic, this can be a class method"""
@@ -264,34 +719,45 @@ class QuillObject(object):
         headers = {}
         for header_offset_item in cls.get_header_offset_items():
             field = header_offset_item["field"]
-            print(field)
-            object_cls = QuillObject.get_class_by_type(header_offset_item["type"])
-            binary_chunk_obj, offset = binary_data_obj.chunk(offset, header_offset_item["type"].size)
-            headers[field] = QuillBinaryDecoder.decode(binary_chunk_obj)
+            headers[field], offset = cls.decode_value(header_offset_item["type"], binary_data_obj, offset)
         return headers
 
     @classmethod
     def decode(cls, binary_data_obj):
+        """Returns the decoded object and the number of bytes it spans"""
         headers_size = cls.compute_header_binary_size()
         headers_binary_chunk_obj, offset = binary_data_obj.chunk(0, headers_size)
         headers = cls.decode_headers(headers_binary_chunk_obj)
-        print(headers)
         quill_object = cls(**headers)
-        values_binary_chunk_obj, offset = binary_data_obj.chunk(offset, None)
-        quill_object.decode_values(values_binary_chunk_obj)
-        return quill_object
+        values_binary_chunk_obj, _ = binary_data_obj.chunk(offset, None)
+        offset += quill_object.decode_values(values_binary_chunk_obj)
+        return quill_object, offset
+
+    @classmethod
+    def decode_value(cls, value_type, binary_data_obj, offset):
+        if QuillBinaryDecoder.is_primitive_type(value_type):
+            binary_chunk_obj, offset = binary_data_obj.chunk(offset, value_type.size)
+            return QuillBinaryDecoder.decode_primitive(value_type, binary_chunk_obj), offset
+        quill_object_cls = QuillObject.get_class_by_type(value_type)
+        binary_chunk_obj, _ = binary_data_obj.chunk(offset, None)
+        quill_object, size = quill_object_cls.decode(binary_chunk_obj)
+        return quill_object, offset + size
 
     def decode_values(self, binary_data_obj):
+        """Sets each value as an attribute (a list for counted values), returns the bytes consumed"""
         offset = 0
         for value_offset_item in self.get_value_offset_items():
-            print(value_offset_item)
-            if QuillBinaryDecoder.is_primitive_type(value_offset_item["type"]):
-                binary_chunk_obj, offset = binary_data_obj.chunk(offset, value_offset_item["type"].size)
-                self.values.append(QuillBinaryDecoder.decode_primitive(value_offset_item["type"], binary_chunk_obj))
+            if "count" in value_offset_item:
+                value = []
+                for _ in range(getattr(self, value_offset_item["count"])):
+                    child_value, offset = self.decode_value(value_offset_item["type"], binary_data_obj, offset)
+                    value.append(child_value)
+                self.values += value
             else:
-                quill_object_cls = QuillObject.get_class_by_type(value_offset_item["type"])
-                quill_object = quill_object_cls.decode(binary_data_obj)
-                self.values.append(quill_object)
+                value, offset = self.decode_value(value_offset_item["type"], binary_data_obj, offset)
+                self.values.append(value)
+            setattr(self, value_offset_item["field"], value)
+        return offset
 
     @classmethod
     def get_class_by_type(cls, type):
@@ -333,21 +799,159 @@ class QuillSceneObject(QuillObject):
             {"field": "unknown0", "type": QuillType.INT32, "description": "Unknown"},
         ]
 
+        def get_values_binary_size(self):
+            # Values are positioned by the scene data rather than VALUE_OFFSETS
+            return sum(value.get_binary_size() for value in self.values)
+
 class QuillDrawingObject(QuillObject):
     TYPE = QuillType.DRAWING
     HEADER_OFFSETS = [
         {"field": "num_strokes", "type": QuillType.INT32, "description": "Number of strokes in the drawing"},
     ]
     VALUE_OFFSETS = [
-        {"field": "strokes", "type": QuillType.STROKE, "description": "A stroke item"},
+        {"field": "strokes", "type": QuillType.STROKE, "count": "num_strokes", "description": "Stroke items"},
     ]
 
-    def decode_values(self, binary_data_obj):
-        offset = 0
-        print(self.num_strokes)
-        self.VALUE_OFFSETS = self.VALUE_OFFSETS * self.num_strokes
-        print(self.VALUE_OFFSETS)
-        super().decode_values(binary_data_obj)
+
+class QuillDrawingArrays(object):
+    """Columnar view of a drawing: one record per stroke header, one per vertex
+
+    Decoding walks the stroke headers (which carry the vertex counts) and then
+    gathers every header and vertex in bulk, rather than building a
+    QuillObject per vertex.
+    """
+    NUM_STROKES_SIZE = 4
+    # What Quill.json holds as the BoundingBox of a drawing without strokes
+    EMPTY_BOUNDING_BOX = [1e20, -1e20, 1e20, -1e20, 1e20, -1e20]
+
+    def __init__(self, strokes, vertices):
+        self.strokes = strokes
+        self.vertices = vertices
+
+    @classmethod
+    def get_stroke_dtype(cls):
+        return QuillStrokeObject.get_header_dtype()
+
+    @classmethod
+    def get_vertex_dtype(cls):
+        return QuillVertexObject.get_values_dtype()
+
+    @classmethod
+    def empty(cls):
+        import numpy as np
+
+        return cls(
+            np.empty(0, dtype=cls.get_stroke_dtype()),
+            np.empty(0, dtype=cls.get_vertex_dtype()),
+        )
+
+    @classmethod
+    def get_stroke_offsets(cls, binary_data_obj):
+        """Byte offset of every stroke header within the drawing"""
+        data = binary_data_obj.get_data()
+        stroke_size = cls.get_stroke_dtype().itemsize
+        vertex_size = cls.get_vertex_dtype().itemsize
+        num_vertices_offset = cls.get_stroke_dtype().fields["num_vertices"][1]
+        num_strokes, = struct.unpack_from("<i", data, 0)
+        stroke_offsets = []
+        offset = cls.NUM_STROKES_SIZE
+        for _ in range(num_strokes):
+            stroke_offsets.append(offset)
+            num_vertices, = struct.unpack_from("<i", data, offset + num_vertices_offset)
+            offset += stroke_size + num_vertices * vertex_size
+        return stroke_offsets, offset
+
+    @classmethod
+    def gather_strokes(cls, binary_data_obj):
+        """(stroke headers, drawing bytes, index of every stroke header byte in them)"""
+        import numpy as np
+
+        stroke_dtype = cls.get_stroke_dtype()
+        stroke_offsets, size = cls.get_stroke_offsets(binary_data_obj)
+        if size > binary_data_obj.get_size():
+            raise ValueError("Drawing is truncated ({} > {} bytes)".format(size, binary_data_obj.get_size()))
+
+        raw = np.frombuffer(binary_data_obj.get_data(), dtype=np.uint8, count=size)
+        header_indices = (np.asarray(stroke_offsets, dtype=np.int64)[:, None]
+            + np.arange(stroke_dtype.itemsize, dtype=np.int64)).ravel()
+        return raw[header_indices].view(stroke_dtype), raw, header_indices
+
+    @classmethod
+    def decode_strokes(cls, binary_data_obj):
+        """The stroke headers alone, vertices are skipped rather than copied out"""
+        strokes, _, _ = cls.gather_strokes(binary_data_obj)
+        return strokes
+
+    @classmethod
+    def decode(cls, binary_data_obj):
+        import numpy as np
+
+        strokes, raw, header_indices = cls.gather_strokes(binary_data_obj)
+        # Everything that is not the stroke count or a stroke header is vertex data
+        vertex_mask = np.ones(len(raw), dtype=bool)
+        vertex_mask[:cls.NUM_STROKES_SIZE] = False
+        vertex_mask[header_indices] = False
+        vertices = raw[vertex_mask].view(cls.get_vertex_dtype())
+        return cls(strokes, vertices)
+
+    def get_binary_size(self):
+        return (self.NUM_STROKES_SIZE
+            + self.strokes.nbytes
+            + self.vertices.nbytes)
+
+    def get_vertex_offsets(self):
+        """Index of the first vertex of every stroke, plus the total vertex count"""
+        import numpy as np
+
+        vertex_offsets = np.zeros(len(self.strokes) + 1, dtype=np.int64)
+        np.cumsum(self.strokes["num_vertices"], out=vertex_offsets[1:])
+        return vertex_offsets
+
+    def get_stroke_vertices(self, stroke_index):
+        vertex_offsets = self.get_vertex_offsets()
+        return self.vertices[vertex_offsets[stroke_index]:vertex_offsets[stroke_index + 1]]
+
+    def get_bounding_box(self):
+        """Union of the stroke bounding boxes, in Quill's [min_x, max_x, min_y, max_y, min_z, max_z] order"""
+        return self.get_strokes_bounding_box(self.strokes)
+
+    @classmethod
+    def get_strokes_bounding_box(cls, strokes):
+        """get_bounding_box of stroke headers alone (e.g. from decode_strokes), None without strokes"""
+        import numpy as np
+
+        if not len(strokes):
+            return None
+        bboxes = strokes["stroke_bounding_box"]
+        bbox = np.empty(6, dtype=np.float32)
+        bbox[0::2] = bboxes[:, 0::2].min(axis=0)
+        bbox[1::2] = bboxes[:, 1::2].max(axis=0)
+        return bbox.tolist()
+
+    def encode(self):
+        import numpy as np
+
+        stroke_dtype = self.get_stroke_dtype()
+        vertex_offsets = self.get_vertex_offsets()
+        if vertex_offsets[-1] != len(self.vertices):
+            raise ValueError("Stroke vertex counts do not match the number of vertices ({} != {})".format(
+                vertex_offsets[-1],
+                len(self.vertices),
+            ))
+        stroke_offsets = (self.NUM_STROKES_SIZE
+            + np.arange(len(self.strokes), dtype=np.int64) * stroke_dtype.itemsize
+            + vertex_offsets[:-1] * self.get_vertex_dtype().itemsize)
+        header_indices = (stroke_offsets[:, None]
+            + np.arange(stroke_dtype.itemsize, dtype=np.int64)).ravel()
+
+        binary = np.empty(self.get_binary_size(), dtype=np.uint8)
+        binary[:self.NUM_STROKES_SIZE] = np.frombuffer(struct.pack("<i", len(self.strokes)), dtype=np.uint8)
+        binary[header_indices] = np.ascontiguousarray(self.strokes, dtype=stroke_dtype).view(np.uint8)
+        vertex_mask = np.ones(len(binary), dtype=bool)
+        vertex_mask[:self.NUM_STROKES_SIZE] = False
+        vertex_mask[header_indices] = False
+        binary[vertex_mask] = np.ascontiguousarray(self.vertices, dtype=self.get_vertex_dtype()).view(np.uint8)
+        return binary.tobytes()
 
 
 class QuillStrokeObject(QuillObject):
@@ -362,17 +966,9 @@ class QuillStrokeObject(QuillObject):
         {"field": "num_vertices", "type": QuillType.INT32, "description": "Number of vertices in the stroke"},
     ]
     VALUE_OFFSETS =[
-        {"field": "vertices", "type": QuillType.VERTEX, "description": "A vertex item"},
+        {"field": "vertices", "type": QuillType.VERTEX, "count": "num_vertices", "description": "Vertex items"},
     ]
 
-    def decode_values(self, binary_data_obj):
-        offset = 0
-        print(self.num_vertices)
-        self.VALUE_OFFSETS = self.VALUE_OFFSETS * self.num_vertices
-        print(self.VALUE_OFFSETS)
-        super().decode_values(binary_data_obj)
-
-
 
 class QuillBBoxObject(QuillObject):
     TYPE = QuillType.BBOX
@@ -457,14 +1053,40 @@ class QuillPictureObject(QuillObject):
             return None
 
     @classmethod
-    def decode_image(cls, binary_chunk_obj, image_width, image_height, num_channels):
+    def decode_pixels(cls, binary_chunk_obj, image_width, image_height, num_channels):
+        import numpy as np
+
         size = int(image_width * image_height * num_channels)
-        pixel_data = np.frombuffer(binary_chunk_obj.get_data(), dtype=np.uint8)
+        pixel_data = np.frombuffer(binary_chunk_obj.get_data(), dtype=np.uint8, count=size)
         # PIL takes in image data in (image_height, image_width, num_channels)
-        image_data = pixel_data.reshape(image_height, image_width, num_channels)
+        return pixel_data.reshape(image_height, image_width, num_channels)
+
+    @classmethod
+    def decode_image(cls, binary_chunk_obj, image_width, image_height, num_channels):
+        from PIL import Image
+
+        image_data = cls.decode_pixels(binary_chunk_obj, image_width, image_height, num_channels)
         image = Image.fromarray(image_data)
         return image
 
+    @classmethod
+    def decode_arrays(cls, binary_chunk_obj):
+        """Headers and a (zero copy) pixel array, without building a PIL image"""
+        import numpy as np
+
+        headers_dtype = cls.get_header_dtype()
+        headers, = np.frombuffer(binary_chunk_obj.get_data(), dtype=headers_dtype, count=1)
+        headers = {field: headers[field].tolist() for field in headers_dtype.names}
+        pixel_type = cls(**headers).get_pixel_type()
+        pixels_chunk_obj, _ = binary_chunk_obj.chunk(headers_dtype.itemsize, None)
+        pixels = cls.decode_pixels(
+            pixels_chunk_obj,
+            headers["image_width"],
+            headers["image_height"],
+            pixel_type.size,
+        )
+        return headers, pixels
+
 
     @classmethod
     def save_image(cls, image, image_path):
@@ -475,14 +1097,21 @@ class QuillPictureObject(QuillObject):
     def decode_values(self, binary_data_obj):
         pixel_sequence_length = self.image_width * self.image_height
         pixel_type = self.get_pixel_type()
-        binary_chunk_obj, _ = binary_data_obj.chunk(0, pixel_sequence_length * pixel_type.size)
-        image = self.decode_image(
+        binary_chunk_obj, offset = binary_data_obj.chunk(0, pixel_sequence_length * pixel_type.size)
+        # PIL images are only built on request (get_image), pixel work happens in quillustrate.pictures
+        self.pixels = self.decode_pixels(
             binary_chunk_obj,
             self.image_width,
             self.image_height,
             pixel_type.size,
         )
-        self.values.append(image)
+        self.values.append(self.pixels)
+        return offset
+
+    def get_image(self):
+        from PIL import Image
+
+        return Image.fromarray(self.pixels)
 
 class QuillSceneData(object):
     def __init__(self, data):
@@ -498,28 +1127,67 @@ class QuillSceneData(object):
     def generate_picture_offset(self, offset):
         return {"field": "picture", "offset": offset, "type": QuillType.PICTURE, "description": "Picture"}
 
-    def get_layer_value_offsets(self, layer_data, layer_path):
-        child_layers = layer_data["Implementation"]["Children"]
+    def get_root_layer(self):
+        return self.data["Sequence"]["RootLayer"]
+
+    def iter_layers(self):
+        """(layer path, layer data, parent layer path) of every layer, parents before their children
+
+        The root layer comes first, with a parent layer path of None.
+        """
+        root_layer_data = self.get_root_layer()
+        stack = [(root_layer_data["Name"], root_layer_data, None)]
+        while stack:
+            layer_path, layer_data, parent_layer_path = stack.pop()
+            yield layer_path, layer_data, parent_layer_path
+            if layer_data["Type"] == "Group":
+                child_layers = layer_data["Implementation"]["Children"]
+                stack += [
+                    (join_layer_path(layer_path, child_layer["Name"]), child_layer, layer_path)
+                    for child_layer in reversed(child_layers)
+                ]
+
+    def iter_layer_values(self):
+        """(layer path, layer type, index, drawing or picture data) of every value, in layer tree order
+
+        index is the position of the drawing in its layer's Drawings (0 for
+        pictures), the value data holds its DataFileOffset.
+        """
+        for layer_path, layer_data, _ in self.iter_layers():
+            if layer_data["Type"] == "Paint":
+                for index, drawing in enumerate(layer_data["Implementation"]["Drawings"]):
+                    yield layer_path, "Paint", index, drawing
+            elif layer_data["Type"] == "Picture":
+                yield layer_path, "Picture", 0, layer_data["Implementation"]
+
+    def get_quill_file_value_offsets(self):
         quill_file_value_offsets = []
-        for child_layer in child_layers:
-            child_layer_path = os.path.join(layer_path, child_layer["Name"])
-            if child_layer["Type"] == "Paint":
-                for drawing in child_layer["Implementation"]["Drawings"]:
-                    offset = bytes.fromhex(drawing["DataFileOffset"])
-                    offset = int(drawing["DataFileOffset"], 16)
-                    self.files[offset] = {"path": child_layer_path}
-                    quill_file_value_offsets.append(self.generate_drawing_offset(offset))
-            elif child_layer["Type"] == "Picture":
-                offset = bytes.fromhex(child_layer["Implementation"]["DataFileOffset"])
-                offset = int(child_layer["Implementation"]["DataFileOffset"], 16)
-                self.files[offset] = {"path": child_layer_path}
+        for layer_path, layer_type, index, value_data in self.iter_layer_values():
+            offset = int(value_data["DataFileOffset"], 16)
+            self.files[offset] = {"path": layer_path, "index": index}
+            if layer_type == "Paint":
+                quill_file_value_offsets.append(self.generate_drawing_offset(offset))
+            else:
                 quill_file_value_offsets.append(self.generate_picture_offset(offset))
         return quill_file_value_offsets
 
-    def get_quill_file_value_offsets(self):
-        root_layer_data = self.data["Sequence"]["RootLayer"]
-        quill_file_value_offsets = self.get_layer_value_offsets(root_layer_data, root_layer_data["Name"])
-        return quill_file_value_offsets
+    def get_quill_file_value_ranges(self, binary_size):
+        """Value offsets sorted by position in Quill.qbin, with the size each one spans"""
+        quill_file_value_offsets = sorted(self.get_quill_file_value_offsets(), key=lambda item: item["offset"])
+        indices = [offset_item["offset"] for offset_item in quill_file_value_offsets] + [binary_size]
+        quill_file_value_ranges = []
+        for offset_item, end in zip(quill_file_value_offsets, indices[1:]):
+            quill_file_value_ranges.append({
+                **offset_item,
+                "size": end - offset_item["offset"],
+                "path": self.files[offset_item["offset"]]["path"],
+                "index": self.files[offset_item["offset"]]["index"],
+            })
+        return quill_file_value_ranges
+
+    @classmethod
+    def format_data_file_offset(cls, offset):
+        return "{:016X}".format(offset)
 
 
 class QuillPrimitiveObject(QuillObject):
@@ -528,7 +1196,8 @@ class QuillPrimitiveObject(QuillObject):
 
 class QuillBinaryData(object):
     def __init__(self, binary_data):
-        self.binary_data = binary_data
+        # A memoryview, so chunks (and arrays over them) do not copy
+        self.binary_data = memoryview(binary_data)
 
     def get_data(self):
         return self.binary_data
@@ -550,6 +1219,7 @@ class QuillScene(object):
         self.quill_scene_obj = quill_scene_obj
 
 class QuillProject(object):
+    @profiled("QuillProject.load")
     def __init__(self, proj_dir):
 
         input_state_json_path = os.path.join(proj_dir, 'State.json')
@@ -561,15 +1231,33 @@ class QuillProject(object):
         input_quill_json_path = os.path.join(proj_dir, 'Quill.json')
         with open(input_quill_json_path, 'r') as json_file:
             scene_data = json.load(json_file)
-        scene_data_obj = QuillSceneData(scene_data)
+        self.scene_data_obj = QuillSceneData(scene_data)
         input_quill_qbin_path = os.path.join(proj_dir, 'Quill.qbin')
         with open(input_quill_qbin_path, 'rb') as binary_file:
             binary_data = binary_file.read()
-        binary_data_obj = QuillBinaryData(binary_data)
+        self.binary_data_obj = QuillBinaryData(binary_data)
+        self._quill_scene = None
+
+    @property
+    def quill_scene(self):
+        # Decoded on first use, columnar output only needs the raw value ranges
+        if self._quill_scene is None:
+            # State data is not necessary to decode
+            with profiling_section("QuillProject.decode"):
+                self._quill_scene = QuillBinaryDecoder(self.binary_data_obj, self.scene_data_obj).run()
+        return self._quill_scene
 
-        # State data is not necessary to decode
-        self.quill_scene = QuillBinaryDecoder(binary_data_obj, scene_data_obj).run()
+    def get_quill_file_value_ranges(self):
+        return self.scene_data_obj.get_quill_file_value_ranges(self.binary_data_obj.get_size())
 
+    def get_quill_scene_headers(self):
+        import numpy as np
+
+        headers_dtype = QuillSceneObject.get_header_dtype()
+        headers, = np.frombuffer(self.binary_data_obj.get_data(), dtype=headers_dtype, count=1)
+        return {field: headers[field].tolist() for field in headers_dtype.names}
+
+    @profiled("QuillProject.write")
     def write(self, output_dir):
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -582,6 +1270,7 @@ class QuillProject(object):
         with open(state_json_path, 'w') as outfile:
             json.dump(self.state_data, outfile, indent=1)
 
+    @profiled("QuillProject.write_quill_binary")
     def write_quill_binary(self, output_dir):
         binary_data_obj, scene_data_obj = QuillBinaryEncoder(self.quill_scene).run()
         quill_json_path = os.path.join(output_dir, 'Quill.json')
@@ -591,14 +1280,230 @@ class QuillProject(object):
         with open(quill_qbin_path, 'wb') as binary_file:
             binary_file.write(binary_data_obj.get_data())
 
-    def write_images(self, output_dir):
-        print(self.quill_scene.scene_data_obj.images)
+    def get_pictures(self):
+        """(layer path, pixels) for every picture layer, pixels are views into Quill.qbin"""
+        for value_range in self.get_quill_file_value_ranges():
+            if value_range["type"] != QuillType.PICTURE:
+                continue
+            binary_chunk_obj, _ = self.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            _, pixels = QuillPictureObject.decode_arrays(binary_chunk_obj)
+            yield value_range["path"], pixels
+
+    @profiled("QuillProject.write_images")
+    def write_images(self, output_dir, picture_processor=None):
+        from quillustrate.pictures import QuillPictureProcessor
+
+        if picture_processor is None:
+            picture_processor = QuillPictureProcessor()
+        pictures = ((layer_path_to_file_name(path), pixels) for path, pixels in self.get_pictures())
+        return picture_processor.write(pictures, os.path.join(output_dir, 'Pictures'))
 
+    @profiled("QuillProject.write_quill_ascii")
     def write_quill_ascii(self, output_dir):
-        quill_json = QuillJsonEncoder(self.quill_scene).run()
         quill_qa_path = os.path.join(output_dir, 'Quill.qa')
         with open(quill_qa_path, 'w') as outfile:
-            json.dump(quill_json, outfile, indent=1)
+            QuillAsciiEncoder(self.scene_data_obj, self.binary_data_obj).run(outfile)
+
+    @profiled("QuillProject.write_quill_columnar")
+    def write_quill_columnar(self, output_dir):
+        columnar_dir = os.path.join(output_dir, QuillColumnarProject.DIR_NAME)
+        if not os.path.exists(columnar_dir):
+            os.makedirs(columnar_dir)
+
+        layers = OrderedDict()
+        for index, value_range in enumerate(self.get_quill_file_value_ranges()):
+            binary_chunk_obj, _ = self.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            if value_range["type"] == QuillType.DRAWING:
+                layer = layers.setdefault(value_range["path"], {
+                    "Path": value_range["path"],
+                    "Type": "Paint",
+                    "Drawings": [],
+                })
+                layer["Drawings"].append(
+                    (value_range["index"], self.write_columnar_drawing(columnar_dir, index, value_range, binary_chunk_obj))
+                )
+            elif value_range["type"] == QuillType.PICTURE:
+                layers[value_range["path"]] = {
+                    "Path": value_range["path"],
+                    "Type": "Picture",
+                    "Picture": self.write_columnar_picture(columnar_dir, index, value_range, binary_chunk_obj),
+                }
+        # Written in Quill.qbin order, listed in the order of the layer's Drawings
+        for layer in layers.values():
+            if "Drawings" in layer:
+                layer["Drawings"] = [drawing for _, drawing in sorted(layer["Drawings"], key=lambda item: item[0])]
+
+        manifest = {
+            "Version": QuillColumnarProject.VERSION,
+            "Headers": self.get_quill_scene_headers(),
+            "Layers": list(layers.values()),
+        }
+        manifest_path = os.path.join(columnar_dir, QuillColumnarProject.MANIFEST_NAME)
+        with open(manifest_path, 'w') as outfile:
+            json.dump(manifest, outfile, indent=1)
+        return columnar_dir
+
+    @classmethod
+    def write_columnar_drawing(cls, columnar_dir, index, value_range, binary_chunk_obj):
+        import numpy as np
+
+        drawing = QuillDrawingArrays.decode(binary_chunk_obj)
+        strokes_name = "drawing_{:06d}.strokes.npy".format(index)
+        vertices_name = "drawing_{:06d}.vertices.npy".format(index)
+        np.save(os.path.join(columnar_dir, strokes_name), drawing.strokes)
+        np.save(os.path.join(columnar_dir, vertices_name), drawing.vertices)
+        return {
+            "DataFileOffset": QuillSceneData.format_data_file_offset(value_range["offset"]),
+            "BoundingBox": drawing.get_bounding_box(),
+            "NumStrokes": len(drawing.strokes),
+            "NumVertices": len(drawing.vertices),
+            "Strokes": strokes_name,
+            "Vertices": vertices_name,
+        }
+
+    @classmethod
+    def write_columnar_picture(cls, columnar_dir, index, value_range, binary_chunk_obj):
+        import numpy as np
+
+        headers, pixels = QuillPictureObject.decode_arrays(binary_chunk_obj)
+        pixels_name = "picture_{:06d}.pixels.npy".format(index)
+        np.save(os.path.join(columnar_dir, pixels_name), pixels)
+        return {
+            "DataFileOffset": QuillSceneData.format_data_file_offset(value_range["offset"]),
+            "Headers": headers,
+            "Pixels": pixels_name,
+        }
+
+
+class QuillColumnarProject(object):
+    """Reader for the output of QuillProject.write_quill_columnar
+
+    The manifest is small JSON, every array is a .npy file opened memory
+    mapped, so only the drawings (and pages) that are touched get read.
+    """
+    DIR_NAME = 'Quill.columnar'
+    MANIFEST_NAME = 'manifest.json'
+    VERSION = 1
+
+    def __init__(self, columnar_dir, mmap_mode='r'):
+        if os.path.basename(os.path.normpath(columnar_dir)) != self.DIR_NAME:
+            columnar_dir = os.path.join(columnar_dir, self.DIR_NAME)
+        self.columnar_dir = columnar_dir
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(columnar_dir, self.MANIFEST_NAME), 'r') as json_file:
+            self.manifest = json.load(json_file)
+        if self.manifest["Version"] != self.VERSION:
+            raise ValueError("Unsupported columnar version {}".format(self.manifest["Version"]))
+        self.layers = OrderedDict((layer["Path"], layer) for layer in self.manifest["Layers"])
+
+    def get_headers(self):
+        return self.manifest["Headers"]
+
+    def get_layers(self):
+        return list(self.layers.values())
+
+    def get_layer(self, layer_path):
+        return self.layers[layer_path]
+
+    def load_array(self, name):
+        import numpy as np
+
+        path = os.path.join(self.columnar_dir, name)
+        try:
+            return np.load(path, mmap_mode=self.mmap_mode)
+        except ValueError:
+            # Empty arrays cannot be memory mapped
+            return np.load(path)
+
+    def get_drawing(self, layer_path, drawing_index=0):
+        drawing = self.get_layer(layer_path)["Drawings"][drawing_index]
+        return QuillDrawingArrays(
+            self.load_array(drawing["Strokes"]),
+            self.load_array(drawing["Vertices"]),
+        )
+
+    def get_drawings(self):
+        for layer in self.get_layers():
+            for drawing_index, _ in enumerate(layer.get("Drawings", [])):
+                yield layer["Path"], drawing_index, self.get_drawing(layer["Path"], drawing_index)
+
+    def get_picture_pixels(self, layer_path):
+        return self.load_array(self.get_layer(layer_path)["Picture"]["Pixels"])
+
+
+class QuillProjectWriter(object):
+    """Writes a Quill project out of (some of) the values of another one
+
+    Drawings and pictures are appended to Quill.qbin as they are written,
+    keyed by their DataFileOffset in the source scene data. close() writes
+    Quill.json with every offset and drawing BoundingBox relocated. Drawings
+    of a Paint layer that were not written become empty drawings (so the
+    layer's frames still line up), Paint layers without any drawing written
+    and Picture layers not written are left out.
+    """
+
+    def __init__(self, output_dir, scene_data, headers, state_data=None):
+        import numpy as np
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        self.output_dir = output_dir
+        self.scene_data = json.loads(json.dumps(scene_data))
+        self.state_data = state_data
+        self.data_file_offsets = {}
+        self.bounding_boxes = {}
+
+        headers_dtype = QuillSceneObject.get_header_dtype()
+        header_record = np.zeros(1, dtype=headers_dtype)
+        for field in headers_dtype.names:
+            header_record[field] = headers.get(field, 0)
+        self.binary_file = open(os.path.join(output_dir, 'Quill.qbin'), 'wb')
+        self.binary_file.write(header_record.tobytes())
+
+    def write_drawing(self, data_file_offset, drawing):
+        self.data_file_offsets[data_file_offset] = self.binary_file.tell()
+        bounding_box = drawing.get_bounding_box()
+        if bounding_box is None:
+            # Not the source drawing's BoundingBox, which relocate_layer would keep
+            bounding_box = QuillDrawingArrays.EMPTY_BOUNDING_BOX
+        self.bounding_boxes[data_file_offset] = bounding_box
+        self.binary_file.write(drawing.encode())
+
+    def write_picture(self, data_file_offset, binary_chunk_obj):
+        self.data_file_offsets[data_file_offset] = self.binary_file.tell()
+        self.bounding_boxes[data_file_offset] = None
+        self.binary_file.write(binary_chunk_obj.get_data())
+
+    def prune_layer(self, layer_data):
+        """Whether layer_data stays, writing empty drawings for partially written Paint layers"""
+        implementation = layer_data.get("Implementation", {})
+        if layer_data["Type"] == "Paint":
+            drawings = implementation["Drawings"]
+            if not any(drawing["DataFileOffset"] in self.data_file_offsets for drawing in drawings):
+                return False
+            for drawing in drawings:
+                if drawing["DataFileOffset"] not in self.data_file_offsets:
+                    self.write_drawing(drawing["DataFileOffset"], QuillDrawingArrays.empty())
+        elif layer_data["Type"] == "Picture":
+            return implementation["DataFileOffset"] in self.data_file_offsets
+        elif layer_data["Type"] == "Group":
+            implementation["Children"] = [
+                child_layer for child_layer in implementation["Children"] if self.prune_layer(child_layer)
+            ]
+        return True
+
+    def close(self):
+        root_layer_data = self.scene_data["Sequence"]["RootLayer"]
+        self.prune_layer(root_layer_data)
+        self.binary_file.close()
+        QuillAsciiDecoder.relocate_layer(root_layer_data, self.data_file_offsets, self.bounding_boxes)
+
+        with open(os.path.join(self.output_dir, 'Quill.json'), 'w') as outfile:
+            json.dump(self.scene_data, outfile, indent=1)
+        if self.state_data is not None:
+            with open(os.path.join(self.output_dir, 'State.json'), 'w') as outfile:
+                json.dump(self.state_data, outfile, indent=1)
+        return QuillSceneData(self.scene_data)
 
 
 class QuillConverterEngine(object):
@@ -606,6 +1511,35 @@ class QuillConverterEngine(object):
     def bin_to_ascii(cls, input_proj_dir, output_proj_dir):
         QuillProject(proj_dir=input_proj_dir).write(output_proj_dir)
 
+    @classmethod
+    def write_pictures(cls, input_proj_dir, output_proj_dir, picture_processor=None):
+        return QuillProject(proj_dir=input_proj_dir).write_images(output_proj_dir, picture_processor)
+
+    @classmethod
+    def bin_to_columnar(cls, input_proj_dir, output_proj_dir):
+        return QuillProject(proj_dir=input_proj_dir).write_quill_columnar(output_proj_dir)
+
+    @classmethod
+    def ascii_to_bin(cls, input_proj_dir, output_proj_dir):
+        if not os.path.exists(output_proj_dir):
+            os.makedirs(output_proj_dir)
+
+        quill_qa_path = os.path.join(input_proj_dir, 'Quill.qa')
+        quill_qbin_path = os.path.join(output_proj_dir, 'Quill.qbin')
+        with open(quill_qa_path, 'r') as infile, open(quill_qbin_path, 'wb') as binary_file:
+            scene_data_obj = QuillAsciiDecoder(infile).run(binary_file)
+
+        quill_json_path = os.path.join(output_proj_dir, 'Quill.json')
+        with open(quill_json_path, 'w') as outfile:
+            json.dump(scene_data_obj.get_data(), outfile, indent=1)
+
+        state_json_path = os.path.join(input_proj_dir, 'State.json')
+        if os.path.exists(state_json_path):
+            with open(state_json_path, 'r') as json_file:
+                state_data = json.load(json_file)
+            with open(os.path.join(output_proj_dir, 'State.json'), 'w') as outfile:
+                json.dump(state_data, outfile, indent=1)
+
 
 class QuillExporterEngine(Engine):
     command_string = "QuillExporter.exe"
@@ -613,15 +1547,17 @@ class QuillExporterEngine(Engine):
     def load_template(self):
         import json
 
+        # assets/ sits next to the quillustrate package
         template_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
+            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
             'assets',
             'quill-export-template.json',
         )
 
-        return json.load(open(template_path))
+        with open(template_path) as template_file:
+            return json.load(template_file)
 
-    def save_settings(settings, output_path):
+    def save_settings(self, settings, output_path):
         with open(output_path, "w") as settings_file:
             json.dump(
                 settings,
@@ -632,3 +1568,51 @@ class QuillExporterEngine(Engine):
 
     def run(self, settings_path):
         self.run_cmd([settings_path])
+
+    def get_settings(self, input_proj_dir, output_path, exclude_list=()):
+        settings = self.load_template()
+        settings["InputFile"] = os.path.abspath(input_proj_dir)
+        settings["OutputFile"] = os.path.abspath(output_path)
+        settings["Options"]["ExcludeList"] = list(exclude_list)
+        return settings
+
+    def get_shard_settings(self, input_proj_dir, output_dir, num_shards):
+        """One settings dict per layer shard, each exporting to <output_dir>/shard_<N>.abc"""
+        from quillustrate.sharding import QuillLayerSharder
+
+        sharder = QuillLayerSharder.from_dir(input_proj_dir, num_shards)
+        shard_settings = []
+        for index, shard in enumerate(sharder.partition()):
+            shard_settings.append(self.get_settings(
+                input_proj_dir,
+                os.path.join(output_dir, "shard_{:03d}.abc".format(index)),
+                exclude_list=sharder.get_exclude_list(shard["layers"]),
+            ))
+        return shard_settings
+
+    def run_concurrently(self, settings_list, max_workers=None):
+        """Saves each settings dict next to its OutputFile and runs them all at once, returns the OutputFiles"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        settings_paths = []
+        for settings in settings_list:
+            output_dir = os.path.dirname(settings["OutputFile"])
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+            settings_path = os.path.splitext(settings["OutputFile"])[0] + ".json"
+            self.save_settings(settings, settings_path)
+            settings_paths.append(settings_path)
+
+        # Each export is an external process, threads only wait on them
+        with ThreadPoolExecutor(max_workers=max_workers or len(settings_paths) or 1) as executor:
+            list(executor.map(self.run, settings_paths))
+        return [settings["OutputFile"] for settings in settings_list]
+
+    def run_sharded(self, input_proj_dir, output_dir, num_shards, max_workers=None):
+        """Exports the project as num_shards concurrent QuillExporter runs
+
+        Returns the exported Alembic paths, to be imported together
+        (BlenderEngine.process_quill_alembic accepts a list).
+        """
+        shard_settings = self.get_shard_settings(input_proj_dir, output_dir, num_shards)
+        return self.run_concurrently(shard_settings, max_workers=max_workers)
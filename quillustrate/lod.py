@@ -0,0 +1,152 @@
+import os
+import json
+import math
+import numpy as np
+from quillustrate.diff import gather_ranges
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProjectWriter
+from quillustrate.tiling import get_layer_values
+
+# Levels are defined by the distance they are meant to be seen from. At that
+# distance, for a given field of view and screen height, one pixel covers
+# get_pixel_size(distance) meters: strokes smaller than min_pixels pixels are
+# culled, and vertices closer together than simplify_pixels pixels along a
+# stroke are merged. Every drawing is decoded once and written to all levels.
+
+
+class QuillLodGenerator(object):
+    """Writes a Quill project per level of detail, plus a lods.json manifest
+
+    distances are the viewing distance of each level, 0 keeps everything.
+    """
+    MANIFEST_NAME = 'lods.json'
+    VERSION = 1
+
+    def __init__(self, project, distances=(0.0, 5.0, 20.0), min_pixels=2.0, simplify_pixels=1.0,
+                 field_of_view=90.0, screen_height=1080):
+        self.project = project
+        self.distances = [float(distance) for distance in distances]
+        self.min_pixels = min_pixels
+        self.simplify_pixels = simplify_pixels
+        self.field_of_view = field_of_view
+        self.screen_height = screen_height
+
+    def get_pixel_size(self, distance):
+        """World size covered by one pixel at distance"""
+        return 2.0 * distance * math.tan(math.radians(self.field_of_view) * 0.5) / self.screen_height
+
+    def get_stroke_sizes(self, drawing, scale):
+        """World size of every stroke, the larger of its longest bounding box side and its widest vertex"""
+        bounding_boxes = drawing.strokes["stroke_bounding_box"].astype(np.float64)
+        sizes = (bounding_boxes[:, 1::2] - bounding_boxes[:, 0::2]).max(axis=1, initial=0.0)
+        num_vertices = drawing.strokes["num_vertices"]
+        nonempty = num_vertices > 0
+        if nonempty.any():
+            widths = np.zeros(len(sizes))
+            widths[nonempty] = np.maximum.reduceat(drawing.vertices["width"], drawing.get_vertex_offsets()[:-1][nonempty])
+            sizes = np.maximum(sizes, widths)
+        return sizes * scale
+
+    @classmethod
+    def cull(cls, drawing, keep):
+        """The drawing with only the strokes where keep is set"""
+        if keep.all():
+            return drawing
+        stroke_indices = np.flatnonzero(keep)
+        num_vertices = drawing.strokes["num_vertices"][stroke_indices]
+        vertex_indices = gather_ranges(drawing.get_vertex_offsets()[stroke_indices], num_vertices)
+        return QuillDrawingArrays(drawing.strokes[stroke_indices], drawing.vertices[vertex_indices])
+
+    @classmethod
+    def decimate(cls, drawing, step):
+        """Keeps one vertex per step of arc length along each stroke, and its first and last vertex"""
+        if step <= 0 or not len(drawing.vertices):
+            return drawing
+        num_vertices = drawing.strokes["num_vertices"].astype(np.int64)
+        vertex_offsets = drawing.get_vertex_offsets()
+        nonempty = num_vertices > 0
+        first = vertex_offsets[:-1][nonempty]
+        last = vertex_offsets[1:][nonempty] - 1
+        stroke_indices = np.repeat(np.arange(len(num_vertices)), num_vertices)
+
+        positions = drawing.vertices["position"].astype(np.float64)
+        segment_lengths = np.zeros(len(positions))
+        segment_lengths[1:] = np.linalg.norm(np.diff(positions, axis=0), axis=1)
+        segment_lengths[first] = 0.0
+        arc_lengths = np.cumsum(segment_lengths)
+        arc_lengths -= arc_lengths[vertex_offsets[stroke_indices]]
+
+        buckets = np.floor(arc_lengths / step)
+        keep = np.ones(len(positions), dtype=bool)
+        keep[1:] = buckets[1:] != buckets[:-1]
+        keep[first] = True
+        keep[last] = True
+
+        strokes = drawing.strokes.copy()
+        strokes["num_vertices"] = np.bincount(stroke_indices[keep], minlength=len(strokes))
+        return QuillDrawingArrays(strokes, drawing.vertices[keep])
+
+    def get_level(self, drawing, scale, distance, stroke_sizes):
+        if distance <= 0:
+            return drawing
+        pixel_size = self.get_pixel_size(distance)
+        drawing = self.cull(drawing, stroke_sizes >= self.min_pixels * pixel_size)
+        # The step is in world units, layer scale shrinks/grows the local arc lengths
+        return self.decimate(drawing, self.simplify_pixels * pixel_size / scale)
+
+    def run(self, output_dir):
+        """Writes <output_dir>/lod_<N> for every distance, returns the manifest"""
+        value_sizes = {
+            value_range["offset"]: value_range["size"]
+            for value_range in self.project.get_quill_file_value_ranges()
+        }
+        scene_data = self.project.scene_data_obj.get_data()
+        headers = self.project.get_quill_scene_headers()
+        names = ["lod_{}".format(index) for index in range(len(self.distances))]
+        writers = [
+            QuillProjectWriter(os.path.join(output_dir, name), scene_data, headers, self.project.state_data)
+            for name in names
+        ]
+        num_strokes = [0] * len(writers)
+        num_vertices = [0] * len(writers)
+
+        for _, layer_type, data_file_offset, matrix in get_layer_values(self.project.scene_data_obj):
+            offset = int(data_file_offset, 16)
+            binary_chunk_obj, _ = self.project.binary_data_obj.chunk(offset, value_sizes[offset])
+            if layer_type == "Picture":
+                for writer in writers:
+                    writer.write_picture(data_file_offset, binary_chunk_obj)
+                continue
+            drawing = QuillDrawingArrays.decode(binary_chunk_obj)
+            # Largest axis scale of the layer's world transform
+            scale = float(np.linalg.norm(matrix[:3, :3], axis=0).max()) or 1.0
+            stroke_sizes = self.get_stroke_sizes(drawing, scale)
+            for index, (writer, distance) in enumerate(zip(writers, self.distances)):
+                level = self.get_level(drawing, scale, distance, stroke_sizes)
+                writer.write_drawing(data_file_offset, level)
+                num_strokes[index] += len(level.strokes)
+                num_vertices[index] += len(level.vertices)
+
+        levels = []
+        for index, (name, writer, distance) in enumerate(zip(names, writers, self.distances)):
+            writer.close()
+            levels.append({
+                "Path": name,
+                "Distance": distance,
+                "MinStrokeSize": self.min_pixels * self.get_pixel_size(distance),
+                "SimplifyStep": self.simplify_pixels * self.get_pixel_size(distance),
+                "NumStrokes": num_strokes[index],
+                "NumVertices": num_vertices[index],
+                "Bytes": os.path.getsize(os.path.join(output_dir, name, 'Quill.qbin')),
+            })
+
+        manifest = {
+            "Version": self.VERSION,
+            "FieldOfView": self.field_of_view,
+            "ScreenHeight": self.screen_height,
+            "MinPixels": self.min_pixels,
+            "SimplifyPixels": self.simplify_pixels,
+            "Levels": levels,
+        }
+        with open(os.path.join(output_dir, self.MANIFEST_NAME), 'w') as outfile:
+            json.dump(manifest, outfile, indent=1)
+        return manifest
@@ -0,0 +1,195 @@
+import os
+import zlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Picture layers are stored as 8 bit sRGB(A) pixels, the work below is all
+# whole-array numpy operations, which release the GIL, so pictures can be
+# processed concurrently on a thread pool.
+#
+# Linear output is written as 16 bit PNGs, 8 bits are too few for linear
+# values and band visibly in the darks.
+
+COLOR_SPACES = ("Gamma", "Linear")
+
+
+def srgb_to_linear_float(pixels):
+    """uint8 sRGB values to float32 linear values in [0, 1]"""
+    return SRGB_TO_LINEAR_FLOAT[pixels]
+
+
+def linear_float_to_srgb(values):
+    """float linear values in [0, 1] to uint8 sRGB values"""
+    values = np.clip(values, 0.0, 1.0)
+    srgb = np.where(
+        values <= 0.0031308,
+        values * 12.92,
+        1.055 * np.power(values, 1.0 / 2.4) - 0.055,
+    )
+    return np.rint(srgb * 255.0).astype(np.uint8)
+
+
+def _build_srgb_to_linear_float():
+    values = np.arange(256, dtype=np.float64) / 255.0
+    linear = np.where(
+        values <= 0.04045,
+        values / 12.92,
+        np.power((values + 0.055) / 1.055, 2.4),
+    )
+    return linear.astype(np.float32)
+
+
+SRGB_TO_LINEAR_FLOAT = _build_srgb_to_linear_float()
+SRGB_TO_LINEAR_16 = np.rint(SRGB_TO_LINEAR_FLOAT * 65535.0).astype(np.uint16)
+
+
+def convert_color_space(pixels, color_space):
+    """Converts uint8 sRGB(A) pixels, Linear gives uint16 pixels (alpha scaled to 16 bits)"""
+    if color_space == "Gamma":
+        return pixels
+    elif color_space != "Linear":
+        raise ValueError("Unknown color space '{}', expected one of {}".format(color_space, COLOR_SPACES))
+    converted = SRGB_TO_LINEAR_16[pixels]
+    if pixels.shape[-1] == 4:
+        converted[..., 3] = pixels[..., 3].astype(np.uint16) * 257
+    return converted
+
+
+def premultiply_alpha(pixels):
+    """Premultiplies uint8 or uint16 RGBA pixels, other pixels are returned as is"""
+    if pixels.shape[-1] != 4:
+        return pixels
+    bits = pixels.dtype.itemsize * 8
+    wide_dtype = np.uint16 if bits == 8 else np.uint32
+    premultiplied = np.array(pixels, copy=True)
+    alpha = pixels[..., 3:4].astype(wide_dtype)
+    # Rounded integer (x * a) / 255 (or / 65535)
+    products = pixels[..., :3].astype(wide_dtype) * alpha + (1 << (bits - 1))
+    premultiplied[..., :3] = ((products + (products >> bits)) >> bits).astype(pixels.dtype)
+    return premultiplied
+
+
+def write_png(path, pixels):
+    """Saves uint8 pixels with PIL, uint16 RGB(A) pixels (which PIL cannot save) as 16 bit PNG"""
+    if pixels.dtype == np.uint8:
+        from PIL import Image
+
+        Image.fromarray(pixels).save(path)
+        return
+    height, width, num_channels = pixels.shape
+    # Every row starts with its filter type (0, none), samples are big endian
+    rows = np.zeros((height, 1 + width * num_channels * 2), dtype=np.uint8)
+    rows[:, 1:] = pixels.astype(">u2").reshape(height, -1).view(np.uint8)
+
+    def png_chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    color_type = {3: 2, 4: 6}[num_channels]
+    with open(path, "wb") as outfile:
+        outfile.write(b"\x89PNG\r\n\x1a\n")
+        outfile.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 16, color_type, 0, 0, 0)))
+        outfile.write(png_chunk(b"IDAT", zlib.compress(rows.tobytes())))
+        outfile.write(png_chunk(b"IEND", b""))
+
+
+def flip(pixels, vertical=False, horizontal=False):
+    if vertical:
+        pixels = pixels[::-1]
+    if horizontal:
+        pixels = pixels[:, ::-1]
+    return np.ascontiguousarray(pixels)
+
+
+def downscale(pixels):
+    """Halves both dimensions with a 2x2 box filter, averaging color in linear space
+
+    Color is weighted by alpha, so fully transparent texels (whatever color
+    they hold) do not bleed into their visible neighbours.
+    """
+    height, width = pixels.shape[0] // 2 * 2, pixels.shape[1] // 2 * 2
+    values = srgb_to_linear_float(pixels[:height, :width])
+    if pixels.shape[-1] == 4:
+        values[..., 3] = pixels[:height, :width, 3] / np.float32(255.0)
+        values[..., :3] *= values[..., 3:4]
+    values = (values[0::2, 0::2] + values[1::2, 0::2] + values[0::2, 1::2] + values[1::2, 1::2]) * np.float32(0.25)
+    if pixels.shape[-1] == 4:
+        alpha = values[..., 3:4]
+        values[..., :3] = np.divide(values[..., :3], alpha, out=np.zeros_like(values[..., :3]), where=alpha > 0)
+    downscaled = linear_float_to_srgb(values)
+    if pixels.shape[-1] == 4:
+        downscaled[..., 3] = np.rint(values[..., 3] * 255.0).astype(np.uint8)
+    return downscaled
+
+
+def generate_mips(pixels, num_mips=None, min_size=1):
+    """Successively halved copies of pixels (excluding pixels itself)
+
+    Stops after num_mips levels (all levels when None), or once a dimension
+    would drop below min_size.
+    """
+    mips = []
+    while num_mips is None or len(mips) < num_mips:
+        if min(pixels.shape[:2]) // 2 < min_size:
+            break
+        pixels = downscale(pixels)
+        mips.append(pixels)
+    return mips
+
+
+class QuillPictureProcessor(object):
+    """Per picture processing, applied to many pictures concurrently
+
+    The mips are generated from the (flipped) sRGB pixels before the
+    color space conversion and premultiplication are applied to every level,
+    so mip filtering always happens in linear space, weighted by alpha.
+    Linear pictures come out as uint16 pixels.
+    """
+
+    def __init__(self, color_space="Gamma", premultiply=False, flip_vertical=False,
+                 flip_horizontal=False, num_mips=0, min_mip_size=1, max_workers=None):
+        if color_space not in COLOR_SPACES:
+            raise ValueError("Unknown color space '{}', expected one of {}".format(color_space, COLOR_SPACES))
+        self.color_space = color_space
+        self.premultiply = premultiply
+        self.flip_vertical = flip_vertical
+        self.flip_horizontal = flip_horizontal
+        self.num_mips = num_mips
+        self.min_mip_size = min_mip_size
+        self.max_workers = max_workers
+
+    def process(self, pixels):
+        """Returns the processed pixels followed by any mips"""
+        pixels = flip(pixels, vertical=self.flip_vertical, horizontal=self.flip_horizontal)
+        levels = [pixels]
+        if self.num_mips:
+            levels += generate_mips(pixels, num_mips=self.num_mips, min_size=self.min_mip_size)
+        levels = [convert_color_space(level, self.color_space) for level in levels]
+        if self.premultiply:
+            levels = [premultiply_alpha(level) for level in levels]
+        return levels
+
+    def run(self, pictures):
+        """Processes an iterable of pixel arrays, yielding results in order"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for levels in executor.map(self.process, pictures):
+                yield levels
+
+    def write(self, pictures, output_dir):
+        """Processes and saves (name, pixels) pairs as <name>.png, <name>.mip<N>.png"""
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        def process_and_save(picture):
+            name, pixels = picture
+            image_paths = []
+            for level, level_pixels in enumerate(self.process(pixels)):
+                suffix = ".mip{}".format(level) if level else ""
+                image_path = os.path.join(output_dir, "{}{}.png".format(name, suffix))
+                # PNG encoding (zlib) also releases the GIL
+                write_png(image_path, level_pixels)
+                image_paths.append(image_path)
+            return image_paths
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(process_and_save, pictures))
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# Opt-in profiling (the CLIs' --profile) of whole runs:
+#   profile.pstats     cProfile stats (python -m pstats, snakeviz, ...) of the
+#                      thread that started profiling only, cProfile does not
+#                      follow other threads (e.g. picture and export pools)
+#   profile.collapsed  sampled stacks of every thread in collapsed format
+#                      (flamegraph.pl, speedscope)
+#   profile.json       wall time (and, with --profile-memory, tracemalloc
+#                      memory) per section, wall time per external
+#                      subprocess, top allocation sites
+# Sections and subprocesses are no-ops unless a QuillProfiler is running, so
+# they can stay in place in library code. Sections nest per thread.
+
+_active_profiler = None
+
+
+class QuillProfiler(object):
+    SAMPLE_INTERVAL = 0.005
+    NUM_TOP_ALLOCATIONS = 25
+
+    def __init__(self, output_dir, sample_interval=None, trace_memory=False):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval or self.SAMPLE_INTERVAL
+        # tracemalloc slows allocation heavy code down several times, so it is opt-in
+        self.trace_memory = trace_memory
+        self.sections = []
+        # Every open section (for memory peaks, which are process wide) and,
+        # per thread, the stack of sections open in it (for section paths)
+        self.open_sections = []
+        self.thread_sections = threading.local()
+        self.subprocesses = []
+        self.stacks = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        global _active_profiler
+        import cProfile
+        import tracemalloc
+
+        if _active_profiler is not None:
+            raise RuntimeError("A QuillProfiler is already running")
+        _active_profiler = self
+        if self.trace_memory:
+            tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.stop_sampling = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, name="QuillProfilerSampler", daemon=True)
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        global _active_profiler
+        import tracemalloc
+
+        self.profile.disable()
+        self.wall_time = time.perf_counter() - self.start_time
+        self.stop_sampling.set()
+        self.sampler.join()
+        self.top_allocations = []
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for statistic in snapshot.statistics('lineno')[:self.NUM_TOP_ALLOCATIONS]:
+                frame = statistic.traceback[0]
+                self.top_allocations.append({
+                    "location": "{}:{}".format(frame.filename, frame.lineno),
+                    "size": statistic.size,
+                    "count": statistic.count,
+                })
+        _active_profiler = None
+
+    def sample(self):
+        sampler_id = threading.get_ident()
+        thread_names = {}
+        while not self.stop_sampling.wait(self.sample_interval):
+            for thread in threading.enumerate():
+                thread_names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def get_traced_memory(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            return 0, 0
+        current, peak = tracemalloc.get_traced_memory()
+        if not hasattr(tracemalloc, "reset_peak"):
+            # Before Python 3.9 the peak cannot be reset, it would be the peak
+            # of the whole run so far: peaks are only sampled at section bounds
+            peak = current
+        return current, peak
+
+    def fold_peak(self, peak):
+        for section in self.open_sections:
+            section["peak"] = max(section["peak"], peak)
+
+    def get_thread_sections(self):
+        """Sections open in the calling thread, innermost last"""
+        thread_sections = getattr(self.thread_sections, "stack", None)
+        if thread_sections is None:
+            thread_sections = self.thread_sections.stack = []
+        return thread_sections
+
+    @contextmanager
+    def section(self, name):
+        import tracemalloc
+
+        thread_sections = self.get_thread_sections()
+        with self.lock:
+            current, peak = self.get_traced_memory()
+            self.fold_peak(peak)
+            if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            section = {
+                "name": name,
+                "path": "/".join([open_section["name"] for open_section in thread_sections] + [name]),
+                "thread": threading.current_thread().name,
+                "start_memory": current,
+                "peak": current,
+            }
+            self.open_sections.append(section)
+        thread_sections.append(section)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            thread_sections.remove(section)
+            with self.lock:
+                current, peak = self.get_traced_memory()
+                self.fold_peak(peak)
+                self.open_sections.remove(section)
+                self.sections.append({
+                    "name": section["name"],
+                    "path": section["path"],
+                    "thread": section["thread"],
+                    "wall_time": wall_time,
+                    "memory_delta": current - section["start_memory"],
+                    "memory_peak": section["peak"] - section["start_memory"],
+                })
+
+    @contextmanager
+    def profile_subprocess(self, command, args):
+        start = time.perf_counter()
+        record = {"command": command, "args": [str(arg) for arg in args], "returncode": None}
+        try:
+            with self.section("subprocess:{}".format(os.path.basename(command))):
+                yield record
+        finally:
+            record["wall_time"] = time.perf_counter() - start
+            with self.lock:
+                self.subprocesses.append(record)
+
+    def write(self):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        self.profile.dump_stats(os.path.join(self.output_dir, "profile.pstats"))
+        with open(os.path.join(self.output_dir, "profile.collapsed"), "w") as outfile:
+            for stack, count in sorted(self.stacks.items()):
+                outfile.write("{} {}\n".format(stack, count))
+        summary = {
+            "argv": sys.argv,
+            "wall_time": self.wall_time,
+            "sample_interval": self.sample_interval,
+            "trace_memory": self.trace_memory,
+            "sections": self.sections,
+            "subprocesses": self.subprocesses,
+            "top_allocations": self.top_allocations,
+        }
+        with open(os.path.join(self.output_dir, "profile.json"), "w") as outfile:
+            json.dump(summary, outfile, indent=1)
+
+
+def add_profile_arguments(parser):
+    """The CLIs' --profile and --profile-memory options, for profile_run"""
+    parser.add_argument(
+        '--profile',
+        help='Write cProfile stats (main thread), sampled stacks (all threads) and '
+             'per section/subprocess timings to this dir',
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        '--profile-memory',
+        help='Also trace memory per section and the top allocation sites (tracemalloc, '
+             'slows the run down) when profiling',
+        action='store_true',
+    )
+
+
+@contextmanager
+def profile_run(output_dir, **options):
+    """Profiles the block into output_dir, does nothing when output_dir is None"""
+    if output_dir is None:
+        yield None
+        return
+    profiler = QuillProfiler(output_dir, **options)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write()
+
+
+@contextmanager
+def section(name):
+    if _active_profiler is None:
+        yield
+    else:
+        with _active_profiler.section(name):
+            yield
+
+
+@contextmanager
+def profile_subprocess(command, args):
+    """Times an external command, set returncode on the yielded record when known"""
+    if _active_profiler is None:
+        yield {}
+    else:
+        with _active_profiler.profile_subprocess(command, args) as record:
+            yield record
+
+
+def profiled(name):
+    """Decorator running the function in a profiling section"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
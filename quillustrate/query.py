@@ -0,0 +1,388 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+import numpy as np
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProject
+from quillustrate.tiling import get_layer_values
+
+# A localhost HTTP service answering questions about Quill projects from
+# projects it keeps loaded (and drawings it keeps decoded). JSON for
+# summaries, raw little endian records for strokes and vertices, described by
+# the X-Quill-Dtype (numpy dtype descr) and X-Quill-Shape headers. Entries are
+# keyed by project dir and checked against the mtime and size of the project
+# files on every request, so edits are picked up on the next query.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PROJECT_FILES = ("Quill.json", "Quill.qbin", "State.json", "~State.json")
+
+
+class QuillProjectCacheEntry(object):
+    """A loaded project, with its drawings decoded (and kept) on first use"""
+
+    def __init__(self, proj_dir, signature):
+        self.proj_dir = proj_dir
+        self.signature = signature
+        self.project = QuillProject(proj_dir)
+        self.value_sizes = {
+            value_range["offset"]: value_range["size"]
+            for value_range in self.project.get_quill_file_value_ranges()
+        }
+        self.layers = OrderedDict()
+        for layer_path, layer_type, data_file_offset, _ in get_layer_values(self.project.scene_data_obj):
+            layer = self.layers.setdefault(layer_path, {"Path": layer_path, "Type": layer_type, "DataFileOffsets": []})
+            layer["DataFileOffsets"].append(data_file_offset)
+        self.drawings = {}
+        self.summary = None
+        self.lock = threading.Lock()
+        self.size = self.project.binary_data_obj.get_size()
+
+    def get_drawing(self, layer_path, drawing_index):
+        """(drawing, bytes newly decoded)"""
+        layer = self.layers.get(layer_path)
+        if layer is None or layer["Type"] != "Paint":
+            raise KeyError("No Paint layer '{}'".format(layer_path))
+        if not 0 <= drawing_index < len(layer["DataFileOffsets"]):
+            raise KeyError("Layer '{}' has no drawing {}".format(layer_path, drawing_index))
+        data_file_offset = layer["DataFileOffsets"][drawing_index]
+        with self.lock:
+            drawing = self.drawings.get(data_file_offset)
+            if drawing is not None:
+                return drawing, 0
+            drawing = QuillDrawingArrays.decode(self.get_value_chunk(data_file_offset))
+            self.drawings[data_file_offset] = drawing
+            added = drawing.strokes.nbytes + drawing.vertices.nbytes
+            self.size += added
+            return drawing, added
+
+    def get_value_chunk(self, data_file_offset):
+        offset = int(data_file_offset, 16)
+        binary_chunk_obj, _ = self.project.binary_data_obj.chunk(offset, self.value_sizes[offset])
+        return binary_chunk_obj
+
+    def get_summary(self):
+        """Layers with per drawing stroke/vertex counts and bounding boxes, and scene totals
+
+        Only the stroke headers are read, the drawings are not decoded (nor
+        kept in the cache).
+        """
+        if self.summary is not None:
+            return self.summary
+        layers = []
+        totals = {"NumLayers": len(self.layers), "NumDrawings": 0, "NumStrokes": 0, "NumVertices": 0}
+        for layer_path, layer in self.layers.items():
+            summary_layer = {"Path": layer_path, "Type": layer["Type"]}
+            if layer["Type"] == "Paint":
+                summary_layer["Drawings"] = []
+                for data_file_offset in layer["DataFileOffsets"]:
+                    strokes = QuillDrawingArrays.decode_strokes(self.get_value_chunk(data_file_offset))
+                    num_vertices = int(strokes["num_vertices"].sum())
+                    summary_layer["Drawings"].append({
+                        "DataFileOffset": data_file_offset,
+                        "NumStrokes": len(strokes),
+                        "NumVertices": num_vertices,
+                        "BoundingBox": QuillDrawingArrays.get_strokes_bounding_box(strokes),
+                        "Bytes": self.value_sizes[int(data_file_offset, 16)],
+                    })
+                    totals["NumDrawings"] += 1
+                    totals["NumStrokes"] += len(strokes)
+                    totals["NumVertices"] += num_vertices
+            else:
+                summary_layer["DataFileOffset"] = layer["DataFileOffsets"][0]
+                summary_layer["Bytes"] = self.value_sizes[int(layer["DataFileOffsets"][0], 16)]
+            layers.append(summary_layer)
+        self.summary = {
+            "Project": self.proj_dir,
+            "Headers": self.project.get_quill_scene_headers(),
+            "Bytes": self.project.binary_data_obj.get_size(),
+            **totals,
+            "Layers": layers,
+        }
+        return self.summary
+
+
+class QuillProjectCache(object):
+    """Least recently used projects, bounded by max_bytes of Quill.qbin plus decoded drawings
+
+    The most recently used project is never evicted, even on its own over
+    max_bytes.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def get_signature(cls, proj_dir):
+        signature = []
+        for file_name in PROJECT_FILES:
+            try:
+                stat = os.stat(os.path.join(proj_dir, file_name))
+            except FileNotFoundError:
+                continue
+            signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def get(self, proj_dir):
+        proj_dir = os.path.abspath(proj_dir)
+        if not os.path.isdir(proj_dir):
+            raise KeyError("No project dir '{}'".format(proj_dir))
+        signature = self.get_signature(proj_dir)
+        with self.lock:
+            entry = self.entries.get(proj_dir)
+            if entry is not None and entry.signature == signature:
+                self.entries.move_to_end(proj_dir)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self.entries[proj_dir]
+                self.invalidations += 1
+            self.misses += 1
+
+        entry = QuillProjectCacheEntry(proj_dir, signature)
+        with self.lock:
+            self.entries[proj_dir] = entry
+            self.evict()
+        return entry
+
+    def get_drawing(self, entry, layer_path, drawing_index):
+        drawing, added = entry.get_drawing(layer_path, drawing_index)
+        if added:
+            with self.lock:
+                self.evict()
+        return drawing
+
+    def get_size(self):
+        return sum(entry.size for entry in self.entries.values())
+
+    def evict(self):
+        # Called with the lock held
+        while len(self.entries) > 1 and self.get_size() > self.max_bytes:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_stale(self):
+        """Drops entries whose project files changed, returns how many"""
+        with self.lock:
+            entries = list(self.entries.items())
+        stale = [(proj_dir, entry) for proj_dir, entry in entries if self.get_signature(proj_dir) != entry.signature]
+        with self.lock:
+            for proj_dir, entry in stale:
+                # Unless it was reloaded meanwhile
+                if self.entries.get(proj_dir) is entry:
+                    del self.entries[proj_dir]
+                    self.invalidations += 1
+        return len(stale)
+
+    def get_status(self):
+        with self.lock:
+            return {
+                "Projects": [
+                    {"Project": proj_dir, "Bytes": entry.size, "NumDecodedDrawings": len(entry.drawings)}
+                    for proj_dir, entry in self.entries.items()
+                ],
+                "Bytes": self.get_size(),
+                "MaxBytes": self.max_bytes,
+                "Hits": self.hits,
+                "Misses": self.misses,
+                "Evictions": self.evictions,
+                "Invalidations": self.invalidations,
+            }
+
+
+class QuillQueryHandler(BaseHTTPRequestHandler):
+    """GET /status, /layers, /stats, /strokes and /vertices (see QuillQueryClient)"""
+    protocol_version = "HTTP/1.1"
+    # Served by get_<query>, the other get_ methods are helpers, not queries
+    QUERIES = ("status", "layers", "stats", "strokes", "vertices")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        query_name = url.path.strip("/")
+        if query_name not in self.QUERIES:
+            self.send_json({"error": "Unknown query '{}'".format(url.path)}, status=404)
+            return
+        try:
+            getattr(self, "get_" + query_name)(query)
+        except KeyError as error:
+            self.send_json({"error": error.args[0] if error.args else str(error)}, status=404)
+        except ValueError as error:
+            self.send_json({"error": str(error)}, status=400)
+        except Exception as error:
+            # e.g. a project caught halfway through being saved, the next query reloads it
+            self.send_json({"error": "{}: {}".format(type(error).__name__, error)}, status=500)
+
+    def get_entry(self, query):
+        if "project" not in query:
+            raise ValueError("Missing 'project' parameter")
+        return self.server.cache.get(query["project"])
+
+    def get_drawing(self, query):
+        entry = self.get_entry(query)
+        if "layer" not in query:
+            raise ValueError("Missing 'layer' parameter")
+        return self.server.cache.get_drawing(entry, query["layer"], int(query.get("drawing", 0)))
+
+    def get_status(self, query):
+        self.send_json(self.server.cache.get_status())
+
+    def get_layers(self, query):
+        entry = self.get_entry(query)
+        self.send_json(entry.get_summary()["Layers"])
+
+    def get_stats(self, query):
+        entry = self.get_entry(query)
+        summary = entry.get_summary()
+        self.send_json({key: value for key, value in summary.items() if key != "Layers"})
+
+    def get_strokes(self, query):
+        self.send_array(self.get_drawing(query).strokes, query.get("field"))
+
+    def get_vertices(self, query):
+        drawing = self.get_drawing(query)
+        vertices = drawing.vertices
+        if "stroke" in query:
+            vertex_offsets = drawing.get_vertex_offsets()
+            stroke_index = int(query["stroke"])
+            if not 0 <= stroke_index < len(drawing.strokes):
+                raise KeyError("Drawing has no stroke {}".format(stroke_index))
+            vertices = vertices[vertex_offsets[stroke_index]:vertex_offsets[stroke_index + 1]]
+        self.send_array(vertices, query.get("field"))
+
+    def send_array(self, array, field=None):
+        if field is not None:
+            if field not in array.dtype.names:
+                raise ValueError("Unknown field '{}', expected one of {}".format(field, array.dtype.names))
+            # A single field is strided within the records, the only copy made
+            array = np.ascontiguousarray(array[field])
+        # Whole record arrays (and slices of them) are written straight from the decoded drawing
+        data = memoryview(np.ascontiguousarray(array).view(np.uint8).reshape(-1))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(data.nbytes))
+        self.send_header("X-Quill-Dtype", json.dumps(np.lib.format.dtype_to_descr(array.dtype)))
+        self.send_header("X-Quill-Shape", json.dumps(array.shape))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class QuillQueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, max_cache_bytes=1024 * 1024 * 1024,
+                 watch_interval=2.0, verbose=False):
+        super().__init__((host, port), QuillQueryHandler)
+        self.cache = QuillProjectCache(max_bytes=max_cache_bytes)
+        self.watch_interval = watch_interval
+        self.verbose = verbose
+        self.watching = threading.Event()
+
+    def watch(self):
+        # Frees the memory of edited projects without waiting for their next query
+        while not self.watching.wait(self.watch_interval):
+            self.cache.invalidate_stale()
+
+    def serve_forever(self, poll_interval=0.5):
+        if self.watch_interval:
+            threading.Thread(target=self.watch, name="QuillQueryWatcher", daemon=True).start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.watching.set()
+
+
+class QuillQueryClient(object):
+    """Queries a running QuillQueryServer, arrays come back as numpy record arrays"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, query, **params):
+        import http.client
+
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            params = {key: value for key, value in params.items() if value is not None}
+            connection.request("GET", "/{}?{}".format(query, urlencode(params)))
+            response = connection.getresponse()
+            body = response.read()
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError("Quill query '{}' failed ({}): {}".format(
+                query,
+                response.status,
+                json.loads(body).get("error"),
+            ))
+        return response, body
+
+    def request_json(self, query, **params):
+        _, body = self.request(query, **params)
+        return json.loads(body)
+
+    def request_array(self, query, **params):
+        response, body = self.request(query, **params)
+        dtype = np.lib.format.descr_to_dtype(self.parse_descr(json.loads(response.getheader("X-Quill-Dtype"))))
+        return np.frombuffer(body, dtype=dtype).reshape(json.loads(response.getheader("X-Quill-Shape")))
+
+    @classmethod
+    def parse_descr(cls, descr):
+        """Back from JSON, which turned the descr's (name, descr[, shape]) tuples into lists"""
+        if isinstance(descr, str):
+            return descr
+        fields = []
+        for field in descr:
+            shape = (tuple(field[2]),) if len(field) > 2 else ()
+            fields.append((field[0], cls.parse_descr(field[1])) + shape)
+        return fields
+
+    def get_status(self):
+        return self.request_json("status")
+
+    def get_layers(self, project):
+        return self.request_json("layers", project=os.path.abspath(project))
+
+    def get_stats(self, project):
+        return self.request_json("stats", project=os.path.abspath(project))
+
+    def get_strokes(self, project, layer, drawing=0, field=None):
+        return self.request_array("strokes", project=os.path.abspath(project), layer=layer, drawing=drawing, field=field)
+
+    def get_vertices(self, project, layer, drawing=0, stroke=None, field=None):
+        return self.request_array("vertices", project=os.path.abspath(project), layer=layer, drawing=drawing,
+                                  stroke=stroke, field=field)
+
+    def wait(self, timeout=10.0):
+        """Waits for the server to answer, e.g. right after starting it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.get_status()
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
@@ -0,0 +1,416 @@
+import os
+import abc
+import json
+import shutil
+import struct
+import tempfile
+import time
+import numpy as np
+from quillustrate.engines.quill import (
+    QuillAsciiDecoder,
+    QuillAsciiEncoder,
+    QuillBinaryData,
+    QuillBinaryDecoder,
+    QuillBinaryEncoder,
+    QuillDrawingArrays,
+    QuillPictureObject,
+    QuillSceneData,
+    QuillSceneObject,
+    QuillType,
+)
+
+# Round trip (Quill.qbin -> codec -> Quill.qbin) checks of every codec against
+# randomly generated scenes, with the throughput of each direction.
+
+COMPARE_CHUNK_SIZE = 1 << 20
+
+
+class QuillSceneGenerator(object):
+    """Random but valid Quill scenes (Quill.json data and Quill.qbin bytes)
+
+    The binary is packed field by field from the format description with
+    struct, independently of the codecs under test, so it can act as the
+    oracle for all of them. With max_gap, up to max_gap unused bytes precede
+    every value (as Quill leaves behind when it rewrites a value elsewhere),
+    empty_probability makes drawings without strokes and strokes without
+    vertices more likely.
+    """
+    STROKE_HEADER_FORMAT = "<ii6fh??i"
+    VERTEX_FLOATS = 14
+    PICTURE_HEADER_FORMAT = "<hhBBBBiiBBBB"
+
+    def __init__(self, seed, max_layers=4, max_drawings=2, max_strokes=32, max_vertices=64,
+                 picture_probability=0.2, group_probability=0.2, max_picture_size=32,
+                 max_gap=0, empty_probability=0.0):
+        self.rng = np.random.default_rng(seed)
+        self.max_layers = max_layers
+        self.max_drawings = max_drawings
+        self.max_strokes = max_strokes
+        self.max_vertices = max_vertices
+        self.picture_probability = picture_probability
+        self.group_probability = group_probability
+        self.max_picture_size = max_picture_size
+        self.max_gap = max_gap
+        self.empty_probability = empty_probability
+        self.num_gap_bytes = 0
+
+    def run(self, binary_file):
+        """Writes Quill.qbin to binary_file, returns the Quill.json data"""
+        self.next_stroke_id = 0
+        self.num_gap_bytes = 0
+        binary_file.write(struct.pack("<ii", 0, 0))
+        root_layer = self.generate_group("Root", binary_file, depth=0)
+        end = binary_file.tell()
+        binary_file.seek(0)
+        binary_file.write(struct.pack("<ii", max(self.next_stroke_id - 1, 0), 0))
+        binary_file.seek(end)
+        return {
+            "Version": 1,
+            "Sequence": {
+                "Metadata": {"Title": "Generated"},
+                "RootLayer": root_layer,
+            },
+        }
+
+    def generate_group(self, name, binary_file, depth):
+        children = []
+        for index in range(self.rng.integers(1, self.max_layers + 1)):
+            child_name = "Layer{}".format(index)
+            choice = self.rng.random()
+            if choice < self.group_probability and depth < 2:
+                children.append(self.generate_group(child_name, binary_file, depth + 1))
+            elif choice < self.group_probability + self.picture_probability:
+                children.append(self.generate_picture(child_name, binary_file))
+            else:
+                children.append(self.generate_paint(child_name, binary_file))
+        return {"Name": name, "Type": "Group", "Implementation": {"Children": children}}
+
+    def write_gap(self, binary_file):
+        if not self.max_gap:
+            return
+        size = int(self.rng.integers(0, self.max_gap + 1))
+        binary_file.write(self.rng.integers(0, 256, size=size, dtype=np.uint8).tobytes())
+        self.num_gap_bytes += size
+
+    def is_empty(self):
+        return self.empty_probability > 0 and self.rng.random() < self.empty_probability
+
+    def generate_paint(self, name, binary_file):
+        drawings = []
+        for _ in range(self.rng.integers(1, self.max_drawings + 1)):
+            self.write_gap(binary_file)
+            offset = binary_file.tell()
+            bounding_box = self.write_drawing(binary_file)
+            drawings.append({
+                "BoundingBox": bounding_box,
+                "DataFileOffset": QuillSceneData.format_data_file_offset(offset),
+            })
+        return {"Name": name, "Type": "Paint", "Implementation": {"Drawings": drawings}}
+
+    def write_drawing(self, binary_file):
+        num_strokes = 0 if self.is_empty() else int(self.rng.integers(0, self.max_strokes + 1))
+        binary_file.write(struct.pack("<i", num_strokes))
+        bounding_boxes = []
+        for _ in range(num_strokes):
+            num_vertices = 0 if self.is_empty() else int(self.rng.integers(0, self.max_vertices + 1))
+            vertices = self.rng.standard_normal((num_vertices, self.VERTEX_FLOATS)).astype("<f4")
+            positions = vertices[:, 0:3]
+            if num_vertices:
+                bounding_box = np.stack([positions.min(axis=0), positions.max(axis=0)], axis=1).ravel()
+            else:
+                bounding_box = np.zeros(6, dtype=np.float32)
+            bounding_boxes.append(bounding_box)
+            binary_file.write(struct.pack(
+                self.STROKE_HEADER_FORMAT,
+                self.next_stroke_id,
+                int(self.rng.integers(0, 4)),
+                *bounding_box.tolist(),
+                int(self.rng.integers(0, 5)),
+                bool(self.rng.integers(0, 2)),
+                bool(self.rng.integers(0, 2)),
+                num_vertices,
+            ))
+            binary_file.write(vertices.tobytes())
+            self.next_stroke_id += 1
+
+        if not bounding_boxes:
+            # What Quill writes for an empty drawing
+            return [1e20, -1e20, 1e20, -1e20, 1e20, -1e20]
+        bounding_boxes = np.array(bounding_boxes)
+        bounding_box = np.empty(6, dtype=np.float32)
+        bounding_box[0::2] = bounding_boxes[:, 0::2].min(axis=0)
+        bounding_box[1::2] = bounding_boxes[:, 1::2].max(axis=0)
+        return [round(value, 6) for value in bounding_box.tolist()]
+
+    def generate_picture(self, name, binary_file):
+        self.write_gap(binary_file)
+        offset = binary_file.tell()
+        image_type = int(self.rng.choice([6, 7]))
+        num_channels = 3 if image_type == 6 else 4
+        width, height = (int(size) for size in self.rng.integers(1, self.max_picture_size + 1, size=2))
+        binary_file.write(struct.pack(self.PICTURE_HEADER_FORMAT, 0, 1, 0, image_type, 0, 0, width, height, 0, 0, 0, 0))
+        binary_file.write(self.rng.integers(0, 256, size=width * height * num_channels, dtype=np.uint8).tobytes())
+        return {
+            "Name": name,
+            "Type": "Picture",
+            "Implementation": {"DataFileOffset": QuillSceneData.format_data_file_offset(offset)},
+        }
+
+
+def relocate_values(scene_data_obj, value_sizes):
+    """Points the DataFileOffsets of scene_data_obj at values written back to back after the scene header
+
+    value_sizes are the sizes of the values as written, in the order of their
+    original offsets, which is the order every codec writes them in. Any
+    unused bytes between the original values are gone.
+    """
+    data_file_offsets = sorted(
+        {value_data["DataFileOffset"] for _, _, _, value_data in scene_data_obj.iter_layer_values()},
+        key=lambda data_file_offset: int(data_file_offset, 16),
+    )
+    offsets = np.cumsum([QuillSceneObject.get_header_dtype().itemsize] + list(value_sizes[:-1])).tolist()
+    QuillAsciiDecoder.relocate_layer(
+        scene_data_obj.get_root_layer(),
+        dict(zip(data_file_offsets, offsets)),
+        dict.fromkeys(data_file_offsets),
+    )
+    return scene_data_obj
+
+
+class QuillCodec(abc.ABC):
+    """decode: Quill.qbin -> representation, encode: representation -> Quill.qbin (written to binary_file)"""
+    name = None
+
+    @abc.abstractmethod
+    def decode(self, binary_data_obj, scene_data_obj, work_dir):
+        pass
+
+    @abc.abstractmethod
+    def encode(self, decoded, binary_file):
+        """Returns the scene data to write alongside the binary"""
+
+
+class QuillObjectCodec(QuillCodec):
+    name = "object"
+
+    def decode(self, binary_data_obj, scene_data_obj, work_dir):
+        return QuillBinaryDecoder(binary_data_obj, scene_data_obj).run()
+
+    def encode(self, decoded, binary_file):
+        binary_data_obj, scene_data_obj = QuillBinaryEncoder(decoded).run()
+        binary_file.write(binary_data_obj.get_data())
+        value_sizes = [quill_object.get_binary_size() for quill_object in decoded.quill_scene_obj.get_values()]
+        return relocate_values(scene_data_obj, value_sizes)
+
+
+class QuillArraysCodec(QuillCodec):
+    name = "arrays"
+
+    def decode(self, binary_data_obj, scene_data_obj, work_dir):
+        headers_size = QuillSceneObject.get_header_dtype().itemsize
+        values = []
+        for value_range in scene_data_obj.get_quill_file_value_ranges(binary_data_obj.get_size()):
+            binary_chunk_obj, _ = binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            if value_range["type"] == QuillType.DRAWING:
+                values.append(QuillDrawingArrays.decode(binary_chunk_obj))
+            else:
+                values.append(QuillPictureObject.decode_arrays(binary_chunk_obj))
+        headers, _ = binary_data_obj.chunk(0, headers_size)
+        return bytes(headers.get_data()), values, scene_data_obj
+
+    def encode(self, decoded, binary_file):
+        headers, values, scene_data_obj = decoded
+        binary_file.write(headers)
+        headers_dtype = QuillPictureObject.get_header_dtype()
+        value_sizes = []
+        for value in values:
+            start = binary_file.tell()
+            if isinstance(value, QuillDrawingArrays):
+                binary_file.write(value.encode())
+            else:
+                picture_headers, pixels = value
+                header_record = np.zeros(1, dtype=headers_dtype)
+                for field in headers_dtype.names:
+                    header_record[field] = picture_headers[field]
+                binary_file.write(header_record.tobytes())
+                binary_file.write(pixels.tobytes())
+            value_sizes.append(binary_file.tell() - start)
+        return relocate_values(scene_data_obj, value_sizes)
+
+
+class QuillAsciiCodec(QuillCodec):
+    name = "ascii"
+
+    def decode(self, binary_data_obj, scene_data_obj, work_dir):
+        quill_qa_path = os.path.join(work_dir, "Quill.qa")
+        with open(quill_qa_path, "w") as outfile:
+            QuillAsciiEncoder(scene_data_obj, binary_data_obj).run(outfile)
+        return quill_qa_path
+
+    def encode(self, decoded, binary_file):
+        with open(decoded, "r") as infile:
+            return QuillAsciiDecoder(infile).run(binary_file)
+
+
+CODECS = [QuillObjectCodec, QuillArraysCodec, QuillAsciiCodec]
+
+
+def get_codec(name):
+    for codec_cls in CODECS:
+        if codec_cls.name == name:
+            return codec_cls()
+    raise ValueError("Unknown codec '{}', expected one of {}".format(
+        name, tuple(codec_cls.name for codec_cls in CODECS)))
+
+
+def find_binary_mismatch(expected_path, actual_path, chunk_size=COMPARE_CHUNK_SIZE):
+    """Offset of the first differing byte (or of the shorter file's end), None when identical"""
+    with open(expected_path, "rb") as expected_file, open(actual_path, "rb") as actual_file:
+        offset = 0
+        while True:
+            expected = expected_file.read(chunk_size)
+            actual = actual_file.read(chunk_size)
+            if expected != actual:
+                size = min(len(expected), len(actual))
+                differing = np.flatnonzero(
+                    np.frombuffer(expected, dtype=np.uint8, count=size)
+                    != np.frombuffer(actual, dtype=np.uint8, count=size)
+                )
+                return offset + (int(differing[0]) if len(differing) else size)
+            if not expected:
+                return None
+            offset += len(expected)
+
+
+def get_value_data(binary_data_obj, scene_data_obj):
+    """(layer path, index) -> the bytes of each value, without any unused bytes that follow it"""
+    picture_header_size = QuillPictureObject.get_header_dtype().itemsize
+    values = {}
+    for value_range in scene_data_obj.get_quill_file_value_ranges(binary_data_obj.get_size()):
+        binary_chunk_obj, _ = binary_data_obj.chunk(value_range["offset"], value_range["size"])
+        if value_range["type"] == QuillType.DRAWING:
+            _, size = QuillDrawingArrays.get_stroke_offsets(binary_chunk_obj)
+        else:
+            _, pixels = QuillPictureObject.decode_arrays(binary_chunk_obj)
+            size = picture_header_size + pixels.nbytes
+        values[(value_range["path"], value_range["index"])] = bytes(binary_chunk_obj.get_data()[:size])
+    return values
+
+
+def strip_data_file_offsets(scene_data):
+    """A copy of scene_data without any DataFileOffset, to compare scenes laid out differently"""
+    scene_data_obj = QuillSceneData(json.loads(json.dumps(scene_data)))
+    for _, _, _, value_data in scene_data_obj.iter_layer_values():
+        del value_data["DataFileOffset"]
+    return scene_data_obj.get_data()
+
+
+def find_value_mismatch(expected_data, expected_scene_data, actual_data, actual_scene_data):
+    """Description of the first scene header or value that differs, None when all match
+
+    For scenes with unused bytes between values, which codecs do not keep,
+    so the binaries cannot be compared byte for byte.
+    """
+    headers_size = QuillSceneObject.get_header_dtype().itemsize
+    if bytes(expected_data[:headers_size]) != bytes(actual_data[:headers_size]):
+        return "Scene header differs"
+    expected_values = get_value_data(QuillBinaryData(expected_data), QuillSceneData(expected_scene_data))
+    actual_values = get_value_data(QuillBinaryData(actual_data), QuillSceneData(actual_scene_data))
+    for key, value_data in expected_values.items():
+        if actual_values.get(key) != value_data:
+            return "Value {}[{}] differs".format(*key)
+    if len(actual_values) != len(expected_values):
+        return "{} values instead of {}".format(len(actual_values), len(expected_values))
+    if strip_data_file_offsets(actual_scene_data) != strip_data_file_offsets(expected_scene_data):
+        return "Quill.json differs"
+    return None
+
+
+class QuillRoundTripHarness(object):
+    """Generates scenes, round trips them through each codec and compares
+
+    Results hold the failures (seed, codec, first differing byte offset) and
+    the total bytes and seconds spent in each direction of each codec.
+    Scenes generated with gaps between values are compared value by value.
+    """
+
+    def __init__(self, codecs=None, generator_options=None, work_dir=None):
+        self.codecs = codecs or [codec_cls() for codec_cls in CODECS]
+        self.generator_options = generator_options or {}
+        self.work_dir = work_dir
+
+    def run(self, seeds):
+        results = {
+            "failures": [],
+            "throughput": {codec.name: {"bytes": 0, "decode": 0.0, "encode": 0.0} for codec in self.codecs},
+        }
+        work_dir = tempfile.mkdtemp(prefix="quill-roundtrip-", dir=self.work_dir)
+        try:
+            for seed in seeds:
+                self.run_seed(seed, work_dir, results)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return results
+
+    def run_seed(self, seed, work_dir, results):
+        quill_qbin_path = os.path.join(work_dir, "Quill.qbin")
+        generator = QuillSceneGenerator(seed, **self.generator_options)
+        with open(quill_qbin_path, "wb") as binary_file:
+            scene_data = generator.run(binary_file)
+        with open(quill_qbin_path, "rb") as binary_file:
+            binary_data = binary_file.read()
+
+        for codec in self.codecs:
+            # Each codec gets its own copy, some of them rewrite the scene data
+            scene_data_obj = QuillSceneData(json.loads(json.dumps(scene_data)))
+            output_path = os.path.join(work_dir, "Quill.{}.qbin".format(codec.name))
+            try:
+                start = time.perf_counter()
+                decoded = codec.decode(QuillBinaryData(binary_data), scene_data_obj, work_dir)
+                decoded_time = time.perf_counter()
+                with open(output_path, "wb") as binary_file:
+                    output_scene_data_obj = codec.encode(decoded, binary_file)
+                encoded_time = time.perf_counter()
+            except Exception as error:
+                results["failures"].append({"seed": seed, "codec": codec.name, "error": repr(error)})
+                continue
+
+            throughput = results["throughput"][codec.name]
+            throughput["bytes"] += len(binary_data)
+            throughput["decode"] += decoded_time - start
+            throughput["encode"] += encoded_time - decoded_time
+
+            if generator.num_gap_bytes:
+                with open(output_path, "rb") as binary_file:
+                    output_data = binary_file.read()
+                try:
+                    error = find_value_mismatch(binary_data, scene_data, output_data, output_scene_data_obj.get_data())
+                except Exception as decode_error:
+                    error = "Output does not decode: {!r}".format(decode_error)
+                if error is not None:
+                    results["failures"].append({"seed": seed, "codec": codec.name, "error": error})
+                continue
+
+            mismatch = find_binary_mismatch(quill_qbin_path, output_path)
+            if mismatch is not None:
+                results["failures"].append({"seed": seed, "codec": codec.name, "offset": mismatch})
+            elif output_scene_data_obj.get_data() != scene_data:
+                results["failures"].append({"seed": seed, "codec": codec.name, "error": "Quill.json differs"})
+
+    @classmethod
+    def format_results(cls, results):
+        lines = []
+        for name, throughput in results["throughput"].items():
+            megabytes = throughput["bytes"] / float(1 << 20)
+            lines.append("{:<8} decode {:>10.2f} MB/s  encode {:>10.2f} MB/s  ({:.2f} MB)".format(
+                name,
+                megabytes / throughput["decode"] if throughput["decode"] else 0.0,
+                megabytes / throughput["encode"] if throughput["encode"] else 0.0,
+                megabytes,
+            ))
+        for failure in results["failures"]:
+            if "offset" in failure:
+                lines.append("FAIL {codec} seed={seed}: first differing byte at {offset}".format(**failure))
+            else:
+                lines.append("FAIL {codec} seed={seed}: {error}".format(**failure))
+        return lines
@@ -0,0 +1,105 @@
+import os
+import json
+import heapq
+from collections import OrderedDict
+from quillustrate.engines.quill import QuillSceneData
+
+# QuillExporter exports a whole project per invocation, the only way to split
+# the work is excluding layers. Every non-group layer goes to exactly one
+# shard, shards are balanced on the Quill.qbin bytes of their layers.
+#
+# ExcludeList entries are full layer paths from the root layer joined with
+# "/" ("Root/Group/Paint"), the paths QuillSceneData.iter_layers gives.
+# assets/quill-export-template.json, a settings file saved by QuillExporter,
+# ships an empty ExcludeList, so it does not pin this format down. If an
+# exporter version expects paths without the root layer, get_exclude_list is
+# the one place to change.
+
+
+class QuillLayerSharder(object):
+    """Partitions the layers of a Quill project into num_shards balanced shards
+
+    Layers are assigned largest first to the least loaded shard. Layers
+    without binary data (viewpoints, cameras, ...) cost nothing and are
+    spread round-robin over the shards, so each is exported exactly once.
+    """
+
+    def __init__(self, scene_data_obj, binary_size, num_shards):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1, got {}".format(num_shards))
+        self.scene_data_obj = scene_data_obj
+        self.binary_size = binary_size
+        self.num_shards = num_shards
+
+    @classmethod
+    def from_project(cls, project, num_shards):
+        return cls(project.scene_data_obj, project.binary_data_obj.get_size(), num_shards)
+
+    @classmethod
+    def from_dir(cls, proj_dir, num_shards):
+        """Reads Quill.json only, the value sizes follow from the offsets and the Quill.qbin file size"""
+        with open(os.path.join(proj_dir, 'Quill.json'), 'r') as json_file:
+            scene_data_obj = QuillSceneData(json.load(json_file))
+        return cls(scene_data_obj, os.path.getsize(os.path.join(proj_dir, 'Quill.qbin')), num_shards)
+
+    def get_value_sizes(self):
+        """Quill.qbin offset -> size of the drawing/picture stored there"""
+        value_ranges = self.scene_data_obj.get_quill_file_value_ranges(self.binary_size)
+        return {value_range["offset"]: value_range["size"] for value_range in value_ranges}
+
+    def get_layer_costs(self):
+        """(layer path, bytes) of every non-group layer, in layer tree order"""
+        value_sizes = self.get_value_sizes()
+        layer_costs = OrderedDict(
+            (layer_path, 0)
+            for layer_path, layer_data, _ in self.scene_data_obj.iter_layers()
+            if layer_data["Type"] != "Group"
+        )
+        for layer_path, _, _, value_data in self.scene_data_obj.iter_layer_values():
+            layer_costs[layer_path] += value_sizes.get(int(value_data["DataFileOffset"], 16), 0)
+        return list(layer_costs.items())
+
+    def partition(self):
+        """Shards as {"layers": [layer path, ...], "cost": bytes}, empty shards are dropped"""
+        shards = [{"layers": [], "cost": 0} for _ in range(self.num_shards)]
+        heap = [(0, index) for index in range(self.num_shards)]
+        layer_costs = self.get_layer_costs()
+        # Stable sort, so equal cost layers keep their tree order
+        for layer_path, cost in sorted(layer_costs, key=lambda item: -item[1]):
+            if cost == 0:
+                continue
+            shard_cost, index = heapq.heappop(heap)
+            shards[index]["layers"].append(layer_path)
+            shards[index]["cost"] += cost
+            heapq.heappush(heap, (shard_cost + cost, index))
+        # Free layers ride along with the shards exporting something rather than costing an export of their own
+        free_shards = [shard for shard in shards if shard["layers"]] or shards
+        free_layers = [layer_path for layer_path, cost in layer_costs if cost == 0]
+        for position, layer_path in enumerate(free_layers):
+            free_shards[position % len(free_shards)]["layers"].append(layer_path)
+        return [shard for shard in shards if shard["layers"]]
+
+    def get_exclude_list(self, shard_layers):
+        """Smallest list of layer paths excluding everything outside shard_layers
+
+        Groups holding none of the shard's layers are excluded as a whole.
+        """
+        shard_layers = set(shard_layers)
+        layers = list(self.scene_data_obj.iter_layers())
+        # Children come after their parents, so walking backwards marks every group holding a shard layer
+        containing_groups = set()
+        for layer_path, _, parent_layer_path in reversed(layers):
+            if layer_path in shard_layers or layer_path in containing_groups:
+                containing_groups.add(parent_layer_path)
+
+        excluded = set()
+        exclude_list = []
+        for layer_path, _, parent_layer_path in layers:
+            if parent_layer_path is None:
+                continue
+            if parent_layer_path in excluded:
+                excluded.add(layer_path)
+            elif layer_path not in shard_layers and layer_path not in containing_groups:
+                excluded.add(layer_path)
+                exclude_list.append(layer_path)
+        return exclude_list
@@ -0,0 +1,267 @@
+import os
+import json
+import numpy as np
+from quillustrate.diff import gather_ranges
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProjectWriter
+
+# Strokes are placed by the center of their bounding box in world space (the
+# layer transforms applied), so every stroke lands in exactly one tile. Tiles
+# keep the source layer tree and transforms, each tile project renders its
+# strokes exactly where they are in the full scene.
+
+TILING_MODES = ("grid", "octree")
+
+
+def quaternion_to_matrix(rotation):
+    """3x3 rotation matrix of a Quill [x, y, z, w] quaternion"""
+    x, y, z, w = rotation
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ], dtype=np.float64)
+
+
+def get_layer_matrix(layer_data):
+    """4x4 matrix of a layer Transform (translation * rotation * scale * flip)"""
+    transform = layer_data.get("Transform")
+    matrix = np.identity(4)
+    if transform is None:
+        return matrix
+    scale = np.full(3, float(transform.get("Scale", 1.0)))
+    flip = transform.get("Flip", "N")
+    if flip in ("X", "Y", "Z"):
+        scale["XYZ".index(flip)] *= -1
+    matrix[:3, :3] = quaternion_to_matrix(transform.get("Rotation", [0.0, 0.0, 0.0, 1.0])) * scale
+    matrix[:3, 3] = transform.get("Translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def transform_bounding_boxes(bounding_boxes, matrix):
+    """Quill [min_x, max_x, min_y, max_y, min_z, max_z] boxes to world space (mins, maxs)"""
+    bounding_boxes = np.asarray(bounding_boxes, dtype=np.float64).reshape(-1, 6)
+    mins, maxs = bounding_boxes[:, 0::2], bounding_boxes[:, 1::2]
+    centers = (mins + maxs) * 0.5 @ matrix[:3, :3].T + matrix[:3, 3]
+    extents = (maxs - mins) * 0.5 @ np.abs(matrix[:3, :3]).T
+    return centers - extents, centers + extents
+
+
+def to_quill_bounding_box(mins, maxs):
+    bounding_box = np.empty(6)
+    bounding_box[0::2] = mins
+    bounding_box[1::2] = maxs
+    return bounding_box.tolist()
+
+
+def get_layer_values(scene_data_obj):
+    """(layer path, layer type, DataFileOffset, world matrix) of every drawing and picture"""
+    matrices = {None: np.identity(4)}
+    for layer_path, layer_data, parent_layer_path in scene_data_obj.iter_layers():
+        matrices[layer_path] = matrices[parent_layer_path] @ get_layer_matrix(layer_data)
+    return [
+        (layer_path, layer_type, value_data["DataFileOffset"], matrices[layer_path])
+        for layer_path, layer_type, _, value_data in scene_data_obj.iter_layer_values()
+    ]
+
+
+class QuillSceneTiler(object):
+    """Splits a Quill project into spatial tiles, each written as a Quill project
+
+    grid: the scene bounds are divided into divisions (x, y, z) equal cells.
+    octree: cells are split in eight while they hold more than max_tile_bytes
+    of strokes, down to max_depth.
+    Empty tiles are not written. Picture layers have no geometry to place,
+    they are written to a separate "shared" project. Layers without binary
+    data (viewpoints, ...) are kept in every project.
+    """
+    MANIFEST_NAME = 'tiles.json'
+    VERSION = 1
+    SHARED_NAME = 'shared'
+
+    def __init__(self, project, mode="grid", divisions=(2, 2, 2), max_tile_bytes=64 * 1024 * 1024, max_depth=6):
+        if mode not in TILING_MODES:
+            raise ValueError("Unknown tiling mode '{}', expected one of {}".format(mode, TILING_MODES))
+        self.project = project
+        self.mode = mode
+        self.divisions = tuple(int(division) for division in divisions)
+        self.max_tile_bytes = max_tile_bytes
+        self.max_depth = max_depth
+
+    def get_value_chunk(self, data_file_offset, value_sizes):
+        offset = int(data_file_offset, 16)
+        binary_chunk_obj, _ = self.project.binary_data_obj.chunk(offset, value_sizes[offset])
+        return binary_chunk_obj
+
+    def get_strokes(self, values, value_sizes):
+        """World bounds and byte size of every stroke, and the range of strokes of each value
+
+        Only the stroke headers are read, the vertices are decoded once when
+        the drawing is written out.
+        """
+        stroke_mins = []
+        stroke_maxs = []
+        stroke_sizes = []
+        stroke_ranges = {}
+        num_strokes = 0
+        stroke_size = QuillDrawingArrays.get_stroke_dtype().itemsize
+        vertex_size = QuillDrawingArrays.get_vertex_dtype().itemsize
+        for _, layer_type, data_file_offset, matrix in values:
+            if layer_type != "Paint":
+                continue
+            strokes = QuillDrawingArrays.decode_strokes(self.get_value_chunk(data_file_offset, value_sizes))
+            mins, maxs = transform_bounding_boxes(strokes["stroke_bounding_box"], matrix)
+            stroke_mins.append(mins)
+            stroke_maxs.append(maxs)
+            stroke_sizes.append(stroke_size + strokes["num_vertices"].astype(np.int64) * vertex_size)
+            stroke_ranges[data_file_offset] = (num_strokes, num_strokes + len(strokes))
+            num_strokes += len(strokes)
+        if not num_strokes:
+            return np.empty((0, 3)), np.empty((0, 3)), np.empty(0, dtype=np.int64), stroke_ranges
+        return np.concatenate(stroke_mins), np.concatenate(stroke_maxs), np.concatenate(stroke_sizes), stroke_ranges
+
+    def get_last_values(self, values, stroke_ranges, tile_indices, tiles):
+        """Project name -> index of the last value written to it"""
+        last_values = {}
+        for value_index, (_, layer_type, data_file_offset, _) in enumerate(values):
+            if layer_type == "Picture":
+                last_values[self.SHARED_NAME] = value_index
+                continue
+            start, end = stroke_ranges[data_file_offset]
+            for tile_index in np.unique(tile_indices[start:end]):
+                last_values[tiles[tile_index]["Name"]] = value_index
+        return last_values
+
+    def get_grid_tiles(self, centers, bounds_min, bounds_max):
+        """Tile index of every stroke, and a description of every tile"""
+        divisions = np.array(self.divisions)
+        cell_size = np.where(bounds_max > bounds_min, bounds_max - bounds_min, 1.0) / divisions
+        cells = np.clip(((centers - bounds_min) // cell_size).astype(np.int64), 0, divisions - 1)
+        tile_indices = np.ravel_multi_index(cells.T, self.divisions) if len(cells) else np.empty(0, dtype=np.int64)
+        tiles = []
+        for cell in np.ndindex(*self.divisions):
+            cell_min = bounds_min + np.array(cell) * cell_size
+            tiles.append({
+                "Name": "tile_{}_{}_{}".format(*cell),
+                "Cell": list(cell),
+                "Bounds": to_quill_bounding_box(cell_min, cell_min + cell_size),
+            })
+        return tile_indices, tiles
+
+    def get_octree_tiles(self, centers, sizes, bounds_min, bounds_max):
+        """Tile index of every stroke, and a description of every (leaf) tile"""
+        tile_indices = np.zeros(len(centers), dtype=np.int64)
+        tiles = []
+        # (octree key, cell min, cell max, stroke indices)
+        cells = [("", bounds_min, bounds_max, np.arange(len(centers)))]
+        while cells:
+            key, cell_min, cell_max, indices = cells.pop()
+            if sizes[indices].sum() > self.max_tile_bytes and len(key) < self.max_depth and len(indices) > 1:
+                middle = (cell_min + cell_max) * 0.5
+                octants = ((centers[indices] >= middle) * np.array([1, 2, 4])).sum(axis=1)
+                for octant in range(7, -1, -1):
+                    octant_indices = indices[octants == octant]
+                    if not len(octant_indices):
+                        continue
+                    upper = (octant >> np.arange(3)) & 1 == 1
+                    cells.append((
+                        key + str(octant),
+                        np.where(upper, middle, cell_min),
+                        np.where(upper, cell_max, middle),
+                        octant_indices,
+                    ))
+                continue
+            tile_indices[indices] = len(tiles)
+            tiles.append({
+                "Name": "tile_{}".format(key or "root"),
+                "Key": key,
+                "Bounds": to_quill_bounding_box(cell_min, cell_max),
+            })
+        return tile_indices, tiles
+
+    def run(self, output_dir):
+        """Writes a project per non-empty tile (and the shared one) plus the manifest, returns the manifest"""
+        value_sizes = {
+            value_range["offset"]: value_range["size"]
+            for value_range in self.project.get_quill_file_value_ranges()
+        }
+        values = get_layer_values(self.project.scene_data_obj)
+        stroke_mins, stroke_maxs, stroke_sizes, stroke_ranges = self.get_strokes(values, value_sizes)
+        centers = (stroke_mins + stroke_maxs) * 0.5
+        if len(centers):
+            bounds_min, bounds_max = stroke_mins.min(axis=0), stroke_maxs.max(axis=0)
+        else:
+            bounds_min = bounds_max = np.zeros(3)
+
+        if self.mode == "grid":
+            tile_indices, tiles = self.get_grid_tiles(centers, bounds_min, bounds_max)
+        else:
+            tile_indices, tiles = self.get_octree_tiles(centers, stroke_sizes, bounds_min, bounds_max)
+
+        scene_data = self.project.scene_data_obj.get_data()
+        headers = self.project.get_quill_scene_headers()
+        state_data = self.project.state_data
+        # Writers are opened on their first value and closed after their last
+        # one, rather than keeping a file open for every tile until the end
+        last_values = self.get_last_values(values, stroke_ranges, tile_indices, tiles)
+        writers = {}
+        written = set()
+
+        def get_writer(name):
+            if name not in writers:
+                writers[name] = QuillProjectWriter(os.path.join(output_dir, name), scene_data, headers, state_data)
+            return writers[name]
+
+        for value_index, (_, layer_type, data_file_offset, _) in enumerate(values):
+            if layer_type == "Picture":
+                get_writer(self.SHARED_NAME).write_picture(
+                    data_file_offset, self.get_value_chunk(data_file_offset, value_sizes))
+            else:
+                start, end = stroke_ranges[data_file_offset]
+                if start < end:
+                    drawing = QuillDrawingArrays.decode(self.get_value_chunk(data_file_offset, value_sizes))
+                    vertex_offsets = drawing.get_vertex_offsets()
+                    drawing_tile_indices = tile_indices[start:end]
+                    for tile_index in np.unique(drawing_tile_indices):
+                        stroke_indices = np.flatnonzero(drawing_tile_indices == tile_index)
+                        vertex_indices = gather_ranges(
+                            vertex_offsets[stroke_indices], drawing.strokes["num_vertices"][stroke_indices])
+                        get_writer(tiles[tile_index]["Name"]).write_drawing(
+                            data_file_offset,
+                            QuillDrawingArrays(drawing.strokes[stroke_indices], drawing.vertices[vertex_indices]),
+                        )
+            for name in [name for name in writers if last_values[name] == value_index]:
+                writers.pop(name).close()
+                written.add(name)
+
+        def get_size(name):
+            return os.path.getsize(os.path.join(output_dir, name, 'Quill.qbin'))
+
+        manifest_tiles = []
+        for tile_index, tile in enumerate(tiles):
+            if tile["Name"] not in written:
+                continue
+            in_tile = tile_indices == tile_index
+            manifest_tiles.append({
+                **tile,
+                "Path": tile["Name"],
+                "ContentBounds": to_quill_bounding_box(stroke_mins[in_tile].min(axis=0), stroke_maxs[in_tile].max(axis=0)),
+                "NumStrokes": int(in_tile.sum()),
+                "StrokeBytes": int(stroke_sizes[in_tile].sum()),
+                "Bytes": get_size(tile["Name"]),
+            })
+        shared = None
+        if self.SHARED_NAME in written:
+            shared = {"Path": self.SHARED_NAME, "Bytes": get_size(self.SHARED_NAME)}
+
+        manifest = {
+            "Version": self.VERSION,
+            "Mode": self.mode,
+            "Divisions": list(self.divisions) if self.mode == "grid" else None,
+            "MaxTileBytes": self.max_tile_bytes if self.mode == "octree" else None,
+            "Bounds": to_quill_bounding_box(bounds_min, bounds_max),
+            "Tiles": manifest_tiles,
+            "Shared": shared,
+        }
+        with open(os.path.join(output_dir, self.MANIFEST_NAME), 'w') as outfile:
+            json.dump(manifest, outfile, indent=1)
+        return manifest
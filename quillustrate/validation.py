@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import math
+import mmap
+from collections import OrderedDict
+from quillustrate.engines.quill import (
+    QuillBrushType,
+    QuillDrawingObject,
+    QuillPictureObject,
+    QuillSceneData,
+    QuillSceneObject,
+    QuillStrokeObject,
+    QuillVertexObject,
+)
+
+# Checks Quill.qbin against Quill.json by walking only the headers: the scene
+# header, each drawing's stroke count and each stroke header (vertices are
+# skipped using num_vertices), each picture header. Quill.qbin is memory
+# mapped, so only the header pages are read. No numpy, plain struct.
+
+PICTURE_CHANNELS = {6: 3, 7: 4}
+
+
+class QuillValidationError(ValueError):
+    def __init__(self, report):
+        self.report = report
+        super().__init__("Invalid Quill project:\n" + "\n".join(
+            "  {}".format(line) for line in QuillValidator.format_issues(report["Errors"])
+        ))
+
+
+class QuillValidator(object):
+    """Validates Quill.qbin (any bytes-like, e.g. an mmap) against the Quill.json scene data
+
+    run() returns a report with the errors (the project cannot be decoded
+    correctly), warnings (it decodes, but something is off) and per layer
+    statistics.
+    """
+    BOUNDING_BOX_TOLERANCE = 1e-4
+
+    def __init__(self, scene_data, binary_data):
+        self.scene_data = scene_data
+        self.binary_data = binary_data
+        self.file_size = len(binary_data)
+        self.errors = []
+        self.warnings = []
+        self.scene_header_struct = QuillSceneObject.get_header_struct()
+        self.num_strokes_struct = QuillDrawingObject.get_header_struct()
+        self.stroke_header_struct = QuillStrokeObject.get_header_struct()
+        self.picture_header_struct = QuillPictureObject.get_header_struct()
+        self.vertex_size = sum(item["type"].size for item in QuillVertexObject.VALUE_OFFSETS)
+
+    def error(self, layer_path, data_file_offset, message):
+        self.errors.append({"Path": layer_path, "DataFileOffset": data_file_offset, "Message": message})
+
+    def warning(self, layer_path, data_file_offset, message):
+        self.warnings.append({"Path": layer_path, "DataFileOffset": data_file_offset, "Message": message})
+
+    def get_values(self):
+        """(layer path, layer type, DataFileOffset, Quill.json drawing or picture implementation)"""
+        return [
+            (layer_path, layer_type, value_data["DataFileOffset"], value_data)
+            for layer_path, layer_type, _, value_data in QuillSceneData(self.scene_data).iter_layer_values()
+        ]
+
+    def get_ranges(self, values):
+        """Offset and end of each value, values with an unusable offset are reported and left out"""
+        offsets = {}
+        for layer_path, _, data_file_offset, _ in values:
+            try:
+                offset = int(data_file_offset, 16)
+            except (TypeError, ValueError):
+                self.error(layer_path, data_file_offset, "DataFileOffset is not hexadecimal")
+                continue
+            if offset < self.scene_header_struct.size:
+                self.error(layer_path, data_file_offset, "Offset overlaps the scene header")
+            elif offset >= self.file_size:
+                self.error(layer_path, data_file_offset, "Offset is past the end of Quill.qbin ({} bytes)".format(self.file_size))
+            elif offset in offsets:
+                self.error(layer_path, data_file_offset, "Offset is also used by {}".format(offsets[offset]))
+            else:
+                offsets[offset] = layer_path
+        sorted_offsets = sorted(offsets)
+        ends = sorted_offsets[1:] + [self.file_size]
+        return dict(zip(sorted_offsets, ends))
+
+    def check_drawing(self, layer_path, data_file_offset, drawing_data, offset, end, stats):
+        if end - offset < self.num_strokes_struct.size:
+            self.error(layer_path, data_file_offset, "Drawing is truncated before its stroke count")
+            return
+        num_strokes, = self.num_strokes_struct.unpack_from(self.binary_data, offset)
+        if num_strokes < 0:
+            self.error(layer_path, data_file_offset, "Negative stroke count {}".format(num_strokes))
+            return
+
+        stroke_header_struct = self.stroke_header_struct
+        stroke_header_size = stroke_header_struct.size
+        vertex_size = self.vertex_size
+        binary_data = self.binary_data
+        # Only added to the layer statistics once the whole drawing checks out
+        brush_types = {}
+        bounding_box = None
+        num_vertices_total = 0
+        num_invalid_bounding_boxes = 0
+        highest_global_stroke_id = -1
+        position = offset + self.num_strokes_struct.size
+        for stroke_index in range(num_strokes):
+            if position + stroke_header_size > end:
+                self.error(layer_path, data_file_offset, "Stroke {} of {} header runs past the end of the drawing ({} > {})".format(
+                    stroke_index, num_strokes, position + stroke_header_size, end))
+                return
+            header = stroke_header_struct.unpack_from(binary_data, position)
+            # global_stroke_id, unknown0, 6 bounding box floats, brush_type, 2 bools, num_vertices
+            num_vertices = header[-1]
+            if num_vertices < 0:
+                self.error(layer_path, data_file_offset, "Stroke {} has a negative vertex count {}".format(stroke_index, num_vertices))
+                return
+            position += stroke_header_size + num_vertices * vertex_size
+            if position > end:
+                self.error(layer_path, data_file_offset, "Stroke {} of {} vertices run past the end of the drawing ({} > {})".format(
+                    stroke_index, num_strokes, position, end))
+                return
+
+            stroke_bounding_box = header[2:8]
+            if not all(math.isfinite(value) for value in stroke_bounding_box) or any(
+                    stroke_bounding_box[axis] > stroke_bounding_box[axis + 1] for axis in (0, 2, 4)):
+                num_invalid_bounding_boxes += 1
+            elif bounding_box is None:
+                bounding_box = list(stroke_bounding_box)
+            else:
+                for axis in (0, 2, 4):
+                    bounding_box[axis] = min(bounding_box[axis], stroke_bounding_box[axis])
+                    bounding_box[axis + 1] = max(bounding_box[axis + 1], stroke_bounding_box[axis + 1])
+            brush_type = header[8]
+            brush_types[brush_type] = brush_types.get(brush_type, 0) + 1
+            highest_global_stroke_id = max(highest_global_stroke_id, header[0])
+            num_vertices_total += num_vertices
+
+        if position < end:
+            self.warning(layer_path, data_file_offset, "{} bytes after the last stroke".format(end - position))
+        if num_invalid_bounding_boxes:
+            self.warning(layer_path, data_file_offset, "{} strokes with a non finite or inverted bounding box".format(
+                num_invalid_bounding_boxes))
+        if bounding_box is not None and drawing_data.get("BoundingBox") is not None:
+            if any(abs(a - b) > self.BOUNDING_BOX_TOLERANCE * max(1.0, abs(a))
+                   for a, b in zip(bounding_box, drawing_data["BoundingBox"])):
+                self.warning(layer_path, data_file_offset, "Quill.json BoundingBox does not match the strokes")
+
+        for brush_type, count in brush_types.items():
+            stats["BrushTypes"][brush_type] = stats["BrushTypes"].get(brush_type, 0) + count
+        stats["NumDrawings"] += 1
+        stats["NumStrokes"] += num_strokes
+        stats["NumVertices"] += num_vertices_total
+        stats["Bytes"] += end - offset
+        stats["HighestGlobalStrokeId"] = max(stats["HighestGlobalStrokeId"], highest_global_stroke_id)
+        stats["BoundingBox"] = self.merge_bounding_boxes(stats["BoundingBox"], bounding_box)
+
+    def check_picture(self, layer_path, data_file_offset, offset, end, stats):
+        if end - offset < self.picture_header_struct.size:
+            self.error(layer_path, data_file_offset, "Picture is truncated before the end of its header")
+            return
+        header = dict(zip(
+            [item["field"] for item in QuillPictureObject.get_header_offset_items()],
+            self.picture_header_struct.unpack_from(self.binary_data, offset),
+        ))
+        channels = PICTURE_CHANNELS.get(header["image_type"])
+        if channels is None:
+            self.error(layer_path, data_file_offset, "Unknown image type {}".format(header["image_type"]))
+            return
+        if header["image_width"] < 0 or header["image_height"] < 0:
+            self.error(layer_path, data_file_offset, "Negative image size {}x{}".format(header["image_width"], header["image_height"]))
+            return
+        size = self.picture_header_struct.size + header["image_width"] * header["image_height"] * channels
+        if offset + size > end:
+            self.error(layer_path, data_file_offset, "{}x{} pixels run past the end of the picture ({} > {})".format(
+                header["image_width"], header["image_height"], offset + size, end))
+            return
+        if offset + size < end:
+            self.warning(layer_path, data_file_offset, "{} bytes after the pixels".format(end - offset - size))
+        stats.update({
+            "Width": header["image_width"],
+            "Height": header["image_height"],
+            "Channels": channels,
+            "Bytes": end - offset,
+        })
+
+    @classmethod
+    def merge_bounding_boxes(cls, bounding_box, other):
+        if bounding_box is None:
+            return other
+        if other is None:
+            return bounding_box
+        return [
+            min(bounding_box[index], other[index]) if index % 2 == 0 else max(bounding_box[index], other[index])
+            for index in range(6)
+        ]
+
+    def run(self):
+        report = OrderedDict()
+        report["FileSize"] = self.file_size
+        if self.file_size < self.scene_header_struct.size:
+            self.error(None, None, "Quill.qbin is shorter than the scene header ({} bytes)".format(self.file_size))
+            headers = {}
+        else:
+            headers = dict(zip(
+                [item["field"] for item in QuillSceneObject.get_header_offset_items()],
+                self.scene_header_struct.unpack_from(self.binary_data, 0),
+            ))
+        report["Headers"] = headers
+
+        values = self.get_values()
+        ranges = self.get_ranges(values)
+        layers = OrderedDict()
+        for layer_path, layer_type, data_file_offset, value_data in values:
+            stats = layers.get(layer_path)
+            if stats is None:
+                stats = layers[layer_path] = {"Path": layer_path, "Type": layer_type}
+                if layer_type == "Paint":
+                    stats.update({
+                        "NumDrawings": 0, "NumStrokes": 0, "NumVertices": 0, "Bytes": 0,
+                        "BrushTypes": {}, "BoundingBox": None, "HighestGlobalStrokeId": -1,
+                    })
+            try:
+                offset = int(data_file_offset, 16)
+            except (TypeError, ValueError):
+                continue
+            if offset not in ranges or ranges[offset] is None:
+                continue
+            end = ranges[offset]
+            # A value is checked once, even if (wrongly) referenced twice
+            ranges[offset] = None
+            if layer_type == "Paint":
+                self.check_drawing(layer_path, data_file_offset, value_data, offset, end, stats)
+            else:
+                self.check_picture(layer_path, data_file_offset, offset, end, stats)
+
+        totals = {"NumLayers": len(layers), "NumDrawings": 0, "NumStrokes": 0, "NumVertices": 0, "NumPictures": 0,
+                  "BrushTypes": {}, "BoundingBox": None}
+        highest_global_stroke_id = -1
+        for stats in layers.values():
+            if stats["Type"] == "Picture":
+                totals["NumPictures"] += 1
+                continue
+            for key in ("NumDrawings", "NumStrokes", "NumVertices"):
+                totals[key] += stats[key]
+            totals["BoundingBox"] = self.merge_bounding_boxes(totals["BoundingBox"], stats["BoundingBox"])
+            highest_global_stroke_id = max(highest_global_stroke_id, stats.pop("HighestGlobalStrokeId"))
+            stats["BrushTypes"] = self.name_brush_types(stats["BrushTypes"])
+            for name, count in stats["BrushTypes"].items():
+                totals["BrushTypes"][name] = totals["BrushTypes"].get(name, 0) + count
+        if headers and highest_global_stroke_id > headers["highest_global_stroke_id"]:
+            self.warning(None, None, "Stroke id {} is above the header's highest_global_stroke_id {}".format(
+                highest_global_stroke_id, headers["highest_global_stroke_id"]))
+
+        report["Valid"] = not self.errors
+        report["Errors"] = self.errors
+        report["Warnings"] = self.warnings
+        report["Totals"] = totals
+        report["Layers"] = list(layers.values())
+        return report
+
+    @classmethod
+    def name_brush_types(cls, brush_types):
+        return {
+            QuillBrushType.MAPPING.get(code, "UNKNOWN_{}".format(code)): count
+            for code, count in sorted(brush_types.items())
+        }
+
+    @classmethod
+    def format_issues(cls, issues):
+        lines = []
+        for issue in issues:
+            location = issue["Path"] or "Quill.qbin"
+            if issue["DataFileOffset"] is not None:
+                location = "{} @ {}".format(location, issue["DataFileOffset"])
+            lines.append("{}: {}".format(location, issue["Message"]))
+        return lines
+
+    @classmethod
+    def format_report(cls, report):
+        lines = []
+        for layer in report["Layers"]:
+            if layer["Type"] == "Paint":
+                lines.append("{}: {} drawings, {} strokes, {} vertices, {} bytes, {}".format(
+                    layer["Path"],
+                    layer["NumDrawings"],
+                    layer["NumStrokes"],
+                    layer["NumVertices"],
+                    layer["Bytes"],
+                    ", ".join("{} {}".format(count, name) for name, count in layer["BrushTypes"].items()) or "no strokes",
+                ))
+            elif "Width" in layer:
+                lines.append("{}: {}x{} picture, {} channels, {} bytes".format(
+                    layer["Path"], layer["Width"], layer["Height"], layer["Channels"], layer["Bytes"]))
+            else:
+                lines.append("{}: picture".format(layer["Path"]))
+        totals = report["Totals"]
+        lines.append("{} layers, {} drawings, {} strokes, {} vertices, {} pictures, {} bytes".format(
+            totals["NumLayers"],
+            totals["NumDrawings"],
+            totals["NumStrokes"],
+            totals["NumVertices"],
+            totals["NumPictures"],
+            report["FileSize"],
+        ))
+        lines += ["warning: {}".format(line) for line in cls.format_issues(report["Warnings"])]
+        lines += ["error: {}".format(line) for line in cls.format_issues(report["Errors"])]
+        lines.append("valid" if report["Valid"] else "INVALID")
+        return lines
+
+
+def validate_project(proj_dir):
+    """Validation report of the Quill project in proj_dir"""
+    with open(os.path.join(proj_dir, 'Quill.json'), 'r') as json_file:
+        scene_data = json.load(json_file)
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'rb') as binary_file:
+        if os.fstat(binary_file.fileno()).st_size == 0:
+            return QuillValidator(scene_data, b"").run()
+        with mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ) as binary_data:
+            return QuillValidator(scene_data, binary_data).run()
+
+
+def check_project(proj_dir):
+    """Raises QuillValidationError unless the Quill project in proj_dir is valid, returns the report"""
+    report = validate_project(proj_dir)
+    if not report["Valid"]:
+        raise QuillValidationError(report)
+    return report
+
+
+def check_project_or_exit(proj_dir):
+    """check_project for the CLIs, exits with the errors when the project is invalid"""
+    try:
+        return check_project(proj_dir)
+    except QuillValidationError as error:
+        sys.exit(str(error))
+
+
+def add_validation_arguments(parser):
+    """The CLIs' --skip-validation option, for check_project_or_exit"""
+    parser.add_argument(
+        '--skip-validation',
+        help='Do not check the input Quill.qbin against Quill.json before starting',
+        action='store_true',
+    )
@@ -0,0 +1,79 @@
+import os
+import json
+import shutil
+import importlib.util
+import pytest
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProject, QuillType
+from quillustrate.roundtrip import QuillSceneGenerator
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_DIR = os.path.join(REPO_DIR, 'assets', 'QuillExamples')
+EXAMPLE_NAMES = sorted(os.listdir(EXAMPLES_DIR))
+
+
+def write_generated_project(proj_dir, seed, **generator_options):
+    """A random (valid) Quill project in proj_dir, see QuillSceneGenerator"""
+    os.makedirs(proj_dir)
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'wb') as binary_file:
+        scene_data = QuillSceneGenerator(seed, **generator_options).run(binary_file)
+    with open(os.path.join(proj_dir, 'Quill.json'), 'w') as outfile:
+        json.dump(scene_data, outfile, indent=1)
+    shutil.copy(os.path.join(EXAMPLES_DIR, 'Base', 'State.json'), proj_dir)
+    return proj_dir
+
+
+def get_drawings(project):
+    """(layer path, Drawings index) -> decoded drawing of every drawing in the project"""
+    drawings = {}
+    for value_range in project.get_quill_file_value_ranges():
+        if value_range["type"] != QuillType.DRAWING:
+            continue
+        binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+        drawings[value_range["path"], value_range["index"]] = QuillDrawingArrays.decode(binary_chunk_obj)
+    return drawings
+
+
+def assert_drawing_bounding_boxes(proj_dir):
+    """Quill.json BoundingBoxes match the strokes, Quill's empty box for drawings without strokes"""
+    project = QuillProject(proj_dir)
+    drawings = get_drawings(project)
+    for layer_path, layer_type, index, value_data in project.scene_data_obj.iter_layer_values():
+        if layer_type != "Paint":
+            continue
+        expected = drawings[layer_path, index].get_bounding_box()
+        if expected is None:
+            assert value_data["BoundingBox"] == QuillDrawingArrays.EMPTY_BOUNDING_BOX
+        else:
+            assert value_data["BoundingBox"] == pytest.approx(expected, abs=1e-5)
+
+
+@pytest.fixture(params=EXAMPLE_NAMES)
+def example_dir(request):
+    return os.path.join(EXAMPLES_DIR, request.param)
+
+
+@pytest.fixture
+def generate_project(tmp_path):
+    """generate_project(seed, name='generated', **generator_options) -> project dir"""
+    def generate(seed=0, name='generated', **generator_options):
+        return write_generated_project(str(tmp_path / name), seed, **generator_options)
+    return generate
+
+
+def load_script(script_name):
+    """A bin/ script as a module (bin/ is not a package)"""
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(script_name)[0],
+        os.path.join(REPO_DIR, 'bin', script_name),
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def run_script():
+    """run_script('quill_converter.py', *argv) -> what the bin/ script's main returned"""
+    def run(script_name, *argv):
+        return load_script(script_name).main(list(argv))
+    return run
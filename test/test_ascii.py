@@ -0,0 +1,102 @@
+import io
+import json
+import pytest
+from quillustrate.engines.quill import (
+    QuillAsciiDecoder,
+    QuillAsciiEncoder,
+    QuillBinaryData,
+    QuillDrawingArrays,
+    QuillJsonStreamReader,
+    QuillProject,
+)
+
+
+def encode_ascii(proj_dir):
+    project = QuillProject(proj_dir)
+    outfile = io.StringIO()
+    QuillAsciiEncoder(project.scene_data_obj, project.binary_data_obj).run(outfile)
+    return project, outfile.getvalue()
+
+
+def decode_ascii(text, chunk_size=None):
+    binary_file = io.BytesIO()
+    scene_data_obj = QuillAsciiDecoder(io.StringIO(text), chunk_size=chunk_size).run(binary_file)
+    return scene_data_obj, binary_file.getvalue()
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.num_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.num_read += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize('chunk_size', [None, 4096, 7])
+def test_examples_round_trip(example_dir, chunk_size):
+    project, text = encode_ascii(example_dir)
+    _, binary = decode_ascii(text, chunk_size)
+    assert binary == project.binary_data_obj.get_data()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 4096, 7])
+def test_generated_round_trip(generate_project, chunk_size):
+    for seed in range(3):
+        project, text = encode_ascii(generate_project(seed, name='generated_{}'.format(seed)))
+        scene_data_obj, binary = decode_ascii(text, chunk_size)
+        assert binary == project.binary_data_obj.get_data()
+        assert scene_data_obj.get_data() == project.scene_data_obj.get_data()
+
+
+def test_empty_strokes(generate_project):
+    project, text = encode_ascii(generate_project(1, picture_probability=0.0))
+    document = json.loads(text)
+    strokes = document["Data"]["Values"][0]["strokes"]
+    strokes[0]["vertices"] = []
+    strokes[-1]["vertices"] = []
+
+    scene_data_obj, binary = decode_ascii(json.dumps(document, indent=1), chunk_size=64)
+    value_range = scene_data_obj.get_quill_file_value_ranges(len(binary))[0]
+    binary_chunk_obj, _ = QuillBinaryData(binary).chunk(value_range["offset"], value_range["size"])
+    drawing = QuillDrawingArrays.decode(binary_chunk_obj)
+    assert drawing.strokes["num_vertices"][0] == 0
+    assert drawing.strokes["num_vertices"][-1] == 0
+    assert len(drawing.strokes) == len(strokes)
+
+
+def test_pack_vertices_rejects_short_vectors():
+    vertex = {field: [0.0, 0.0, 0.0] for field in ("position", "normal", "tangent", "color")}
+    vertex.update(opacity=1.0, width=0.1)
+    assert len(QuillAsciiDecoder.pack_vertices([vertex, vertex])) == 2
+    with pytest.raises(ValueError):
+        QuillAsciiDecoder.pack_vertices([vertex, dict(vertex, normal=[0.0, 1.0])])
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('[1.5e-07, -2, true, null, "a\\"b\\\\"]', [1.5e-07, -2, True, None, 'a"b\\']),
+    ('{"a": {"b": [[], {}, 12345678]}, "c": "' + 'x' * 100 + '"}', {"a": {"b": [[], {}, 12345678]}, "c": 'x' * 100}),
+])
+def test_reader_values_across_chunks(text, expected):
+    for chunk_size in range(1, len(text) + 1):
+        assert QuillJsonStreamReader(io.StringIO(text), chunk_size=chunk_size).read_value() == expected
+
+
+def test_reader_raises_before_end_of_malformed_input():
+    text = '[' + ', '.join(['[1, 2, 3]'] * 10) + ', [1, 2 3]' + ', [4]' * 10000 + ']'
+    infile = CountingReader(text)
+    with pytest.raises(ValueError):
+        QuillJsonStreamReader(infile, chunk_size=64).read_value()
+    assert infile.num_read < 1024
+
+
+@pytest.mark.parametrize('missing_key', ['headers', 'pixels'])
+def test_picture_without_headers_or_pixels(generate_project, missing_key):
+    _, text = encode_ascii(generate_project(2, picture_probability=1.0))
+    document = json.loads(text)
+    picture = next(value for value in document["Data"]["Values"] if value["Type"] == "Picture")
+    del picture[missing_key]
+    with pytest.raises(ValueError, match="without headers/pixels"):
+        decode_ascii(json.dumps(document))
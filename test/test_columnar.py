@@ -0,0 +1,70 @@
+import os
+import json
+import numpy as np
+from quillustrate.engines.quill import (
+    QuillColumnarProject,
+    QuillDrawingArrays,
+    QuillPictureObject,
+    QuillProject,
+    QuillType,
+)
+
+
+def assert_columnar_matches(proj_dir, output_dir):
+    project = QuillProject(proj_dir)
+    project.write_quill_columnar(output_dir)
+    columnar = QuillColumnarProject(output_dir)
+
+    assert columnar.get_headers() == project.get_quill_scene_headers()
+    for value_range in project.get_quill_file_value_ranges():
+        binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+        if value_range["type"] == QuillType.DRAWING:
+            expected = QuillDrawingArrays.decode(binary_chunk_obj)
+            drawing = columnar.get_drawing(value_range["path"], value_range["index"])
+            assert np.array_equal(drawing.strokes, expected.strokes)
+            assert np.array_equal(drawing.vertices.view(np.uint8), expected.vertices.view(np.uint8))
+        else:
+            _, pixels = QuillPictureObject.decode_arrays(binary_chunk_obj)
+            assert np.array_equal(columnar.get_picture_pixels(value_range["path"]), pixels)
+    return project, columnar
+
+
+def test_examples_round_trip(example_dir, tmp_path):
+    assert_columnar_matches(example_dir, str(tmp_path))
+
+
+def test_generated_round_trip(generate_project, tmp_path):
+    for seed in range(4):
+        proj_dir = generate_project(seed, name='generated_{}'.format(seed))
+        project, columnar = assert_columnar_matches(proj_dir, str(tmp_path / 'columnar_{}'.format(seed)))
+        for layer in columnar.get_layers():
+            assert layer["Path"].startswith("Root/")
+            assert "\\" not in layer["Path"]
+
+
+def test_drawings_listed_in_layer_order(generate_project, tmp_path):
+    proj_dir = generate_project(3, max_drawings=1, picture_probability=0.0, group_probability=0.0)
+    quill_json_path = os.path.join(proj_dir, 'Quill.json')
+    with open(quill_json_path) as json_file:
+        scene_data = json.load(json_file)
+    # Two drawings in one layer, the first one stored last in Quill.qbin
+    children = scene_data["Sequence"]["RootLayer"]["Implementation"]["Children"]
+    first, second = children[0], children[-1]
+    assert first is not second
+    first["Implementation"]["Drawings"] = (
+        second["Implementation"]["Drawings"] + first["Implementation"]["Drawings"]
+    )
+    children.remove(second)
+    with open(quill_json_path, 'w') as outfile:
+        json.dump(scene_data, outfile)
+
+    project, columnar = assert_columnar_matches(proj_dir, str(tmp_path / 'columnar'))
+    layer = columnar.get_layer(project.get_quill_file_value_ranges()[0]["path"])
+    offsets = [drawing["DataFileOffset"] for drawing in layer["Drawings"]]
+    assert offsets == [drawing["DataFileOffset"] for drawing in first["Implementation"]["Drawings"]]
+    assert offsets != sorted(offsets)
+
+
+def test_converter_columnar(example_dir, tmp_path, run_script):
+    run_script('quill_converter.py', '--input', example_dir, '--output', str(tmp_path), '--format', 'columnar')
+    assert os.path.exists(os.path.join(str(tmp_path), QuillColumnarProject.DIR_NAME, QuillColumnarProject.MANIFEST_NAME))
@@ -0,0 +1,112 @@
+import os
+import json
+import shutil
+import numpy as np
+from quillustrate.diff import QuillDrawingDiff, QuillProjectDiff
+from quillustrate.engines.quill import (
+    QuillDrawingArrays,
+    QuillProject,
+    QuillProjectWriter,
+    QuillSceneData,
+    QuillType,
+)
+from test.conftest import EXAMPLES_DIR
+
+
+def edit_scene(proj_dir, edit):
+    quill_json_path = os.path.join(proj_dir, 'Quill.json')
+    with open(quill_json_path) as json_file:
+        scene_data = json.load(json_file)
+    edit(scene_data["Sequence"]["RootLayer"])
+    with open(quill_json_path, 'w') as outfile:
+        json.dump(scene_data, outfile)
+
+
+def copy_project(proj_dir, tmp_path, name='copy'):
+    return shutil.copytree(proj_dir, str(tmp_path / name))
+
+
+def test_identical(example_dir, run_script, capsys):
+    assert run_script('file_diff.py', '-a', example_dir, '-b', example_dir) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-2].split()[0] == lines[-2].split()[2]
+    assert lines[-1].split()[0] == lines[-1].split()[2]
+
+
+def test_values_keyed_by_drawings_index(generate_project, tmp_path, run_script):
+    proj_dir = generate_project(2, max_drawings=3)
+    project = QuillProject(proj_dir)
+    with open(os.path.join(proj_dir, 'State.json')) as json_file:
+        state_data = json.load(json_file)
+
+    # The same scene with its values stored in reverse order
+    output_dir = str(tmp_path / 'reversed')
+    writer = QuillProjectWriter(output_dir, project.scene_data_obj.get_data(), project.get_quill_scene_headers(), state_data)
+    for value_range in reversed(project.get_quill_file_value_ranges()):
+        binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+        data_file_offset = QuillSceneData.format_data_file_offset(value_range["offset"])
+        if value_range["type"] == QuillType.DRAWING:
+            writer.write_drawing(data_file_offset, QuillDrawingArrays.decode(binary_chunk_obj))
+        else:
+            writer.write_picture(data_file_offset, binary_chunk_obj)
+    writer.close()
+
+    results = QuillProjectDiff.from_dirs(proj_dir, output_dir).run()
+    assert {result["status"] for result in results} == {"identical"}
+    assert run_script('file_diff.py', '-a', proj_dir, '-b', output_dir) == 0
+
+
+def test_json_only_changes(tmp_path, run_script, capsys):
+    proj_dir = os.path.join(EXAMPLES_DIR, 'CBrushLine')
+    moved_dir = copy_project(proj_dir, tmp_path, 'moved')
+
+    def move_and_add(root_layer):
+        root_layer["Transform"]["Translation"] = [1.0, 2.0, 3.0]
+        children = root_layer["Implementation"]["Children"]
+        children.append(dict(children[0], Name="Spawn"))
+    edit_scene(moved_dir, move_and_add)
+
+    assert run_script('file_diff.py', '-a', proj_dir, '-b', moved_dir) == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert "~ Root: Transform, Implementation.Children" in lines
+    assert "+ Root/Spawn" in lines
+    assert lines[-1].split()[0] == lines[-1].split()[2]
+
+    hidden_dir = copy_project(proj_dir, tmp_path, 'hidden')
+    edit_scene(hidden_dir, lambda root_layer: root_layer["Implementation"]["Children"][-1].update(Visible=False))
+    results = QuillProjectDiff.from_dirs(proj_dir, hidden_dir).run()
+    assert [result["attributes"] for result in results if result["status"] != "identical"] == [["Visible"]]
+
+
+def test_different_vertex_counts(generate_project):
+    project = QuillProject(generate_project(0, picture_probability=0.0))
+    value_range = project.get_quill_file_value_ranges()[0]
+    binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+    drawing = QuillDrawingArrays.decode(binary_chunk_obj)
+    assert len(drawing.strokes) > 1 and drawing.strokes["num_vertices"][0] > 1
+
+    # The first stroke loses its last vertex, as LOD generation would
+    strokes = drawing.strokes.copy()
+    strokes["num_vertices"][0] -= 1
+    vertices = np.delete(drawing.vertices, drawing.get_vertex_offsets()[1] - 1)
+    result = QuillDrawingDiff(drawing, QuillDrawingArrays(strokes, vertices)).run()
+    assert result["incomparable"] == [int(strokes["global_stroke_id"][0])]
+    assert result["modified"] == result["incomparable"]
+    assert result["max_deviation"] == 0.0
+
+    strokes["num_vertices"] = 1
+    vertices = drawing.vertices[drawing.get_vertex_offsets()[:-1]]
+    result = QuillDrawingDiff(drawing, QuillDrawingArrays(strokes, vertices)).run()
+    assert result["max_deviation"] is None
+    assert len(result["incomparable"]) == len(strokes)
+    lines = QuillProjectDiff.format_results([dict(result, path="Root/Paint", index=0, status="modified")])
+    assert "max vertex deviation n/a" in lines[0]
+
+
+def test_text_files(tmp_path, run_script):
+    file_a = tmp_path / 'a.txt'
+    file_b = tmp_path / 'b.txt'
+    file_a.write_text('a\nb\n')
+    file_b.write_text('a\nc\n')
+    assert run_script('file_diff.py', '-a', str(file_a), '-b', str(file_a)) == 0
+    assert run_script('file_diff.py', '-a', str(file_a), '-b', str(file_b)) == 1
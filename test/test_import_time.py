@@ -0,0 +1,28 @@
+import pytest
+from test.conftest import load_script
+
+check_import_time = load_script('check_import_time.py')
+
+
+@pytest.fixture(scope='module')
+def scale():
+    # Budgets are for a typical machine, slower ones get proportionally more time
+    return check_import_time.get_calibrated_scale(repeat=3)
+
+
+@pytest.mark.parametrize(
+    'python_args, budget',
+    [(python_args, budget) for _, python_args, budget in check_import_time.ENTRY_POINTS],
+    ids=[name for name, _, _ in check_import_time.ENTRY_POINTS],
+)
+def test_import_time(python_args, budget, scale):
+    ok, total, heavy = check_import_time.check(python_args, budget, scale=scale, repeat=3)
+    assert heavy == []
+    assert total > 0
+    assert ok, "{:.1f} ms over the budget of {:.0f} ms".format(total, budget * scale)
+
+
+def test_heavy_imports_are_caught():
+    ok, _, heavy = check_import_time.check(['-c', 'import numpy'], 1000)
+    assert not ok
+    assert heavy == ['numpy']
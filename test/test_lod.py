@@ -0,0 +1,77 @@
+import os
+import json
+import numpy as np
+import pytest
+from quillustrate.engines.quill import QuillProject
+from quillustrate.lod import QuillLodGenerator
+from test.conftest import assert_drawing_bounding_boxes, get_drawings
+
+
+def assert_drawing_conserved(drawing):
+    """The stroke headers account for exactly the vertices stored"""
+    assert int(drawing.strokes["num_vertices"].sum()) == len(drawing.vertices)
+
+
+@pytest.mark.parametrize('distances', [(0.0, 5.0, 20.0), (0.0, 0.5, 2.0, 1000.0)])
+def test_levels_conserve_strokes_and_vertices(generate_project, tmp_path, distances):
+    project = QuillProject(generate_project(6, max_layers=6, group_probability=0.3))
+    output_dir = str(tmp_path / 'lods')
+    manifest = QuillLodGenerator(project, distances=distances).run(output_dir)
+    source_drawings = get_drawings(project)
+    assert [level["Distance"] for level in manifest["Levels"]] == list(distances)
+
+    previous = None
+    for level in manifest["Levels"]:
+        level_drawings = get_drawings(QuillProject(os.path.join(output_dir, level["Path"])))
+        assert level_drawings.keys() == source_drawings.keys()
+        assert_drawing_bounding_boxes(os.path.join(output_dir, level["Path"]))
+        for drawing in level_drawings.values():
+            assert_drawing_conserved(drawing)
+        num_strokes = sum(len(drawing.strokes) for drawing in level_drawings.values())
+        num_vertices = sum(len(drawing.vertices) for drawing in level_drawings.values())
+        assert (level["NumStrokes"], level["NumVertices"]) == (num_strokes, num_vertices)
+        if previous is not None:
+            assert num_strokes <= previous["NumStrokes"]
+            assert num_vertices <= previous["NumVertices"]
+        previous = level
+
+    # Distance 0 keeps every stroke and vertex as is
+    level_drawings = get_drawings(QuillProject(os.path.join(output_dir, manifest["Levels"][0]["Path"])))
+    for key, drawing in source_drawings.items():
+        assert np.array_equal(level_drawings[key].strokes, drawing.strokes)
+        assert level_drawings[key].vertices.tobytes() == drawing.vertices.tobytes()
+
+
+def test_culled_level_is_empty(generate_project, tmp_path):
+    project = QuillProject(generate_project(6, max_layers=4, picture_probability=0.0))
+    output_dir = str(tmp_path / 'lods')
+    manifest = QuillLodGenerator(project, distances=(1e9,)).run(output_dir)
+    assert manifest["Levels"][0]["NumStrokes"] == 0
+    level_dir = os.path.join(output_dir, manifest["Levels"][0]["Path"])
+    assert_drawing_bounding_boxes(level_dir)
+    assert all(not len(drawing.strokes) for drawing in get_drawings(QuillProject(level_dir)).values())
+
+
+def test_decimate_keeps_stroke_ends(generate_project):
+    project = QuillProject(generate_project(7, max_layers=3, picture_probability=0.0))
+    for drawing in get_drawings(project).values():
+        decimated = QuillLodGenerator.decimate(drawing, 0.05)
+        assert_drawing_conserved(decimated)
+        assert np.array_equal(decimated.strokes["num_vertices"] > 0, drawing.strokes["num_vertices"] > 0)
+        assert (decimated.strokes["num_vertices"] <= drawing.strokes["num_vertices"]).all()
+        nonempty = drawing.strokes["num_vertices"] > 0
+        offsets, decimated_offsets = drawing.get_vertex_offsets(), decimated.get_vertex_offsets()
+        assert (decimated.vertices[decimated_offsets[:-1][nonempty]].tobytes()
+                == drawing.vertices[offsets[:-1][nonempty]].tobytes())
+        assert (decimated.vertices[decimated_offsets[1:][nonempty] - 1].tobytes()
+                == drawing.vertices[offsets[1:][nonempty] - 1].tobytes())
+
+
+def test_lod_script(example_dir, tmp_path, run_script):
+    output_dir = str(tmp_path / 'lods')
+    run_script('quill_lod.py', '--input', example_dir, '--output', output_dir, '--distances', '0', '10')
+    with open(os.path.join(output_dir, QuillLodGenerator.MANIFEST_NAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    source_drawings = get_drawings(QuillProject(example_dir))
+    assert manifest["Levels"][0]["NumStrokes"] == sum(len(drawing.strokes) for drawing in source_drawings.values())
+    assert manifest["Levels"][1]["NumStrokes"] <= manifest["Levels"][0]["NumStrokes"]
@@ -0,0 +1,98 @@
+import os
+import zlib
+import struct
+import numpy as np
+import pytest
+from PIL import Image
+from quillustrate.engines.quill import QuillProject, layer_path_to_file_name
+from quillustrate.pictures import (
+    SRGB_TO_LINEAR_16,
+    QuillPictureProcessor,
+    convert_color_space,
+    downscale,
+    premultiply_alpha,
+    write_png,
+)
+
+
+def read_png_16(path):
+    """(bit depth, pixels) of a PNG written by write_png"""
+    with open(path, 'rb') as png_file:
+        data = png_file.read()
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', data[16:26])
+    idat_size, = struct.unpack('>I', data[33:37])
+    rows = np.frombuffer(zlib.decompress(data[41:41 + idat_size]), dtype=np.uint8).reshape(height, -1)
+    num_channels = {2: 3, 6: 4}[color_type]
+    return bit_depth, rows[:, 1:].copy().view('>u2').reshape(height, width, num_channels)
+
+
+def test_layer_path_to_file_name():
+    assert layer_path_to_file_name('Root/Group/Paint') == 'Root_Group_Paint'
+    assert layer_path_to_file_name('Root/a\\b:c*d?"e"<f>|g') == 'Root_a_b_c_d__e__f__g'
+
+
+def test_downscale_ignores_transparent_color():
+    pixels = np.zeros((2, 2, 4), dtype=np.uint8)
+    pixels[0, 0] = [200, 100, 50, 255]
+    # Transparent black neighbours, their color must not darken the visible texel
+    assert downscale(pixels)[0, 0].tolist() == [200, 100, 50, 64]
+    assert downscale(np.zeros((2, 2, 4), dtype=np.uint8))[0, 0].tolist() == [0, 0, 0, 0]
+
+    opaque = np.full((4, 4, 4), 255, dtype=np.uint8)
+    opaque[:, :, :3] = np.arange(16, dtype=np.uint8).reshape(4, 4, 1) * 16
+    assert np.array_equal(downscale(opaque)[..., :3], downscale(opaque[..., :3]))
+
+
+def test_linear_is_16_bit():
+    pixels = np.arange(256, dtype=np.uint8).repeat(4).reshape(16, 16, 4)
+    linear = convert_color_space(pixels, 'Linear')
+    assert linear.dtype == np.uint16
+    assert np.array_equal(linear[..., :3], SRGB_TO_LINEAR_16[pixels[..., :3]])
+    assert np.array_equal(linear[..., 3], pixels[..., 3].astype(np.uint16) * 257)
+    # Every dark sRGB value stays distinct
+    assert len(np.unique(SRGB_TO_LINEAR_16)) == 256
+
+
+def test_premultiply_16_bit():
+    pixels = np.array([[[65535, 32768, 1, 65535], [65535, 32768, 1, 0], [65535, 65535, 65535, 32768]]], dtype=np.uint16)
+    premultiplied = premultiply_alpha(pixels)
+    assert premultiplied.tolist() == [[[65535, 32768, 1, 65535], [0, 0, 0, 0], [32768, 32768, 32768, 32768]]]
+
+
+@pytest.mark.parametrize('num_channels', [3, 4])
+def test_write_png_16_bit(tmp_path, num_channels):
+    pixels = np.random.default_rng(0).integers(0, 65536, size=(5, 7, num_channels)).astype(np.uint16)
+    path = str(tmp_path / 'picture.png')
+    write_png(path, pixels)
+    bit_depth, written = read_png_16(path)
+    assert bit_depth == 16
+    assert np.array_equal(written, pixels)
+    # A valid PNG (every chunk CRC checked)
+    with Image.open(path) as image:
+        image.load()
+        assert image.size == (7, 5)
+
+
+@pytest.mark.parametrize('color_space', ['Gamma', 'Linear'])
+def test_converter_pictures(generate_project, tmp_path, run_script, color_space):
+    proj_dir = generate_project(2, picture_probability=0.6, group_probability=0.3)
+    pictures = list(QuillProject(proj_dir).get_pictures())
+    assert pictures
+
+    output_dir = str(tmp_path / 'output')
+    run_script('quill_converter.py', '--input', proj_dir, '--output', output_dir, '--pictures', '--color-space', color_space)
+    for path, pixels in pictures:
+        image_path = os.path.join(output_dir, 'Pictures', layer_path_to_file_name(path) + '.png')
+        if color_space == 'Gamma':
+            with Image.open(image_path) as image:
+                assert np.array_equal(np.asarray(image), pixels)
+        else:
+            bit_depth, written = read_png_16(image_path)
+            assert bit_depth == 16
+            assert np.array_equal(written, QuillPictureProcessor(color_space='Linear').process(pixels)[0])
+
+
+def test_converter_pictures_need_binary_input(tmp_path, run_script):
+    with pytest.raises(SystemExit) as error:
+        run_script('quill_converter.py', '--input', str(tmp_path), '--output', str(tmp_path), '--format', 'binary', '--pictures')
+    assert error.value.code == 2
@@ -0,0 +1,116 @@
+import os
+import argparse
+import json
+import threading
+import tracemalloc
+import pytest
+from quillustrate import profiling
+from quillustrate.profiling import add_profile_arguments, profile_run, section
+from test.conftest import load_script
+
+
+def read_summary(profile_dir):
+    with open(os.path.join(profile_dir, 'profile.json')) as json_file:
+        return json.load(json_file)
+
+
+def test_sections_are_no_ops_without_profiler():
+    with section('outside'):
+        pass
+    assert profiling._active_profiler is None
+
+
+def test_profile_run(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    with profile_run(profile_dir):
+        assert not tracemalloc.is_tracing()
+        with section('outer'):
+            with section('inner'):
+                pass
+    for name in ('profile.pstats', 'profile.collapsed', 'profile.json'):
+        assert os.path.exists(os.path.join(profile_dir, name))
+    summary = read_summary(profile_dir)
+    assert summary["trace_memory"] is False
+    assert summary["top_allocations"] == []
+    assert [item["path"] for item in summary["sections"]] == ['outer/inner', 'outer']
+
+
+def test_sections_nest_per_thread(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    # Both threads hold their section open while the other one opens its own
+    opened = threading.Barrier(2)
+
+    def work(name):
+        with section(name):
+            opened.wait()
+            with section('step'):
+                pass
+            opened.wait()
+
+    with profile_run(profile_dir):
+        worker = threading.Thread(target=work, args=('worker',), name='Worker')
+        worker.start()
+        work('main')
+        worker.join()
+
+    sections = read_summary(profile_dir)["sections"]
+    paths = sorted((item["thread"], item["path"]) for item in sections)
+    main_thread = threading.main_thread().name
+    assert paths == sorted([
+        ('Worker', 'worker'), ('Worker', 'worker/step'),
+        (main_thread, 'main'), (main_thread, 'main/step'),
+    ])
+
+
+def test_trace_memory(tmp_path):
+    profile_dir = str(tmp_path / 'profile')
+    with profile_run(profile_dir, trace_memory=True):
+        assert tracemalloc.is_tracing()
+        with section('allocate'):
+            data = [bytearray(1 << 16) for _ in range(64)]
+            del data
+    assert not tracemalloc.is_tracing()
+    summary = read_summary(profile_dir)
+    assert summary["trace_memory"] is True
+    assert summary["sections"][0]["memory_peak"] >= 64 << 16
+    assert summary["top_allocations"]
+
+
+def test_trace_memory_without_reset_peak(tmp_path, monkeypatch):
+    # tracemalloc.reset_peak is Python 3.9+
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    profile_dir = str(tmp_path / 'profile')
+    with profile_run(profile_dir, trace_memory=True):
+        with section('outer'):
+            data = bytearray(1 << 20)
+            with section('inner'):
+                pass
+            del data
+    sections = {item["path"]: item for item in read_summary(profile_dir)["sections"]}
+    assert sections['outer']["memory_peak"] >= 1 << 20
+    assert sections['outer/inner']["memory_peak"] >= 0
+
+
+def test_converter_profile_memory(example_dir, tmp_path, run_script):
+    profile_dir = str(tmp_path / 'profile')
+    run_script('quill_converter.py', '--input', example_dir, '--output', str(tmp_path / 'output'),
+               '--profile', profile_dir, '--profile-memory')
+    summary = read_summary(profile_dir)
+    assert summary["trace_memory"] is True
+    assert summary["sections"]
+
+
+@pytest.mark.parametrize('script_name, argv', [
+    ('quill_converter.py', ['--input', 'in', '--output', 'out']),
+    ('process_quill_with_blender.py', ['--quill-input', 'in', '--output', 'out']),
+    ('quill_tiler.py', ['--input', 'in', '--output', 'out']),
+    ('quill_lod.py', ['--input', 'in', '--output', 'out']),
+])
+def test_scripts_share_profile_arguments(script_name, argv):
+    parser = argparse.ArgumentParser()
+    add_profile_arguments(parser)
+    expected = parser.parse_args(['--profile', 'profile_dir', '--profile-memory'])
+    args = load_script(script_name).read_args(argv + ['--profile', 'profile_dir', '--profile-memory'])
+    assert (args.profile, args.profile_memory) == (expected.profile, expected.profile_memory)
+    args = load_script(script_name).read_args(argv)
+    assert (args.profile, args.profile_memory) == (None, False)
@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+import pytest
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProject, QuillType
+from quillustrate.query import QuillQueryClient, QuillQueryServer
+from test.conftest import get_drawings
+
+
+@pytest.fixture
+def client():
+    server = QuillQueryServer(port=0, watch_interval=0)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        query_client = QuillQueryClient(port=server.server_address[1], timeout=10.0)
+        query_client.wait()
+        yield query_client
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture
+def proj_dir(generate_project):
+    return generate_project(8, max_layers=4, picture_probability=0.3)
+
+
+def get_first_drawing(proj_dir):
+    """(layer path, decoded drawing) of the first drawing in Quill.qbin"""
+    project = QuillProject(proj_dir)
+    for value_range in project.get_quill_file_value_ranges():
+        if value_range["type"] == QuillType.DRAWING and value_range["index"] == 0:
+            binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+            return value_range["path"], QuillDrawingArrays.decode(binary_chunk_obj)
+    raise AssertionError("No drawing in {}".format(proj_dir))
+
+
+def test_strokes_and_vertices(client, proj_dir):
+    layer_path, drawing = get_first_drawing(proj_dir)
+    assert np.array_equal(client.get_strokes(proj_dir, layer_path), drawing.strokes)
+    assert client.get_vertices(proj_dir, layer_path).tobytes() == drawing.vertices.tobytes()
+    assert np.array_equal(client.get_strokes(proj_dir, layer_path, field="num_vertices"),
+                          drawing.strokes["num_vertices"])
+    stats = client.get_stats(proj_dir)
+    assert stats["NumLayers"] == len(client.get_layers(proj_dir))
+
+
+def test_summary_does_not_decode_drawings(client, proj_dir):
+    drawings = get_drawings(QuillProject(proj_dir))
+    stats = client.get_stats(proj_dir)
+    assert stats["NumDrawings"] == len(drawings)
+    assert stats["NumStrokes"] == sum(len(drawing.strokes) for drawing in drawings.values())
+    assert stats["NumVertices"] == sum(len(drawing.vertices) for drawing in drawings.values())
+    for layer in client.get_layers(proj_dir):
+        for index, summary_drawing in enumerate(layer.get("Drawings", [])):
+            drawing = drawings[layer["Path"], index]
+            assert summary_drawing["NumVertices"] == len(drawing.vertices)
+            assert summary_drawing["BoundingBox"] == drawing.get_bounding_box()
+    # Only Quill.qbin itself is held, no decoded drawings
+    status = client.get_status()
+    assert [project["NumDecodedDrawings"] for project in status["Projects"]] == [0]
+    assert status["Bytes"] == stats["Bytes"]
+
+
+@pytest.mark.parametrize('query', ['nothing', 'entry', 'drawing', 'value_chunk', 'summary'])
+def test_unknown_query_is_404(client, proj_dir, query):
+    # get_entry and get_drawing are handler helpers, they must not answer (or hang) as queries
+    layer_path, _ = get_first_drawing(proj_dir)
+    with pytest.raises(RuntimeError, match=r"\(404\): Unknown query '/{}'".format(query)):
+        client.request_json(query, project=proj_dir, layer=layer_path)
+
+
+@pytest.mark.parametrize('params', [
+    {"layer": "Root/NoSuchLayer"},
+    {"drawing": 1000},
+    {"stroke": 100000},
+])
+def test_missing_is_404(client, proj_dir, params):
+    layer_path, _ = get_first_drawing(proj_dir)
+    query = "vertices" if "stroke" in params else "strokes"
+    with pytest.raises(RuntimeError, match=r"\(404\)"):
+        client.request_array(query, project=proj_dir, **{"layer": layer_path, **params})
+
+
+def test_missing_project_is_404(client, tmp_path):
+    with pytest.raises(RuntimeError, match=r"\(404\): No project dir"):
+        client.get_stats(str(tmp_path / 'missing'))
+
+
+@pytest.mark.parametrize('dropped, params, error', [
+    (("project",), {}, "Missing 'project' parameter"),
+    (("layer",), {}, "Missing 'layer' parameter"),
+    ((), {"field": "nothing"}, "Unknown field 'nothing'"),
+    ((), {"drawing": "first"}, "invalid literal"),
+])
+def test_bad_request_is_400(client, proj_dir, dropped, params, error):
+    layer_path, _ = get_first_drawing(proj_dir)
+    params = {"project": proj_dir, "layer": layer_path, **params}
+    for key in dropped:
+        del params[key]
+    with pytest.raises(RuntimeError, match=r"\(400\): {}".format(error)):
+        client.request_array("strokes", **params)
+    # The server keeps answering after an error
+    assert client.get_status()["MaxBytes"] > 0
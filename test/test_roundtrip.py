@@ -0,0 +1,90 @@
+import io
+import json
+import pytest
+from quillustrate.engines.quill import QuillBinaryData, QuillProject, QuillSceneData, QuillType
+from quillustrate.roundtrip import (
+    CODECS,
+    QuillAsciiCodec,
+    QuillCodec,
+    QuillRoundTripHarness,
+    QuillSceneGenerator,
+    find_value_mismatch,
+    get_codec,
+)
+
+
+@pytest.fixture(params=[codec_cls.name for codec_cls in CODECS])
+def codec(request):
+    return get_codec(request.param)
+
+
+def test_codec_is_abstract():
+    with pytest.raises(TypeError):
+        QuillCodec()
+
+
+def test_examples_round_trip(example_dir, codec, tmp_path):
+    project = QuillProject(example_dir)
+    scene_data = project.scene_data_obj.get_data()
+    scene_data_obj = QuillSceneData(json.loads(json.dumps(scene_data)))
+    decoded = codec.decode(project.binary_data_obj, scene_data_obj, str(tmp_path))
+    binary_file = io.BytesIO()
+    output_scene_data_obj = codec.encode(decoded, binary_file)
+    assert find_value_mismatch(
+        project.binary_data_obj.get_data(), scene_data, binary_file.getvalue(), output_scene_data_obj.get_data(),
+    ) is None
+
+
+@pytest.mark.parametrize('generator_options', [
+    {},
+    {'max_gap': 64},
+    {'max_gap': 64, 'empty_probability': 0.5, 'picture_probability': 0.4},
+])
+def test_generated_round_trip(codec, generator_options):
+    results = QuillRoundTripHarness(codecs=[codec], generator_options=generator_options).run(range(4))
+    assert results["failures"] == []
+    assert results["throughput"][codec.name]["bytes"] > 0
+
+
+def test_generator_gaps_and_empty_values():
+    generator = QuillSceneGenerator(0, max_gap=64, empty_probability=0.5, max_drawings=4)
+    binary_file = io.BytesIO()
+    scene_data_obj = QuillSceneData(generator.run(binary_file))
+    assert generator.num_gap_bytes > 0
+
+    binary_data_obj = QuillBinaryData(binary_file.getvalue())
+    value_ranges = scene_data_obj.get_quill_file_value_ranges(binary_data_obj.get_size())
+    num_strokes = [int.from_bytes(binary_file.getvalue()[item["offset"]:item["offset"] + 4], 'little')
+                   for item in value_ranges if item["type"] == QuillType.DRAWING]
+    assert 0 in num_strokes
+
+
+class QuillCorruptingCodec(QuillAsciiCodec):
+    name = "corrupting"
+
+    def encode(self, decoded, binary_file):
+        scene_data_obj = super().encode(decoded, binary_file)
+        # Flips the last byte, the last vertex (or pixel) of the last value
+        binary_file.seek(-1, io.SEEK_END)
+        last = binary_file.read(1)
+        binary_file.seek(-1, io.SEEK_END)
+        binary_file.write(bytes([last[0] ^ 0xFF]))
+        return scene_data_obj
+
+
+@pytest.mark.parametrize('generator_options', [{}, {'max_gap': 64}])
+def test_harness_reports_mismatches(generator_options):
+    results = QuillRoundTripHarness(codecs=[QuillCorruptingCodec()], generator_options=generator_options).run(range(2))
+    assert [failure["seed"] for failure in results["failures"]] == [0, 1]
+    assert all(line.startswith("FAIL") for line in QuillRoundTripHarness.format_results(results)[1:])
+
+
+def test_harness_cli(run_script):
+    assert run_script('quill_codec_harness.py', '--iterations', '2', '--max-gap', '16', '--empty-probability', '0.2') == 0
+
+
+def test_unknown_codec(run_script):
+    with pytest.raises(ValueError, match="Unknown codec 'objects'"):
+        get_codec('objects')
+    with pytest.raises(SystemExit, match="expected one of"):
+        run_script('quill_codec_harness.py', '--iterations', '1', '--codecs', 'object,objects')
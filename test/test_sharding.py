@@ -0,0 +1,92 @@
+import os
+import json
+import pytest
+from quillustrate.engines.quill import QuillExporterEngine, QuillProject, LAYER_PATH_SEPARATOR
+from quillustrate.sharding import QuillLayerSharder
+
+
+def add_viewpoints(proj_dir, num_viewpoints):
+    quill_json_path = os.path.join(proj_dir, 'Quill.json')
+    with open(quill_json_path) as json_file:
+        scene_data = json.load(json_file)
+    children = scene_data["Sequence"]["RootLayer"]["Implementation"]["Children"]
+    children += [
+        {"Name": "Viewpoint{}".format(index), "Type": "Viewpoint", "Implementation": {}}
+        for index in range(num_viewpoints)
+    ]
+    with open(quill_json_path, 'w') as outfile:
+        json.dump(scene_data, outfile)
+
+
+def get_exported_layers(project, exclude_list):
+    """Non-group layers an export with exclude_list would hold"""
+    exported = []
+    for layer_path, layer_data, _ in project.scene_data_obj.iter_layers():
+        excluded = any(
+            layer_path == excluded_path or layer_path.startswith(excluded_path + LAYER_PATH_SEPARATOR)
+            for excluded_path in exclude_list
+        )
+        if layer_data["Type"] != "Group" and not excluded:
+            exported.append(layer_path)
+    return exported
+
+
+@pytest.mark.parametrize('num_shards', [1, 2, 3, 8])
+def test_every_layer_exported_once(generate_project, num_shards):
+    proj_dir = generate_project(4, max_layers=6, group_probability=0.4)
+    add_viewpoints(proj_dir, 3)
+    project = QuillProject(proj_dir)
+    sharder = QuillLayerSharder.from_dir(proj_dir, num_shards)
+    shards = sharder.partition()
+    assert shards == QuillLayerSharder.from_project(project, num_shards).partition()
+    assert 1 <= len(shards) <= num_shards
+
+    layer_paths = [layer_path for layer_path, _ in sharder.get_layer_costs()]
+    assert sorted(layer for shard in shards for layer in shard["layers"]) == sorted(layer_paths)
+    assert sum(shard["cost"] for shard in shards) == project.binary_data_obj.get_size() - min(
+        value_range["offset"] for value_range in project.get_quill_file_value_ranges())
+
+    for shard in shards:
+        assert sorted(get_exported_layers(project, sharder.get_exclude_list(shard["layers"]))) == sorted(shard["layers"])
+
+
+def test_free_layers_spread_round_robin(generate_project):
+    proj_dir = generate_project(1, max_layers=4, group_probability=0.0, picture_probability=0.0)
+    add_viewpoints(proj_dir, 6)
+    shards = QuillLayerSharder.from_dir(proj_dir, 2).partition()
+    assert len(shards) == 2
+    assert [sum(layer.startswith("Root/Viewpoint") for layer in shard["layers"]) for shard in shards] == [3, 3]
+
+
+def test_only_free_layers(tmp_path):
+    proj_dir = str(tmp_path)
+    with open(os.path.join(proj_dir, 'Quill.json'), 'w') as outfile:
+        json.dump({"Sequence": {"RootLayer": {"Name": "Root", "Type": "Group", "Implementation": {"Children": [
+            {"Name": "Viewpoint{}".format(index), "Type": "Viewpoint", "Implementation": {}} for index in range(3)
+        ]}}}}, outfile)
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'wb') as binary_file:
+        binary_file.write(bytes(8))
+    shards = QuillLayerSharder.from_dir(proj_dir, 2).partition()
+    assert [shard["layers"] for shard in shards] == [["Root/Viewpoint0", "Root/Viewpoint2"], ["Root/Viewpoint1"]]
+
+
+def test_shard_settings_from_exporter_template(generate_project, tmp_path, monkeypatch):
+    proj_dir = generate_project(2, max_layers=5, group_probability=0.3)
+    # Sharding only needs Quill.json and the Quill.qbin size
+    monkeypatch.setattr(QuillProject, '__init__', lambda *args: pytest.fail("Quill.qbin was read"))
+    engine = QuillExporterEngine()
+    template = engine.load_template()
+    shard_settings = engine.get_shard_settings(proj_dir, str(tmp_path), 3)
+    assert len(shard_settings) > 1
+
+    output_files = set()
+    for settings in shard_settings:
+        # The template as saved by QuillExporter, with only the input, output and ExcludeList filled in
+        assert dict(settings, InputFile="", OutputFile="") == dict(
+            template, Options=dict(template["Options"], ExcludeList=settings["Options"]["ExcludeList"]))
+        assert settings["InputFile"] == os.path.abspath(proj_dir)
+        output_files.add(settings["OutputFile"])
+        # ExcludeList holds full layer paths, starting at the root layer
+        assert settings["Options"]["ExcludeList"]
+        assert all(path.startswith("Root/") for path in settings["Options"]["ExcludeList"])
+    assert len(output_files) == len(shard_settings)
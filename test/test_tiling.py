@@ -0,0 +1,86 @@
+import os
+import pytest
+from quillustrate.engines.quill import QuillDrawingArrays, QuillProject, QuillProjectWriter, QuillType
+from quillustrate.tiling import QuillSceneTiler, get_layer_values
+from test.conftest import assert_drawing_bounding_boxes, get_drawings
+
+
+def get_vertex_bytes(drawing):
+    """Vertex bytes of every stroke, hashable"""
+    vertex_offsets = drawing.get_vertex_offsets()
+    return [
+        drawing.vertices[start:start + count].tobytes()
+        for start, count in zip(vertex_offsets, drawing.strokes["num_vertices"])
+    ]
+
+
+TILER_OPTIONS = [
+    {"mode": "grid", "divisions": (2, 2, 2)},
+    {"mode": "grid", "divisions": (3, 1, 2)},
+    {"mode": "octree", "max_tile_bytes": 4096, "max_depth": 4},
+]
+
+
+@pytest.mark.parametrize('tiler_options', TILER_OPTIONS)
+def test_every_stroke_in_one_tile(generate_project, tmp_path, tiler_options):
+    proj_dir = generate_project(2, max_layers=6, group_probability=0.3)
+    project = QuillProject(proj_dir)
+    output_dir = str(tmp_path / 'tiles')
+    manifest = QuillSceneTiler(project, **tiler_options).run(output_dir)
+
+    source_drawings = get_drawings(project)
+    tile_strokes = {key: [] for key in source_drawings}
+    for tile in manifest["Tiles"]:
+        tile_drawings = get_drawings(QuillProject(os.path.join(output_dir, tile["Path"])))
+        assert tile["NumStrokes"] == sum(len(drawing.strokes) for drawing in tile_drawings.values())
+        # Drawings of other tiles are written empty, they must not claim the source bounds
+        assert_drawing_bounding_boxes(os.path.join(output_dir, tile["Path"]))
+        for key, drawing in tile_drawings.items():
+            tile_strokes[key] += get_vertex_bytes(drawing)
+
+    num_strokes = sum(len(drawing.strokes) for drawing in source_drawings.values())
+    assert sum(tile["NumStrokes"] for tile in manifest["Tiles"]) == num_strokes
+    for key, drawing in source_drawings.items():
+        assert sorted(tile_strokes[key]) == sorted(get_vertex_bytes(drawing))
+
+
+def test_layer_values_match_scene(generate_project):
+    project = QuillProject(generate_project(5, max_layers=6, group_probability=0.5))
+    values = get_layer_values(project.scene_data_obj)
+    assert [(layer_path, value_data["DataFileOffset"]) for layer_path, _, _, value_data in
+            project.scene_data_obj.iter_layer_values()] == [(value[0], value[2]) for value in values]
+    for value in values:
+        assert value[3].shape == (4, 4)
+
+
+def test_decodes_once_and_closes_writers(generate_project, tmp_path, monkeypatch):
+    project = QuillProject(generate_project(3, max_layers=6, picture_probability=0.3))
+    num_drawings = len([
+        value_range for value_range in project.get_quill_file_value_ranges()
+        if value_range["type"] == QuillType.DRAWING
+    ])
+    decoded = []
+    decode = QuillDrawingArrays.decode.__func__
+    monkeypatch.setattr(QuillDrawingArrays, 'decode', classmethod(
+        lambda cls, binary_chunk_obj: decoded.append(1) or decode(cls, binary_chunk_obj)))
+    open_writers = set()
+    opened = []
+    writer_init, writer_close = QuillProjectWriter.__init__, QuillProjectWriter.close
+
+    def init(self, *args, **kwargs):
+        writer_init(self, *args, **kwargs)
+        open_writers.add(self)
+        opened.append(self)
+
+    def close(self):
+        writer_close(self)
+        open_writers.discard(self)
+
+    monkeypatch.setattr(QuillProjectWriter, '__init__', init)
+    monkeypatch.setattr(QuillProjectWriter, 'close', close)
+
+    tiler = QuillSceneTiler(project, mode="grid", divisions=(4, 4, 4))
+    manifest = tiler.run(str(tmp_path / 'tiles'))
+    assert len(decoded) <= num_drawings
+    assert not open_writers
+    assert len(opened) == len(manifest["Tiles"]) + (manifest["Shared"] is not None)
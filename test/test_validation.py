@@ -0,0 +1,118 @@
+import os
+import json
+import struct
+import pytest
+from quillustrate.engines.quill import QuillDrawingObject, QuillProject, QuillStrokeObject, QuillType
+from quillustrate.validation import (
+    QuillValidationError,
+    QuillValidator,
+    check_project,
+    check_project_or_exit,
+    validate_project,
+)
+
+
+def get_drawing_ranges(proj_dir):
+    project = QuillProject(proj_dir)
+    return [
+        value_range for value_range in project.get_quill_file_value_ranges()
+        if value_range["type"] == QuillType.DRAWING
+    ]
+
+
+def patch_binary(proj_dir, offset, data):
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'r+b') as binary_file:
+        binary_file.seek(offset)
+        binary_file.write(data)
+
+
+def get_messages(report):
+    return [issue["Message"] for issue in report["Errors"]]
+
+
+def test_examples_valid(example_dir, run_script):
+    report = check_project(example_dir)
+    assert report["Valid"] and not report["Errors"]
+    assert run_script('quill_validate.py', '--input', example_dir) == 0
+
+
+def test_generated_totals(generate_project):
+    proj_dir = generate_project(9, max_layers=6, group_probability=0.3, picture_probability=0.3)
+    report = check_project(proj_dir)
+    project = QuillProject(proj_dir)
+    num_strokes = 0
+    for value_range in get_drawing_ranges(proj_dir):
+        binary_chunk_obj, _ = project.binary_data_obj.chunk(value_range["offset"], value_range["size"])
+        num_strokes += QuillDrawingObject.get_header_struct().unpack_from(binary_chunk_obj.get_data())[0]
+    assert report["Totals"]["NumDrawings"] == len(get_drawing_ranges(proj_dir))
+    assert report["Totals"]["NumStrokes"] == num_strokes
+    assert [layer["Path"] for layer in report["Layers"]] == list(dict.fromkeys(
+        layer_path for layer_path, _, _, _ in project.scene_data_obj.iter_layer_values()))
+
+
+def test_truncated(generate_project, run_script):
+    proj_dir = generate_project(10, max_layers=3, picture_probability=0.0)
+    last_range = get_drawing_ranges(proj_dir)[-1]
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'r+b') as binary_file:
+        binary_file.truncate(last_range["offset"] + last_range["size"] - 1)
+    report = validate_project(proj_dir)
+    assert not report["Valid"]
+    assert any("run past the end of the drawing" in message for message in get_messages(report))
+    with pytest.raises(QuillValidationError) as error_info:
+        check_project(proj_dir)
+    assert error_info.value.report["Errors"] == report["Errors"]
+    assert run_script('quill_validate.py', '--input', proj_dir) == 1
+
+
+@pytest.mark.parametrize('script_name', ['quill_converter.py', 'quill_tiler.py', 'quill_lod.py'])
+def test_scripts_exit_on_invalid_input(generate_project, tmp_path, run_script, script_name):
+    proj_dir = generate_project(10, max_layers=3, picture_probability=0.0)
+    check_project_or_exit(proj_dir)
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'r+b') as binary_file:
+        binary_file.truncate(get_drawing_ranges(proj_dir)[-1]["offset"] + 1)
+    with pytest.raises(SystemExit, match="Invalid Quill project"):
+        check_project_or_exit(proj_dir)
+    output_dir = str(tmp_path / 'output')
+    with pytest.raises(SystemExit, match="Invalid Quill project"):
+        run_script(script_name, '--input', proj_dir, '--output', output_dir)
+    assert not os.path.exists(output_dir)
+
+
+def test_truncated_scene_header(generate_project):
+    proj_dir = generate_project(10, max_layers=1)
+    with open(os.path.join(proj_dir, 'Quill.qbin'), 'r+b') as binary_file:
+        binary_file.truncate(4)
+    messages = get_messages(validate_project(proj_dir))
+    assert any("shorter than the scene header" in message for message in messages)
+    assert any("past the end of Quill.qbin" in message for message in messages)
+
+
+def test_negative_stroke_count(generate_project):
+    proj_dir = generate_project(11, max_layers=3, picture_probability=0.0)
+    offset = get_drawing_ranges(proj_dir)[0]["offset"]
+    patch_binary(proj_dir, offset, QuillDrawingObject.get_header_struct().pack(-3))
+    assert "Negative stroke count -3" in get_messages(validate_project(proj_dir))
+
+
+def test_negative_vertex_count(generate_project):
+    proj_dir = generate_project(11, max_layers=3, picture_probability=0.0)
+    offset = get_drawing_ranges(proj_dir)[0]["offset"]
+    stroke_header_struct = QuillStrokeObject.get_header_struct()
+    num_vertices_offset = offset + QuillDrawingObject.get_header_struct().size + stroke_header_struct.size - 4
+    patch_binary(proj_dir, num_vertices_offset, struct.pack('<i', -1))
+    assert "Stroke 0 has a negative vertex count -1" in get_messages(validate_project(proj_dir))
+
+
+def test_bad_offsets(generate_project):
+    proj_dir = generate_project(12, max_layers=3, picture_probability=0.0)
+    quill_json_path = os.path.join(proj_dir, 'Quill.json')
+    with open(quill_json_path) as json_file:
+        scene_data = json.load(json_file)
+    drawings = [
+        value_data for _, layer_type, _, value_data in QuillProject(proj_dir).scene_data_obj.iter_layer_values()
+        if layer_type == "Paint"
+    ]
+    assert len(drawings) >= 2
+    report = QuillValidator(scene_data, b"\0" * 8).run()
+    assert all("past the end of Quill.qbin" in message for message in get_messages(report))
+    assert len(report["Errors"]) == len(drawings)